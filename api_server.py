@@ -8,14 +8,16 @@ import jwt
 import hashlib
 from datetime import datetime, timedelta
 from database_manager import DatabaseManager
+from attendance_service import get_attendance_service
 import os
 
 app = Flask(__name__)
 CORS(app)  # Enable Cross-Origin Resource Sharing
 app.config['SECRET_KEY'] = 'your-secret-key-change-this-in-production'
 
-# Initialize database
+# Initialize database (a read-only mirror here; marks go through the attendance service)
 db = DatabaseManager()
+attendance = get_attendance_service()
 
 def generate_token(user_id):
     """Generate JWT token for authentication"""
@@ -72,7 +74,7 @@ def mark_attendance_api():
     if not name:
         return jsonify({'success': False, 'message': 'Name is required'}), 400
     
-    success, message = db.mark_attendance(name, 'mobile')
+    success, message = attendance.mark_attendance(name, source='mobile')
     
     return jsonify({
         'success': success,
@@ -115,26 +117,43 @@ def get_attendance_range():
     except Exception as e:
         return jsonify({'success': False, 'message': str(e)}), 500
 
+@app.route('/api/attendance/daily', methods=['GET'])
+def get_daily_attendance():
+    """Get per-day attendance totals"""
+    days = request.args.get('days', 30, type=int)
+    
+    try:
+        daily = db.get_daily_summary(days=days)
+        
+        return jsonify({
+            'success': True,
+            'daily': daily,
+            'days': days
+        })
+    except Exception as e:
+        return jsonify({'success': False, 'message': str(e)}), 500
+
+@app.route('/api/attendance/presence', methods=['GET'])
+def get_presence():
+    """Get hours on site per person and day"""
+    days = request.args.get('days', 7, type=int)
+    
+    try:
+        presence = db.get_presence_report(days=days)
+        
+        return jsonify({
+            'success': True,
+            'presence': presence,
+            'days': days
+        })
+    except Exception as e:
+        return jsonify({'success': False, 'message': str(e)}), 500
+
 @app.route('/api/users', methods=['GET'])
 def get_users():
     """Get all users"""
     try:
-        import sqlite3
-        conn = sqlite3.connect(db.db_path)
-        cursor = conn.cursor()
-        
-        cursor.execute('SELECT id, name, email, department, role FROM users WHERE is_active = 1')
-        users = []
-        for row in cursor.fetchall():
-            users.append({
-                'id': row[0],
-                'name': row[1],
-                'email': row[2],
-                'department': row[3],
-                'role': row[4]
-            })
-        
-        conn.close()
+        users = db.get_users()
         
         return jsonify({
             'success': True,
@@ -167,24 +186,16 @@ def create_user():
 def get_stats():
     """Get attendance statistics"""
     try:
-        # Today's stats
-        today_df = db.get_attendance_report(days=1)
-        today_count = len(today_df) if not today_df.empty else 0
-        
-        # Weekly stats
-        weekly_df = db.get_attendance_report(days=7)
-        weekly_count = len(weekly_df) if not weekly_df.empty else 0
-        
-        # Monthly stats
-        monthly_df = db.get_attendance_report(days=30)
-        monthly_count = len(monthly_df) if not monthly_df.empty else 0
+        stats = db.get_stats_summary()
         
         return jsonify({
             'success': True,
             'stats': {
-                'today': today_count,
-                'weekly': weekly_count,
-                'monthly': monthly_count,
+                'today': stats['today']['users'],
+                'weekly': stats['week']['users'],
+                'monthly': stats['month']['users'],
+                'total_users': stats['total_users'],
+                'departments': stats['departments'],
                 'last_updated': datetime.now().isoformat()
             }
         })
@@ -212,6 +223,8 @@ if __name__ == '__main__':
     print("- POST /api/attendance/mark")
     print("- GET  /api/attendance/today")
     print("- GET  /api/attendance/range?days=7")
+    print("- GET  /api/attendance/daily?days=30")
+    print("- GET  /api/attendance/presence?days=7")
     print("- GET  /api/users")
     print("- POST /api/users")
     print("- GET  /api/stats")
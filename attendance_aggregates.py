@@ -0,0 +1,146 @@
+#!/usr/bin/env python3
+"""
+Incrementally maintained per-day / per-person attendance counters
+"""
+import atexit
+import json
+import os
+import threading
+import time
+from datetime import date
+
+import config
+
+
+def day_to_date(day):
+    """YYYYMMDD integer key -> datetime.date."""
+    return date(day // 10000, day // 100 % 100, day % 100)
+
+
+class AttendanceAggregates:
+    """Mark counts per (day, person), kept in step with the monthly partitions.
+
+    Counters are updated on every mark and persisted to a JSON sidecar next
+    to the partitions. Each month's entry records the partition's size when
+    it was counted; at startup only months whose partition changed since
+    (e.g. after a crash or compaction) are recounted. Window queries only
+    touch the days inside the window, never the marks themselves.
+
+    The store's reader must produce ColumnarAttendance partitions.
+    """
+
+    def __init__(self, store, path=None, save_interval=None):
+        self.store = store
+        self.path = path or os.path.join(store.partition_dir, config.ATTENDANCE_AGGREGATES_FILE)
+        self.save_interval = config.ATTENDANCE_AGGREGATES_SAVE_INTERVAL if save_interval is None else save_interval
+        self._lock = threading.RLock()
+        self._months = {}
+        self._windows = {}
+        self._dirty = False
+        self._last_save = time.monotonic()
+        self._load()
+        atexit.register(self.save)
+
+    def _load(self):
+        saved = {}
+        if os.path.exists(self.path):
+            try:
+                with open(self.path, encoding='utf-8') as f:
+                    saved = json.load(f)
+            except (OSError, ValueError) as e:
+                print(f"Ignoring unreadable attendance aggregates {self.path}: {e}")
+        for key in self.store.partitions():
+            size = os.path.getsize(self.store.partition_path(key))
+            entry = saved.get(key)
+            if entry and entry.get('size') == size:
+                days = {int(day): counts for day, counts in entry['days'].items()}
+                self._months[key] = {'size': size, 'days': days}
+            else:
+                self._months[key] = self._count_partition(key)
+                self._dirty = True
+        self.save()
+
+    def _count_partition(self, key):
+        path = self.store.partition_path(key)
+        size = os.path.getsize(path) if os.path.exists(path) else 0
+        marks = self.store.read_partition(key)
+        days = marks.counts_by_day_person() if marks is not None else {}
+        return {'size': size, 'days': days}
+
+    def record(self, key, day, names, span=None):
+        """Count new marks for ``names`` on an integer YYYYMMDD ``day`` in partition ``key``.
+
+        ``span`` is the partition's (size before, size after) around the
+        append. If the partition grew since it was last counted (another
+        writer appended to it) the month is recounted instead.
+        """
+        with self._lock:
+            month = self._months.setdefault(key, {'size': 0, 'days': {}})
+            if span is None:
+                path = self.store.partition_path(key)
+                span = (month['size'], os.path.getsize(path) if os.path.exists(path) else 0)
+            if span[0] != month['size']:
+                self._months[key] = self._count_partition(key)
+            else:
+                counts = month['days'].setdefault(day, {})
+                for name in names:
+                    counts[name] = counts.get(name, 0) + 1
+                month['size'] = span[1]
+            self._windows.clear()
+            self._dirty = True
+            if time.monotonic() - self._last_save >= self.save_interval:
+                self.save()
+
+    def refresh(self, key):
+        """Recount one month (after its partition was rewritten)."""
+        with self._lock:
+            self._months[key] = self._count_partition(key)
+            self._windows.clear()
+            self._dirty = True
+
+    def window(self, start_day, end_day):
+        """Counts for integer days in [start_day, end_day].
+
+        Returns (total, by_person, by_day); by_person is ordered by count,
+        highest first. Results are memoized until the next mark.
+        """
+        with self._lock:
+            cached = self._windows.get((start_day, end_day))
+            if cached is None:
+                cached = self._windows[(start_day, end_day)] = self._compute_window(start_day, end_day)
+        total, by_person, by_day = cached
+        return total, dict(by_person), dict(by_day)
+
+    def _compute_window(self, start_day, end_day):
+        start_key = f"{start_day // 10000:04d}-{start_day // 100 % 100:02d}"
+        end_key = f"{end_day // 10000:04d}-{end_day // 100 % 100:02d}"
+        by_person = {}
+        by_day = {}
+        for key, month in self._months.items():
+            if not start_key <= key <= end_key:
+                continue
+            for day, counts in month['days'].items():
+                if start_day <= day <= end_day:
+                    by_day[day] = sum(counts.values())
+                    for name, count in counts.items():
+                        by_person[name] = by_person.get(name, 0) + count
+        by_person = dict(sorted(by_person.items(), key=lambda item: item[1], reverse=True))
+        return sum(by_day.values()), by_person, dict(sorted(by_day.items()))
+
+    def save(self):
+        """Write the sidecar (temp file + rename) if anything changed."""
+        with self._lock:
+            if not self._dirty:
+                return
+            data = {key: {'size': month['size'], 'days': {str(day): counts for day, counts in month['days'].items()}}
+                    for key, month in self._months.items()}
+            try:
+                os.makedirs(os.path.dirname(self.path), exist_ok=True)
+                tmp_path = f"{self.path}.tmp"
+                with open(tmp_path, 'w', encoding='utf-8') as f:
+                    json.dump(data, f)
+                os.replace(tmp_path, self.path)
+                self._dirty = False
+            except OSError as e:
+                print(f"Could not save attendance aggregates: {e}")
+            self._last_save = time.monotonic()
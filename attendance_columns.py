@@ -0,0 +1,226 @@
+#!/usr/bin/env python3
+"""
+Compact columnar in-memory attendance storage
+"""
+import threading
+from datetime import date, datetime
+
+import numpy as np
+import pandas as pd
+
+from attendance_log import ATTENDANCE_COLUMNS
+from attendance_partitions import iter_typed_chunks
+
+EPOCH = datetime(1970, 1, 1)
+EPOCH_ORDINAL = EPOCH.toordinal()
+NO_TIME = np.iinfo(np.int64).min  # Same bit pattern as numpy's NaT
+
+
+def to_epoch(value):
+    """Wall-clock seconds since 1970-01-01 for a datetime or date (no timezone conversion)."""
+    if not isinstance(value, datetime):
+        value = datetime.combine(value, datetime.min.time())
+    return int((value - EPOCH).total_seconds())
+
+
+def ordinal_to_day_key(ordinal):
+    """Days since 1970-01-01 -> YYYYMMDD integer key."""
+    day = date.fromordinal(int(ordinal) + EPOCH_ORDINAL)
+    return day.year * 10000 + day.month * 100 + day.day
+
+
+class Interner:
+    """Maps strings to dense integer codes of a fixed dtype.
+
+    Safe to share between threads (marking and the background export both
+    intern names); ``values`` only ever grows.
+    """
+
+    def __init__(self, dtype):
+        self.dtype = np.dtype(dtype)
+        self.values = []
+        self._codes = {}
+        self._limit = np.iinfo(self.dtype).max
+        self._lock = threading.RLock()
+
+    def __len__(self):
+        return len(self.values)
+
+    def code(self, value):
+        code = self._codes.get(value)
+        if code is not None:
+            return code
+        with self._lock:
+            code = self._codes.get(value)
+            if code is None:
+                code = len(self.values)
+                if code > self._limit:
+                    raise ValueError(f"More than {self._limit + 1} distinct values for {self.dtype}")
+                # values first: a reader that finds the code can always look it up
+                self.values.append(value)
+                self._codes[value] = code
+            return code
+
+    def lookup(self, value):
+        """Code for value, or None if it was never seen."""
+        return self._codes.get(value)
+
+    def codes(self, values):
+        """Vectorized code() for an array-like of strings."""
+        positions, uniques = pd.factorize(np.asarray(values, dtype=object))
+        with self._lock:
+            mapping = np.array([self.code(value) for value in uniques], dtype=self.dtype)
+        return mapping[positions] if len(mapping) else np.empty(0, dtype=self.dtype)
+
+
+class ColumnarAttendance:
+    """Marks as three parallel arrays instead of a DataFrame of Python objects.
+
+    person is an int32 code into ``people``, epoch holds wall-clock seconds
+    (int64, NO_TIME when unknown) and source a uint8 code into ``sources``.
+    That is 13 bytes per mark. Appends grow the arrays geometrically.
+    Filters return boolean masks; to_frame()/to_export_frame() build a
+    DataFrame only when one is really needed (exports, reports).
+    Instances that share interners can be concatenated.
+    """
+
+    def __init__(self, people, sources, person=None, epoch=None, source=None):
+        self.people = people
+        self.sources = sources
+        self._person = np.empty(0, dtype=np.int32) if person is None else np.asarray(person, dtype=np.int32)
+        self._epoch = np.empty(0, dtype=np.int64) if epoch is None else np.asarray(epoch, dtype=np.int64)
+        self._source = np.empty(0, dtype=np.uint8) if source is None else np.asarray(source, dtype=np.uint8)
+        self._size = len(self._person)
+
+    @classmethod
+    def from_frame(cls, df, people, sources):
+        """Build from a frame with Name, Time (datetime64) and optional Source columns."""
+        times = pd.to_datetime(df['Time']).to_numpy().astype('datetime64[s]').astype(np.int64)
+        source = df['Source'].astype(str) if 'Source' in df.columns else np.full(len(df), "", dtype=object)
+        return cls(people, sources, person=people.codes(df['Name']), epoch=times, source=sources.codes(source))
+
+    @classmethod
+    def concat(cls, parts):
+        parts = list(parts)
+        first = parts[0]
+        return cls(first.people, first.sources,
+                   person=np.concatenate([part.person for part in parts]),
+                   epoch=np.concatenate([part.epoch for part in parts]),
+                   source=np.concatenate([part.source for part in parts]))
+
+    @property
+    def person(self):
+        return self._person[:self._size]
+
+    @property
+    def epoch(self):
+        return self._epoch[:self._size]
+
+    @property
+    def source(self):
+        return self._source[:self._size]
+
+    def __len__(self):
+        return self._size
+
+    @property
+    def empty(self):
+        return self._size == 0
+
+    def __getitem__(self, index):
+        """Rows selected by a slice, boolean mask or index array (copied)."""
+        return ColumnarAttendance(self.people, self.sources, person=self.person[index].copy(),
+                                  epoch=self.epoch[index].copy(), source=self.source[index].copy())
+
+    def tail(self, n):
+        return self[max(0, self._size - n):]
+
+    def _reserve(self, extra):
+        needed = self._size + extra
+        if needed <= len(self._person):
+            return
+        capacity = max(needed, 2 * len(self._person), 64)
+        for attr in ('_person', '_epoch', '_source'):
+            old = getattr(self, attr)
+            new = np.empty(capacity, dtype=old.dtype)
+            new[:self._size] = old[:self._size]
+            setattr(self, attr, new)
+
+    def append(self, names, when, source=""):
+        """Append one mark per name, all at datetime ``when``."""
+        count = len(names)
+        self._reserve(count)
+        end = self._size + count
+        self._person[self._size:end] = [self.people.code(name) for name in names]
+        self._epoch[self._size:end] = to_epoch(when)
+        self._source[self._size:end] = self.sources.code(source)
+        self._size = end
+
+    def range_mask(self, start, end):
+        """Marks with start <= time < end (datetimes, dates or epoch seconds)."""
+        start = start if isinstance(start, (int, np.integer)) else to_epoch(start)
+        end = end if isinstance(end, (int, np.integer)) else to_epoch(end)
+        epoch = self.epoch
+        return (epoch >= start) & (epoch < end)
+
+    def person_mask(self, name):
+        code = self.people.lookup(name)
+        if code is None:
+            return np.zeros(self._size, dtype=bool)
+        return self.person == code
+
+    def names(self, mask=None):
+        """Distinct names of the (masked) marks."""
+        codes = np.unique(self.person if mask is None else self.person[mask])
+        return [self.people.values[code] for code in codes]
+
+    def counts_by_day_person(self):
+        """{YYYYMMDD: {name: marks}} for marks with a known time."""
+        valid = self.epoch != NO_TIME
+        days = self.epoch[valid] // 86400
+        persons = self.person[valid].astype(np.int64)
+        width = max(len(self.people), 1)
+        keys, counts = np.unique(days * width + persons, return_counts=True)
+        result = {}
+        day_keys = {}
+        for key, count in zip(keys.tolist(), counts.tolist()):
+            ordinal, code = divmod(key, width)
+            day = day_keys.get(ordinal)
+            if day is None:
+                day = day_keys[ordinal] = ordinal_to_day_key(ordinal)
+            result.setdefault(day, {})[self.people.values[code]] = count
+        return result
+
+    def memory_bytes(self):
+        """Bytes held by the mark arrays (excluding the shared name tables)."""
+        return self._person.nbytes + self._epoch.nbytes + self._source.nbytes
+
+    def to_frame(self):
+        """Name / Time (datetime64) / Source DataFrame."""
+        names = np.array(self.people.values, dtype=object)
+        return pd.DataFrame({
+            'Name': names[self.person] if len(names) else np.empty(0, dtype=object),
+            'Time': self.epoch.astype('datetime64[s]'),
+            'Source': pd.Categorical.from_codes(self.source, categories=pd.Index(self.sources.values, dtype=object))
+            if len(self.sources) else pd.Categorical([]),
+        })
+
+    def to_export_frame(self):
+        """The string columns written to CSV/Excel."""
+        df = self.to_frame()
+        times = df['Time']
+        return pd.DataFrame({
+            'Name': df['Name'],
+            'Time': times.dt.strftime("%Y-%m-%d %H:%M:%S").fillna(""),
+            'Date': times.dt.strftime("%Y-%m-%d").fillna(""),
+            'Time_Only': times.dt.strftime("%H:%M:%S").fillna(""),
+            'Source': df['Source'].astype(str),
+        }, columns=ATTENDANCE_COLUMNS)
+
+
+def read_columnar_partition(path, people, sources, chunksize=None):
+    """Read one partition chunk by chunk straight into columnar form."""
+    parts = [ColumnarAttendance.from_frame(chunk, people, sources) for chunk in iter_typed_chunks(path, chunksize)]
+    if not parts:
+        return ColumnarAttendance(people, sources)
+    return parts[0] if len(parts) == 1 else ColumnarAttendance.concat(parts)
@@ -0,0 +1,39 @@
+#!/usr/bin/env python3
+"""
+In-memory (person, date) index for O(1) same-day duplicate checks
+"""
+
+
+class DailyMarkIndex:
+    """Hash set of the people already marked on one day.
+
+    ``loader(day)`` returns the names recorded for a "YYYY-MM-DD" day and is
+    only called when the index is first used, when the day rolls over, or
+    after invalidate() (e.g. the log was reloaded). Every other duplicate
+    check is a set lookup.
+    """
+
+    def __init__(self, loader):
+        self._loader = loader
+        self._day = None
+        self._names = set()
+
+    def _ensure(self, day):
+        if day != self._day:
+            self._names = set(self._loader(day))
+            self._day = day
+
+    def contains(self, name, day):
+        """True if name was already marked on day."""
+        self._ensure(day)
+        return name in self._names
+
+    def add(self, name, day):
+        """Record a new mark."""
+        self._ensure(day)
+        self._names.add(name)
+
+    def invalidate(self):
+        """Force a rebuild on next use."""
+        self._day = None
+        self._names = set()
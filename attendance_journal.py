@@ -0,0 +1,188 @@
+#!/usr/bin/env python3
+"""
+Write-ahead journal with group commit for attendance marks
+"""
+import json
+import os
+import threading
+import time
+import zlib
+
+import config
+
+try:
+    import fcntl
+except ImportError:  # Windows
+    fcntl = None
+    import msvcrt
+
+
+class OwnerLock:
+    """Non-blocking exclusive lock on a file, held until release() or the process exits."""
+
+    def __init__(self, path):
+        self.path = path
+        self._file = None
+
+    def try_acquire(self):
+        directory = os.path.dirname(self.path)
+        if directory:
+            os.makedirs(directory, exist_ok=True)
+        f = open(self.path, 'a+')
+        try:
+            if fcntl is not None:
+                fcntl.flock(f.fileno(), fcntl.LOCK_EX | fcntl.LOCK_NB)
+            else:
+                f.seek(0)
+                msvcrt.locking(f.fileno(), msvcrt.LK_NBLCK, 1)
+        except OSError:
+            f.close()
+            return False
+        f.seek(0)
+        f.truncate()
+        f.write(str(os.getpid()))
+        f.flush()
+        self._file = f
+        return True
+
+    def release(self):
+        if self._file is not None:
+            self._file.close()  # closing drops the lock
+            self._file = None
+
+
+class AttendanceJournal:
+    """Append-only journal of marks, fsynced in groups.
+
+    Each record is one line ``<crc32> <json row>``; a torn or corrupt tail is
+    ignored on read. write() returns a sequence number and wait_durable()
+    blocks until that record is on disk. The first waiter becomes the leader:
+    it waits ``group_window`` seconds so concurrent marks can join, then
+    issues one fsync for everyone. checkpoint() runs a callback (which must
+    make the main store durable) and then empties the journal.
+
+    A journal has one writer: acquire() takes an exclusive lock on
+    ``<path>.lock`` that is held until close(), so no other process replays
+    or truncates records it has not made durable yet.
+    """
+
+    def __init__(self, path, group_window=None, checkpoint_rows=None, checkpoint_interval=None):
+        self.path = path
+        self.group_window = config.ATTENDANCE_JOURNAL_GROUP_WINDOW if group_window is None else group_window
+        self.checkpoint_rows = checkpoint_rows or config.ATTENDANCE_CHECKPOINT_ROWS
+        self.checkpoint_interval = (config.ATTENDANCE_CHECKPOINT_INTERVAL
+                                    if checkpoint_interval is None else checkpoint_interval)
+        self._cond = threading.Condition()
+        self._file = None
+        self._written = 0
+        self._durable = 0
+        self._syncing = False
+        self._rows = 0
+        self._last_checkpoint = time.monotonic()
+        self._owner_lock = None
+        self.stats = {'records': 0, 'fsyncs': 0, 'checkpoints': 0}
+
+    def acquire(self):
+        """Become the journal's writer; False if another process already is."""
+        if self._owner_lock is None:
+            lock = OwnerLock(f"{self.path}.lock")
+            if not lock.try_acquire():
+                return False
+            self._owner_lock = lock
+        return True
+
+    def _open(self):
+        if self._file is None:
+            directory = os.path.dirname(self.path)
+            if directory:
+                os.makedirs(directory, exist_ok=True)
+            self._file = open(self.path, 'a', encoding='utf-8', newline='\n')
+
+    @staticmethod
+    def _encode(row):
+        payload = json.dumps(row, separators=(',', ':'), ensure_ascii=False)
+        return f"{zlib.crc32(payload.encode('utf-8')):08x} {payload}\n"
+
+    def read(self):
+        """Rows recorded since the last checkpoint, stopping at the first torn or corrupt line."""
+        if not os.path.exists(self.path):
+            return []
+        rows = []
+        with open(self.path, encoding='utf-8', errors='replace', newline='\n') as f:
+            for line in f:
+                if not line.endswith('\n'):
+                    break
+                crc, _, payload = line[:-1].partition(' ')
+                try:
+                    if int(crc, 16) != zlib.crc32(payload.encode('utf-8')):
+                        break
+                    rows.append(json.loads(payload))
+                except ValueError:
+                    break
+        return rows
+
+    def write(self, rows):
+        """Append rows (flushed, not yet fsynced); returns the sequence number to wait on."""
+        with self._cond:
+            self._open()
+            self._file.write(''.join(self._encode(row) for row in rows))
+            self._file.flush()
+            self._written += 1
+            self._rows += len(rows)
+            self.stats['records'] += len(rows)
+            return self._written
+
+    def wait_durable(self, seq):
+        """Block until record ``seq`` has been fsynced (sharing the fsync with concurrent writers)."""
+        with self._cond:
+            while self._durable < seq:
+                if self._syncing:
+                    self._cond.wait()
+                    continue
+                self._syncing = True
+                try:
+                    if self.group_window:
+                        # Give concurrent marks a moment to join this fsync
+                        self._cond.wait(self.group_window)
+                    target = self._written
+                    fd = self._file.fileno()
+                    self._cond.release()
+                    try:
+                        os.fsync(fd)
+                    finally:
+                        self._cond.acquire()
+                    self._durable = max(self._durable, target)
+                    self.stats['fsyncs'] += 1
+                finally:
+                    self._syncing = False
+                    self._cond.notify_all()
+
+    def checkpoint_due(self):
+        return self._rows and (self._rows >= self.checkpoint_rows or
+                               time.monotonic() - self._last_checkpoint >= self.checkpoint_interval)
+
+    def checkpoint(self, flush_store):
+        """Make the store durable via ``flush_store()``, then empty the journal."""
+        with self._cond:
+            while self._syncing:
+                self._cond.wait()
+            flush_store()
+            self._open()
+            self._file.truncate(0)
+            self._file.flush()
+            os.fsync(self._file.fileno())
+            self._durable = self._written
+            self._rows = 0
+            self._last_checkpoint = time.monotonic()
+            self.stats['checkpoints'] += 1
+
+    def close(self):
+        with self._cond:
+            while self._syncing:
+                self._cond.wait()
+            if self._file is not None:
+                self._file.close()
+                self._file = None
+            if self._owner_lock is not None:
+                self._owner_lock.release()
+                self._owner_lock = None
@@ -0,0 +1,175 @@
+#!/usr/bin/env python3
+"""
+Append-only attendance log with batched fsync
+"""
+import csv
+import os
+import threading
+import time
+
+import config
+
+ATTENDANCE_COLUMNS = ["Name", "Time", "Date", "Time_Only", "Source"]
+
+
+class AttendanceLog:
+    """Appends one CSV row per mark instead of rewriting the whole file.
+
+    Rows are flushed to the OS on every append and fsynced in batches (every
+    ``fsync_batch`` rows or ``fsync_interval`` seconds, whichever comes
+    first). Rewriting the file (compaction) and spreadsheet export are
+    separate, on-demand operations.
+    """
+
+    def __init__(self, path, columns=None, fsync_batch=None, fsync_interval=None):
+        self.path = path
+        self.fsync_batch = fsync_batch or config.ATTENDANCE_FSYNC_BATCH
+        self.fsync_interval = config.ATTENDANCE_FSYNC_INTERVAL if fsync_interval is None else fsync_interval
+        self._lock = threading.Lock()
+        self._file = None
+        self._writer = None
+        self._unsynced = 0
+        self._last_sync = time.monotonic()
+        wanted = list(columns or ATTENDANCE_COLUMNS)
+        header = self._read_header()
+        if header:
+            missing = [column for column in wanted if column not in header]
+            if missing:
+                self._upgrade_header(header, missing)
+                header = header + missing
+        self.columns = header or wanted
+
+    def _read_header(self):
+        """Return the existing file's header so appended rows line up with it."""
+        if not os.path.exists(self.path) or os.path.getsize(self.path) == 0:
+            return None
+        with open(self.path, newline='', encoding='utf-8') as f:
+            header = next(csv.reader(f), None)
+        return header or None
+
+    def _upgrade_header(self, header, missing):
+        """Rewrite a file written with an older column set, appending the new (empty) columns.
+        
+        Otherwise appended marks would silently lose those fields.
+        """
+        tmp_path = f"{self.path}.tmp"
+        with open(self.path, newline='', encoding='utf-8') as src, \
+                open(tmp_path, 'w', newline='', encoding='utf-8') as dst:
+            reader = csv.reader(src)
+            writer = csv.writer(dst)
+            next(reader, None)
+            writer.writerow(header + missing)
+            for row in reader:
+                if row:
+                    writer.writerow(row + [''] * (len(header) + len(missing) - len(row)))
+            dst.flush()
+            os.fsync(dst.fileno())
+        os.replace(tmp_path, self.path)
+        print(f"Upgraded {self.path}: added column(s) {', '.join(missing)}")
+
+    def _open(self):
+        if self._file is not None:
+            return
+        directory = os.path.dirname(self.path)
+        if directory:
+            os.makedirs(directory, exist_ok=True)
+        needs_header = not os.path.exists(self.path) or os.path.getsize(self.path) == 0
+        needs_newline = False
+        if not needs_header:
+            with open(self.path, 'rb') as f:
+                f.seek(-1, os.SEEK_END)
+                needs_newline = f.read(1) not in (b'\n', b'\r')
+        self._file = open(self.path, 'a', newline='', encoding='utf-8')
+        self._writer = csv.writer(self._file)
+        if needs_header:
+            self._writer.writerow(self.columns)
+        elif needs_newline:
+            # Don't glue the first appended row onto a truncated last line
+            self._file.write('\n')
+
+    def drop_partial_tail(self):
+        """Cut an unterminated last line (a torn append); returns the bytes removed."""
+        with self._lock:
+            if self._file is not None or not os.path.exists(self.path) or os.path.getsize(self.path) == 0:
+                return b''
+            with open(self.path, 'rb+') as f:
+                f.seek(0, os.SEEK_END)
+                size = f.tell()
+                f.seek(max(0, size - 65536))
+                tail = f.read()
+                if tail.endswith((b'\n', b'\r')):
+                    return b''
+                cut = tail.rfind(b'\n') + 1
+                if cut == 0 and size > len(tail):
+                    return b''
+                f.truncate(size - len(tail) + cut)
+                os.fsync(f.fileno())
+                return tail[cut:]
+
+    def append(self, row):
+        """Append one mark given as a dict keyed by column name."""
+        self.append_many([row])
+
+    def append_many(self, rows):
+        """Append several marks with a single flush.
+
+        Returns the file's (size before, size after) in bytes; other writers'
+        appends may lie before the first.
+        """
+        with self._lock:
+            self._open()
+            self._file.flush()
+            start = os.fstat(self._file.fileno()).st_size
+            for row in rows:
+                self._writer.writerow([row.get(column, '') for column in self.columns])
+            self._file.flush()
+            end = os.fstat(self._file.fileno()).st_size
+            self._unsynced += len(rows)
+            if self._unsynced >= self.fsync_batch or time.monotonic() - self._last_sync >= self.fsync_interval:
+                self._sync_locked()
+            return start, end
+
+    def _sync_locked(self):
+        if self._file is not None and self._unsynced:
+            os.fsync(self._file.fileno())
+        self._unsynced = 0
+        self._last_sync = time.monotonic()
+
+    def sync(self):
+        """Force buffered rows to disk."""
+        with self._lock:
+            self._sync_locked()
+
+    def close(self):
+        with self._lock:
+            self._sync_locked()
+            if self._file is not None:
+                self._file.close()
+                self._file = None
+                self._writer = None
+
+    def compact(self, df):
+        """Rewrite the log from a DataFrame atomically (temp file + rename)."""
+        with self._lock:
+            if self._file is not None:
+                self._sync_locked()
+                self._file.close()
+                self._file = None
+                self._writer = None
+            columns = [c for c in self.columns if c in df.columns] or list(df.columns)
+            tmp_path = f"{self.path}.tmp"
+            df.to_csv(tmp_path, index=False, columns=columns)
+            with open(tmp_path, 'rb') as f:
+                os.fsync(f.fileno())
+            os.replace(tmp_path, self.path)
+            self.columns = columns
+
+
+def export_spreadsheet(df, path):
+    """Write a DataFrame to XLSX via a temp file so readers never see a partial workbook."""
+    directory = os.path.dirname(path)
+    if directory:
+        os.makedirs(directory, exist_ok=True)
+    tmp_path = f"{path}.tmp.xlsx"
+    df.to_excel(tmp_path, index=False)
+    os.replace(tmp_path, path)
@@ -0,0 +1,375 @@
+#!/usr/bin/env python3
+"""
+Month-partitioned attendance storage with partition pruning
+"""
+import atexit
+import os
+import re
+import sys
+import threading
+from collections import OrderedDict
+from datetime import date, datetime
+
+import pandas as pd
+
+import config
+from attendance_journal import AttendanceJournal
+from attendance_log import AttendanceLog, ATTENDANCE_COLUMNS
+
+PARTITION_PATTERN = re.compile(r"^(\d{4}-\d{2})\.csv$")
+UNDATED_PARTITION = "undated"
+
+
+def partition_key(day):
+    """Partition key ("YYYY-MM") for a date, datetime or "YYYY-MM-DD..." string."""
+    if isinstance(day, (date, datetime)):
+        return day.strftime("%Y-%m")
+    day = str(day)
+    return day[:7] if re.match(r"^\d{4}-\d{2}", day) else UNDATED_PARTITION
+
+
+def read_partition_csv(path):
+    """Read one partition as strings, filling Date/Time_Only from Time where missing."""
+    df = pd.read_csv(path, dtype=str, keep_default_na=False)
+    for column in ATTENDANCE_COLUMNS:
+        if column not in df.columns:
+            df[column] = ""
+    missing_date = df["Date"] == ""
+    df.loc[missing_date, "Date"] = df.loc[missing_date, "Time"].str[:10]
+    missing_time = df["Time_Only"] == ""
+    df.loc[missing_time, "Time_Only"] = df.loc[missing_time, "Time"].str[11:]
+    return df[ATTENDANCE_COLUMNS]
+
+
+def day_key(times):
+    """Integer YYYYMMDD day keys for a datetime64 Series (0 where the time is missing)."""
+    keys = times.dt.year * 10000 + times.dt.month * 100 + times.dt.day
+    return keys.fillna(0).astype("int32")
+
+
+def iter_typed_chunks(path, chunksize=None):
+    """Read one partition as typed chunks with a single datetime parse per chunk.
+
+    Only Name, Time and Source are read; Date/Time_Only are derived from Time.
+    Large files are read ATTENDANCE_CSV_CHUNK_ROWS rows at a time so the raw
+    string columns never exist in full.
+    """
+    chunksize = chunksize or config.ATTENDANCE_CSV_CHUNK_ROWS
+    reader = pd.read_csv(path, usecols=lambda column: column in ("Name", "Time", "Source"),
+                         dtype=str, keep_default_na=False, chunksize=chunksize)
+    for chunk in reader:
+        yield typed_attendance_frame(chunk)
+
+
+def typed_attendance_frame(chunk):
+    """Convert raw Name/Time[/Source] strings to typed columns.
+
+    Time becomes datetime64 (microseconds and unparseable cells are dropped
+    to the second / NaT), Day an int32 YYYYMMDD key and Source a category.
+    """
+    times = pd.to_datetime(chunk["Time"].str[:19], format="%Y-%m-%d %H:%M:%S", errors="coerce")
+    source = chunk["Source"] if "Source" in chunk.columns else pd.Series("", index=chunk.index)
+    return pd.DataFrame({
+        "Name": chunk["Name"].astype(object),
+        "Time": times,
+        "Day": day_key(times),
+        "Source": source.astype("category"),
+    })
+
+
+class PartitionedAttendanceStore:
+    """Attendance history split into one append-only CSV per month.
+
+    Range reads only open partitions overlapping the range. Past months are
+    treated as immutable and cached (validated by mtime/size, so a late
+    back-dated mark still invalidates them). Startup only needs the current
+    month. A legacy single attendance.csv is split into partitions once; the
+    split is staged in a temp directory, moved into place and then recorded
+    by a marker file, so an interrupted split is redone on the next start.
+
+    With the journal enabled, marks are written to the partitions (flushed
+    only) and to a write-ahead journal whose group-committed fsync makes them
+    durable. Checkpoints fsync the partitions and empty the journal; on
+    startup any journaled marks missing from the partitions are replayed.
+    Only the store holding the journal's lock uses it; another store on the
+    same directory fsyncs its partitions on every append instead. With the
+    journal disabled, partitions are fsynced in batches (ATTENDANCE_FSYNC_BATCH
+    rows or ATTENDANCE_FSYNC_INTERVAL seconds), so recent marks can be lost
+    in a crash.
+    """
+
+    def __init__(self, data_dir="data", legacy_file=None, reader=None, cache_size=None, journal=None,
+                 combine=None):
+        self.data_dir = data_dir
+        self.partition_dir = os.path.join(data_dir, config.ATTENDANCE_PARTITION_DIR)
+        self.reader = reader or read_partition_csv
+        # How read_range/read_all join partitions; must match what reader returns
+        self.combine = combine or (lambda frames: pd.concat(frames, ignore_index=True))
+        self.cache_size = cache_size or config.ATTENDANCE_PARTITION_CACHE_SIZE
+        self._cache = OrderedDict()
+        self._logs = {}
+        self._lock = threading.RLock()
+
+        legacy_file = legacy_file or os.path.join(data_dir, "attendance.csv")
+        os.makedirs(self.partition_dir, exist_ok=True)
+        # Only the marker says the split happened; the directory may exist for other reasons
+        self.migration_marker = os.path.join(self.partition_dir, config.ATTENDANCE_MIGRATION_MARKER)
+        if not os.path.exists(self.migration_marker):
+            self._migrate_legacy(legacy_file)
+
+        self.journal = None
+        self._fsync_each = False
+        if config.ATTENDANCE_JOURNAL_ENABLED if journal is None else journal:
+            journal = AttendanceJournal(os.path.join(self.partition_dir, config.ATTENDANCE_JOURNAL_FILE))
+            if journal.acquire():
+                self.journal = journal
+                self._recover()
+                atexit.register(self.close)
+            else:
+                # Marks must still be on disk before they are acknowledged
+                self._fsync_each = True
+                print(f"{journal.path} is in use by another process; "
+                      f"this store fsyncs every append to its partitions instead.")
+
+    def migrated(self):
+        """True once the legacy attendance.csv (if any) has been split into partitions."""
+        return os.path.exists(self.migration_marker)
+
+    def _migrate_legacy(self, legacy_file):
+        """Split legacy_file into partitions, then write the migration marker.
+
+        Rows already in a partition (marks made before the marker existed, or
+        a previous split that was interrupted) are merged in, not replaced;
+        a (Name, Time) pair is kept once. Without the marker this is retried
+        on the next start, and legacy_file must not be overwritten until then
+        (see migrated()).
+        """
+        if os.path.exists(legacy_file):
+            staging = os.path.join(self.partition_dir, f".migrating-{os.getpid()}")
+            try:
+                df = read_partition_csv(legacy_file)
+                os.makedirs(staging, exist_ok=True)
+                staged = []
+                for key, rows in df.groupby(df["Time"].map(partition_key), sort=True):
+                    path = self.partition_path(key)
+                    if os.path.exists(path) and os.path.getsize(path) > 0:
+                        rows = pd.concat([read_partition_csv(path), rows], ignore_index=True)
+                        # Exported snapshots drop sub-second digits, so compare to the second
+                        rows = rows[~pd.DataFrame({"Name": rows["Name"], "Time": rows["Time"].str[:19]}).duplicated()]
+                    staged_path = os.path.join(staging, os.path.basename(path))
+                    rows.to_csv(staged_path, index=False)
+                    with open(staged_path, "rb") as f:
+                        os.fsync(f.fileno())
+                    staged.append((staged_path, path))
+                for staged_path, path in staged:
+                    os.replace(staged_path, path)
+                os.rmdir(staging)
+            except Exception as e:
+                print(f"Could not migrate {legacy_file} into partitions: {e}")
+                return
+            print(f"Split {len(df)} attendance rows from {legacy_file} into monthly partitions.")
+        with open(self.migration_marker, "w") as f:
+            f.write(f"{datetime.now().isoformat(timespec='seconds')} {legacy_file}\n")
+            f.flush()
+            os.fsync(f.fileno())
+
+    def _recover(self):
+        """Replay journaled marks that did not reach their partition before a crash.
+
+        Runs under the journal's lock, so every record is this directory's
+        previous writer's; the journal is emptied only after the partitions
+        the records were replayed into are fsynced.
+        """
+        rows = self.journal.read()
+        if not rows:
+            # Nothing to replay; drop any torn tail so new records aren't appended after it
+            self.journal.checkpoint(lambda: None)
+            return
+        replayed = 0
+        by_key = {}
+        for row in rows:
+            by_key.setdefault(partition_key(row["Date"] or row["Time"]), []).append(row)
+        for key, key_rows in by_key.items():
+            log = self.log_for(key)
+            torn = log.drop_partial_tail()
+            if torn:
+                print(f"Dropped a torn row from {log.path}: {torn!r}")
+            path = self.partition_path(key)
+            present = set()
+            if os.path.exists(path) and os.path.getsize(path) > 0:
+                df = read_partition_csv(path)
+                present = set(zip(df["Name"], df["Time"]))
+            missing = [row for row in key_rows if (row["Name"], row["Time"]) not in present]
+            if missing:
+                log.append_many(missing)
+                replayed += len(missing)
+        self.journal.checkpoint(self._flush_partitions)
+        if replayed:
+            print(f"Recovered {replayed} attendance marks from the journal.")
+
+    def current_key(self):
+        return partition_key(date.today())
+
+    def partition_path(self, key):
+        return os.path.join(self.partition_dir, f"{key}.csv")
+
+    def partitions(self):
+        """Sorted keys of the partitions present on disk."""
+        keys = []
+        for file in os.listdir(self.partition_dir):
+            match = PARTITION_PATTERN.match(file)
+            if match:
+                keys.append(match.group(1))
+        return sorted(keys)
+
+    def has_data(self):
+        return any(os.path.getsize(self.partition_path(key)) > 0 for key in self.partitions())
+
+    def log_for(self, key):
+        with self._lock:
+            log = self._logs.get(key)
+            if log is None:
+                if self.journal is not None:
+                    # The journal provides durability; partitions are fsynced at checkpoints
+                    log = AttendanceLog(self.partition_path(key), fsync_batch=sys.maxsize,
+                                        fsync_interval=float("inf"))
+                elif self._fsync_each:
+                    log = AttendanceLog(self.partition_path(key), fsync_batch=1)
+                else:
+                    log = AttendanceLog(self.partition_path(key))
+                self._logs[key] = log
+            return log
+
+    def append(self, row, wait=True):
+        """Append a mark (dict with Name/Time/Date/Time_Only) to its month's partition."""
+        return self.append_many([row], wait=wait)
+
+    def append_many(self, rows, wait=True, spans=None):
+        """Append marks; returns a ticket for wait_durable() when ``wait`` is False.
+
+        Callers holding their own lock can pass wait=False and call
+        wait_durable() after releasing it, so concurrent marks share an fsync.
+        ``spans``, if given, is filled with {key: (size before, size after)}
+        for each partition written.
+        """
+        by_key = {}
+        for row in rows:
+            by_key.setdefault(partition_key(row["Date"] or row["Time"]), []).append(row)
+        # Partitions first: a checkpoint never empties the journal of rows they don't hold yet
+        for key, key_rows in by_key.items():
+            span = self.log_for(key).append_many(key_rows)
+            if spans is not None:
+                spans[key] = span
+        if self.journal is None:
+            return None
+        ticket = self.journal.write(rows)
+        if self.journal.checkpoint_due():
+            self.checkpoint()
+        if wait:
+            self.wait_durable(ticket)
+        return ticket
+
+    def wait_durable(self, ticket):
+        """Block until the marks behind ``ticket`` are on disk."""
+        if ticket is not None and self.journal is not None:
+            self.journal.wait_durable(ticket)
+
+    def _flush_partitions(self):
+        with self._lock:
+            for log in self._logs.values():
+                log.sync()
+
+    def checkpoint(self):
+        """Fsync the partitions and empty the journal."""
+        if self.journal is not None:
+            self.journal.checkpoint(self._flush_partitions)
+        else:
+            self._flush_partitions()
+
+    def sync(self):
+        self.checkpoint()
+
+    def close(self):
+        self.checkpoint()
+        if self.journal is not None:
+            # Gives up the journal's lock; later calls don't touch it again
+            journal, self.journal = self.journal, None
+            journal.close()
+
+    def read_partition(self, key):
+        """Parsed partition, served from cache while its file is unchanged."""
+        path = self.partition_path(key)
+        if not os.path.exists(path):
+            return None
+        stat = os.stat(path)
+        signature = (stat.st_mtime_ns, stat.st_size)
+        with self._lock:
+            cached = self._cache.get(key)
+            if cached is not None and cached[0] == signature:
+                self._cache.move_to_end(key)
+                return cached[1]
+        log = self._logs.get(key)
+        if log is not None:
+            log.sync()
+        df = self.reader(path)
+        if key != self.current_key():
+            # Only past months are cached; the current month changes with every mark
+            with self._lock:
+                self._cache[key] = (signature, df)
+                self._cache.move_to_end(key)
+                while len(self._cache) > self.cache_size:
+                    self._cache.popitem(last=False)
+        return df
+
+    def load_current(self):
+        return self.read_partition(self.current_key())
+
+    def keys_for_range(self, start, end):
+        """Partition keys overlapping [start, end] (inclusive)."""
+        start_key, end_key = partition_key(start), partition_key(end)
+        return [key for key in self.partitions() if start_key <= key <= end_key]
+
+    def read_range(self, start, end, current=None):
+        """Rows from partitions overlapping [start, end]; the caller filters exact days.
+
+        ``current`` substitutes an in-memory frame for the current month.
+        """
+        frames = []
+        current_key = self.current_key()
+        for key in self.keys_for_range(start, end):
+            if key == current_key and current is not None:
+                frames.append(current)
+                continue
+            df = self.read_partition(key)
+            if df is not None:
+                frames.append(df)
+        frames = [frame for frame in frames if not frame.empty]
+        if not frames:
+            return None
+        return frames[0] if len(frames) == 1 else self.combine(frames)
+
+    def read_all(self, current=None):
+        """Full history (used for exports)."""
+        keys = self.partitions()
+        undated = self.partition_path(UNDATED_PARTITION)
+        frames = []
+        current_key = self.current_key()
+        for key in keys:
+            if key == current_key and current is not None:
+                frames.append(current)
+            else:
+                df = self.read_partition(key)
+                if df is not None:
+                    frames.append(df)
+        if os.path.exists(undated):
+            frames.append(self.reader(undated))
+        frames = [frame for frame in frames if not frame.empty]
+        if not frames:
+            return None
+        return self.combine(frames)
+
+    def compact(self, key, df):
+        """Rewrite one partition atomically."""
+        self.log_for(key).compact(df)
+        with self._lock:
+            self._cache.pop(key, None)
@@ -0,0 +1,386 @@
+#!/usr/bin/env python3
+"""
+Single attendance write path shared by every frontend and process
+"""
+import json
+import os
+import secrets
+import threading
+import time
+from collections import deque
+from datetime import date, datetime
+from multiprocessing import AuthenticationError
+from multiprocessing.connection import Client, Listener
+
+import config
+from attendance_journal import OwnerLock
+
+# Methods a client process may call on the owning process
+SERVICE_METHODS = ("mark_many", "mark_attendance", "get_attendance_stats", "generate_report",
+                   "create_attendance_chart", "export_to_excel", "export_status")
+# Largest request the owner reads from a client
+MAX_REQUEST_BYTES = 1 << 20
+
+
+def service_path(data_dir, name):
+    """Service files live in the data directory itself, outside the partition directory the store manages."""
+    return os.path.join(data_dir, name)
+
+
+def service_authkey(data_dir, create=False):
+    """The per-install key clients authenticate with, read from a file only this user can read.
+
+    The owning process creates it (random, mode 0600) on first use.
+    """
+    path = service_path(data_dir, config.ATTENDANCE_SERVICE_KEY_FILE)
+    if create and not os.path.exists(path):
+        os.makedirs(os.path.dirname(path), exist_ok=True)
+        tmp_path = f"{path}.{os.getpid()}.tmp"
+        fd = os.open(tmp_path, os.O_WRONLY | os.O_CREAT | os.O_TRUNC, 0o600)
+        with os.fdopen(fd, 'w') as f:
+            f.write(secrets.token_hex(32))
+        os.replace(tmp_path, path)
+    with open(path) as f:
+        return f.read().strip().encode()
+
+
+def _to_wire(value):
+    """JSON-safe form of a call's arguments or result (tuples, dates and non-string keys survive)."""
+    if isinstance(value, datetime):
+        return {'__datetime__': value.isoformat()}
+    if isinstance(value, date):
+        return {'__date__': value.isoformat()}
+    if isinstance(value, tuple):
+        return {'__tuple__': [_to_wire(item) for item in value]}
+    if isinstance(value, list):
+        return [_to_wire(item) for item in value]
+    if isinstance(value, dict):
+        if all(isinstance(key, str) for key in value):
+            return {key: _to_wire(item) for key, item in value.items()}
+        return {'__items__': [[_to_wire(key), _to_wire(item)] for key, item in value.items()]}
+    if hasattr(value, 'item'):
+        return value.item()  # numpy scalar
+    return value
+
+
+def _from_wire(value):
+    if isinstance(value, list):
+        return [_from_wire(item) for item in value]
+    if not isinstance(value, dict):
+        return value
+    if len(value) == 1:
+        (tag, item), = value.items()
+        if tag == '__datetime__':
+            return datetime.fromisoformat(item)
+        if tag == '__date__':
+            return date.fromisoformat(item)
+        if tag == '__tuple__':
+            return tuple(_from_wire(element) for element in item)
+        if tag == '__items__':
+            return {_from_wire(key): _from_wire(element) for key, element in item}
+    return {key: _from_wire(item) for key, item in value.items()}
+
+
+def _send(conn, message):
+    conn.send_bytes(json.dumps(_to_wire(message)).encode())
+
+
+def _recv(conn, maxlength=None):
+    return _from_wire(json.loads(conn.recv_bytes(maxlength)))
+
+
+class AttendanceService:
+    """The one place attendance is written.
+
+    Only the process holding the data directory's owner lock creates a
+    service; it keeps the month-partitioned log (the source of truth) and
+    serializes marks with a lock, so dedup sees every earlier mark. The
+    XLSX/CSV snapshots are derived by the manager's background exporter and
+    SQLite is updated as a mirror after each successful mark. Mirror writes
+    that fail are retried, in order, with the next mark, and on startup
+    SQLite is caught up with any partition marks it missed. serve() lets
+    other processes use it through RemoteAttendanceService.
+    """
+
+    def __init__(self, data_dir=None, manager=None, db=None):
+        from simple_advanced_attendance import SimpleAdvancedAttendanceManager
+        self.manager = manager or SimpleAdvancedAttendanceManager(data_dir or config.DATA_DIR)
+        if db is None and config.ATTENDANCE_SQLITE_MIRROR:
+            from database_manager import DatabaseManager
+            db = DatabaseManager(config.DATABASE_PATH)
+        self.db = db
+        self._lock = threading.RLock()
+        # Mirror writes that failed, oldest first; overflow is recovered by the next startup's catch-up
+        self._mirror_backlog = deque(maxlen=config.ATTENDANCE_MIRROR_BACKLOG)
+        self._mirror_lock = threading.Lock()
+        if self.db is not None:
+            self.catch_up_mirror()
+        self._listener = None
+        self.owner_lock = None
+
+    def mark_many(self, names, timestamp=None, source="auto"):
+        """Mark several people; returns {name: (success, message)}."""
+        when = timestamp or datetime.now()
+        with self._lock:
+            results, ticket = self.manager.mark_many(names, timestamp=when, source=source, wait=False)
+        # Wait for the journal fsync outside the lock so concurrent marks share it
+        self.manager.store.wait_durable(ticket)
+        if self.db is not None:
+            marked = [name for name, (success, _) in results.items() if success]
+            self._mirror(marked, list(results), when, source)
+        return results
+
+    def _mirror(self, marked, seen, when, source):
+        """Write one call's marks and sightings to SQLite, after any earlier writes that failed."""
+        with self._mirror_lock:
+            self._mirror_backlog.append((marked, seen, when, source))
+            while self._mirror_backlog:
+                marked, seen, when, source = self._mirror_backlog[0]
+                try:
+                    if marked:
+                        self.db.mark_many(marked, timestamp=when, source=source)
+                    # Every sighting (not just the day's first) opens or closes check-in sessions
+                    self.db.record_presence(seen, timestamp=when, source=source)
+                except Exception as e:
+                    # The partitioned log is authoritative; a failed mirror write does not undo the mark
+                    print(f"Could not mirror attendance to SQLite ({len(self._mirror_backlog)} "
+                          f"writes queued for retry): {e}")
+                    return
+                self._mirror_backlog.popleft()
+
+    def catch_up_mirror(self):
+        """Replay partition marks newer than SQLite's latest one; returns how many were added.
+
+        Covers marks whose mirror write was lost (SQLite unavailable when
+        the process exited, or a backlog overflow). Check-in sessions are
+        not rebuilt, since the log only keeps each person's first mark of the day.
+        """
+        from attendance_partitions import iter_typed_chunks, partition_key
+        try:
+            latest = self.db.latest_mark_time()
+            store = self.manager.store
+            replayed = 0
+            for key in store.partitions():
+                if latest is not None and key < partition_key(latest):
+                    continue
+                for chunk in iter_typed_chunks(store.partition_path(key)):
+                    chunk = chunk[chunk["Time"].notna() & (chunk["Name"] != "")]
+                    if latest is not None:
+                        # Same-second marks are replayed too; the database skips ones it has
+                        chunk = chunk[chunk["Time"] >= latest]
+                    marks = [(name, moment.to_pydatetime(), source or "auto") for name, moment, source
+                             in zip(chunk["Name"], chunk["Time"], chunk["Source"].astype(object))]
+                    if marks:
+                        replayed += self.db.replay_marks(marks)
+        except Exception as e:
+            print(f"Could not catch SQLite up with the attendance log: {e}")
+            return 0
+        if replayed:
+            print(f"Added {replayed} marks from the attendance log that SQLite had missed")
+        return replayed
+
+    def mark_attendance(self, name, source="auto"):
+        return self.mark_many([name], source=source)[name]
+
+    def get_attendance_stats(self, days=30):
+        with self._lock:
+            return self.manager.get_attendance_stats(days)
+
+    def generate_report(self, output_file=None):
+        with self._lock:
+            return self.manager.generate_report(output_file)
+
+    def create_attendance_chart(self):
+        with self._lock:
+            return self.manager.create_simple_chart()
+
+    def export_to_excel(self):
+        """Regenerate attendance.xlsx / attendance.csv now; raises if the export fails."""
+        with self._lock:
+            self.manager.store.sync()
+        status = self.manager.exporter.export_now()
+        if status['last_error']:
+            raise Exception(status['last_error'])
+        return f"Attendance exported to {self.manager.exporter.xlsx_path}"
+
+    def export_status(self):
+        return self.manager.export_status()
+
+    def serve(self, address=None, authkey=None):
+        """Accept calls from other local processes on a background thread.
+
+        Clients must hold the install's authkey (see service_authkey()).
+        """
+        address = address or (config.ATTENDANCE_SERVICE_HOST, config.ATTENDANCE_SERVICE_PORT)
+        try:
+            self._listener = Listener(address, authkey=authkey or service_authkey(self.manager.data_dir, create=True))
+        except OSError as e:
+            print(f"Attendance service not shared with other processes ({address}): {e}")
+            return False
+        threading.Thread(target=self._accept_loop, name="AttendanceService", daemon=True).start()
+        return True
+
+    def _accept_loop(self):
+        while True:
+            try:
+                conn = self._listener.accept()
+            except (OSError, EOFError, AuthenticationError):
+                # Failed handshake (e.g. a wrong key) or closed listener
+                if self._listener is None:
+                    return
+                continue
+            threading.Thread(target=self._handle, args=(conn,), daemon=True).start()
+
+    def _handle(self, conn):
+        # Requests are JSON, never pickles, and only SERVICE_METHODS can be called
+        with conn:
+            while True:
+                try:
+                    request = _recv(conn, MAX_REQUEST_BYTES)
+                except (EOFError, OSError):
+                    return
+                except ValueError as e:
+                    _send(conn, ('error', f"Malformed attendance service request: {e}"))
+                    continue
+                method = request.get('method') if isinstance(request, dict) else None
+                if method not in SERVICE_METHODS:
+                    _send(conn, ('error', f"Unknown attendance service method: {method}"))
+                    continue
+                args, kwargs = request.get('args', []), request.get('kwargs', {})
+                if not isinstance(args, list) or not isinstance(kwargs, dict):
+                    _send(conn, ('error', f"Malformed arguments for {method}"))
+                    continue
+                try:
+                    _send(conn, ('ok', getattr(self, method)(*args, **kwargs)))
+                except Exception as e:
+                    _send(conn, ('error', str(e)))
+
+    def close(self):
+        listener, self._listener = self._listener, None
+        if listener is not None:
+            listener.close()
+
+
+class RemoteAttendanceService:
+    """Client for the AttendanceService owned by another process (same methods).
+
+    If the owner goes away, the first client to take the owner lock hosts
+    the service itself and answers later calls locally.
+    """
+
+    def __init__(self, data_dir=None, address=None, authkey=None, connect_timeout=None):
+        self.data_dir = data_dir or config.DATA_DIR
+        self.address = address or (config.ATTENDANCE_SERVICE_HOST, config.ATTENDANCE_SERVICE_PORT)
+        self.authkey = authkey
+        self.connect_timeout = config.ATTENDANCE_SERVICE_CONNECT_TIMEOUT if connect_timeout is None else connect_timeout
+        self._lock = threading.Lock()
+        self._conn = None
+        self._local = None
+
+    def _connect(self):
+        deadline = time.monotonic() + self.connect_timeout
+        while True:
+            try:
+                # Re-read each time: a new owner may have just created the key
+                authkey = self.authkey or service_authkey(self.data_dir)
+                return Client(self.address, authkey=authkey)
+            except OSError:
+                # The owner may still be starting up
+                if time.monotonic() >= deadline:
+                    raise ConnectionError(f"Attendance service is not reachable at {self.address}")
+                time.sleep(0.1)
+
+    def _call(self, method, *args, **kwargs):
+        if self._local is not None:
+            return getattr(self._local, method)(*args, **kwargs)
+        try:
+            return self._call_remote(method, args, kwargs)
+        except ConnectionError:
+            service = _take_over(self.data_dir)
+            if service is None:
+                # Another process took over; it may still be starting up
+                return self._call_remote(method, args, kwargs)
+            print("Attendance service owner went away; hosting the service in this process.")
+            self._local = service
+            return getattr(service, method)(*args, **kwargs)
+
+    def _call_remote(self, method, args, kwargs):
+        with self._lock:
+            for attempt in (1, 2):
+                if self._conn is None:
+                    self._conn = self._connect()
+                try:
+                    _send(self._conn, {'method': method, 'args': list(args), 'kwargs': kwargs})
+                    status, result = _recv(self._conn)
+                    break
+                except (EOFError, OSError):
+                    self._conn = None
+                    if attempt == 2:
+                        raise ConnectionError("Lost connection to the attendance service")
+        if status == 'error':
+            raise Exception(result)
+        return result
+
+    def mark_many(self, names, timestamp=None, source="auto"):
+        return self._call("mark_many", list(names), timestamp=timestamp, source=source)
+
+    def mark_attendance(self, name, source="auto"):
+        return self._call("mark_attendance", name, source=source)
+
+    def get_attendance_stats(self, days=30):
+        return self._call("get_attendance_stats", days)
+
+    def generate_report(self, output_file=None):
+        return self._call("generate_report", output_file)
+
+    def create_attendance_chart(self):
+        return self._call("create_attendance_chart")
+
+    def export_to_excel(self):
+        return self._call("export_to_excel")
+
+    def export_status(self):
+        return self._call("export_status")
+
+
+_service = None
+_service_lock = threading.Lock()
+
+
+def _host_service(data_dir):
+    """Take the data directory's owner lock and host the service here; None if another process holds it."""
+    lock = OwnerLock(service_path(data_dir, config.ATTENDANCE_SERVICE_LOCK_FILE))
+    if not lock.try_acquire():
+        return None
+    service = AttendanceService(data_dir)
+    service.owner_lock = lock
+    if config.ATTENDANCE_SERVICE_ENABLED:
+        service.serve()
+    return service
+
+
+def _take_over(data_dir):
+    """Host the service in this process after its owner exited (None if another process got there first)."""
+    global _service
+    with _service_lock:
+        if isinstance(_service, AttendanceService):
+            return _service
+        service = _host_service(data_dir)
+        if service is not None:
+            _service = service
+        return service
+
+
+def get_attendance_service(data_dir=None):
+    """The attendance service for this process.
+
+    The first process to take the owner lock on the data directory hosts the
+    service (and shares it over a local socket); every other process gets a
+    RemoteAttendanceService talking to it.
+    """
+    global _service
+    with _service_lock:
+        if _service is None:
+            data_dir = data_dir or config.DATA_DIR
+            _service = _host_service(data_dir) or RemoteAttendanceService(data_dir)
+        return _service
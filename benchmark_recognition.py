@@ -0,0 +1,339 @@
+#!/usr/bin/env python3
+"""
+Headless recognition benchmark: throughput, latency, memory and accuracy
+
+The gallery is fixed by the command line, never the live registrations:
+  --gallery DIR     enroll DIR/<identity>/<image> (the first image with a face per identity)
+  --data-dir DIR    or load a fixture directory of <identity>.npy encodings
+A fingerprint of the gallery is stored with the results, and a baseline
+recorded against a different gallery is refused.
+
+Inputs (any combination):
+  --images DIR      DIR/<identity>/*.jpg|png, identity "unknown" for unregistered people
+  --clips DIR       DIR/<identity>/*.mp4|avi (or DIR/<identity>.mp4), every Nth frame is used
+  --synthetic-frames N   random frames with no faces (pure detection cost)
+  --synthetic-gallery N  pad the registered gallery with N random identities
+
+Timings are taken with tracemalloc off; Python heap peaks come from a
+separate, untimed pass over the first --memory-frames inputs.
+
+Results can be saved as a baseline and later runs compared against it:
+  python benchmark_recognition.py --gallery bench/gallery --images bench/faces --save-baseline data/benchmark_baseline.json
+  python benchmark_recognition.py --gallery bench/gallery --images bench/faces --baseline data/benchmark_baseline.json
+"""
+import argparse
+import hashlib
+import itertools
+import json
+import os
+import platform
+import resource
+import sys
+import tempfile
+import time
+import tracemalloc
+
+import cv2
+import numpy as np
+
+import config
+from face_recognition_module import FaceRecognitionModule
+
+IMAGE_EXTENSIONS = ('.jpg', '.jpeg', '.png', '.bmp')
+CLIP_EXTENSIONS = ('.mp4', '.avi', '.mov', '.mkv')
+
+# Metric name -> True if higher is better; used for regression checks
+TRACKED_METRICS = {
+    'detection_fps': True,
+    'encoding_faces_per_sec': True,
+    'matching_probes_per_sec': True,
+    'latency_p50_ms': False,
+    'latency_p95_ms': False,
+    'accuracy': True,
+    'peak_rss_mb': False,
+}
+
+
+def iter_labeled_images(root):
+    """Yield (identity, frame) from DIR/<identity>/<image>."""
+    for identity in sorted(os.listdir(root)):
+        folder = os.path.join(root, identity)
+        if not os.path.isdir(folder):
+            continue
+        for file in sorted(os.listdir(folder)):
+            if file.lower().endswith(IMAGE_EXTENSIONS):
+                frame = cv2.imread(os.path.join(folder, file))
+                if frame is not None:
+                    yield identity, frame
+
+
+def iter_labeled_clips(root, frame_step):
+    """Yield (identity, frame) from recorded clips, sampling every frame_step frames."""
+    clips = []
+    for entry in sorted(os.listdir(root)):
+        path = os.path.join(root, entry)
+        if os.path.isdir(path):
+            clips.extend((entry, os.path.join(path, f)) for f in sorted(os.listdir(path))
+                         if f.lower().endswith(CLIP_EXTENSIONS))
+        elif entry.lower().endswith(CLIP_EXTENSIONS):
+            clips.append((os.path.splitext(entry)[0], path))
+
+    for identity, path in clips:
+        cap = cv2.VideoCapture(path)
+        index = 0
+        while True:
+            ret, frame = cap.read()
+            if not ret:
+                break
+            if index % frame_step == 0:
+                yield identity, frame
+            index += 1
+        cap.release()
+
+
+def iter_synthetic_frames(count, rng):
+    """Yield (None, frame) random frames at the configured camera resolution."""
+    shape = (config.CAMERA_HEIGHT, config.CAMERA_WIDTH, 3)
+    for _ in range(count):
+        yield None, rng.integers(0, 256, size=shape, dtype=np.uint8)
+
+
+def enroll_gallery(module, root):
+    """Replace the module's gallery with one encoding per DIR/<identity>, from its first image with a face."""
+    import face_recognition
+
+    module.known_face_encodings = []
+    module.known_face_names = []
+    enrolled = set()
+    for identity, frame in iter_labeled_images(root):
+        if identity in enrolled or identity.lower() == "unknown":
+            continue
+        encodings = face_recognition.face_encodings(frame[:, :, ::-1], num_jitters=config.NUM_JITTERS)
+        if encodings:
+            module.known_face_encodings.append(encodings[0])
+            module.known_face_names.append(identity)
+            enrolled.add(identity)
+    if not enrolled:
+        raise ValueError(f"No faces found to enroll in {root}")
+
+
+def gallery_fingerprint(module):
+    """SHA-256 over the gallery's names and encodings (order-independent)."""
+    digest = hashlib.sha256()
+    for name, encoding in sorted(zip(module.known_face_names, module.known_face_encodings), key=lambda item: item[0]):
+        digest.update(name.encode('utf-8') + b'\0')
+        digest.update(np.asarray(encoding, dtype=np.float64).tobytes())
+    return digest.hexdigest()
+
+
+def add_synthetic_gallery(module, size, rng):
+    """Pad the known encodings with random identities far from real faces."""
+    if size <= 0:
+        return
+    encodings = rng.normal(0.0, 0.1, size=(size, 128))
+    module.known_face_encodings.extend(encodings)
+    module.known_face_names.extend(f"synthetic_{i:06d}" for i in range(size))
+
+
+def benchmark_matching(module, probes, rng):
+    """Time gallery matching alone for a batch of random probe encodings."""
+    import face_recognition
+
+    if not module.known_face_encodings or probes <= 0:
+        return 0.0
+    queries = rng.normal(0.0, 0.1, size=(probes, 128))
+    start = time.perf_counter()
+    for query in queries:
+        distances = face_recognition.face_distance(module.known_face_encodings, query)
+        np.argmin(distances)
+    elapsed = time.perf_counter() - start
+    return probes / elapsed if elapsed > 0 else 0.0
+
+
+def iter_inputs(args):
+    """All benchmark inputs as (identity, frame); synthetic frames are the same on every call."""
+    sources = []
+    if args.images:
+        sources.append(iter_labeled_images(args.images))
+    if args.clips:
+        sources.append(iter_labeled_clips(args.clips, args.clip_frame_step))
+    if args.synthetic_frames:
+        sources.append(iter_synthetic_frames(args.synthetic_frames, np.random.default_rng(args.seed)))
+    return itertools.chain.from_iterable(sources)
+
+
+def measure_python_peak(module, args):
+    """Peak Python heap (MB) over the first --memory-frames inputs, traced in an untimed pass."""
+    if args.memory_frames <= 0:
+        return None
+    module.timer.disable()
+    tracemalloc.start()
+    try:
+        for _, frame in itertools.islice(iter_inputs(args), args.memory_frames):
+            module.process_frame(cv2.flip(frame, 1))
+        _, peak = tracemalloc.get_traced_memory()
+    finally:
+        tracemalloc.stop()
+    return peak / (1024 * 1024)
+
+
+def run_benchmark(args):
+    rng = np.random.default_rng(args.seed)
+    if args.gallery:
+        # An empty directory, so nothing registered on this machine leaks into the gallery
+        module = FaceRecognitionModule(data_dir=tempfile.mkdtemp(prefix="benchmark_gallery_"))
+        enroll_gallery(module, args.gallery)
+    else:
+        module = FaceRecognitionModule(data_dir=args.data_dir)
+    add_synthetic_gallery(module, args.synthetic_gallery, rng)
+
+    timer = module.timer
+    timer.enable()
+    timer.reset()
+    timer.start_session()
+
+    latencies = []
+    frames = faces = labeled = correct = 0
+    for identity, frame in iter_inputs(args):
+        start = time.perf_counter()
+        with timer.stage("flip"):
+            frame = cv2.flip(frame, 1)
+        results = module.process_frame(frame)
+        latencies.append(time.perf_counter() - start)
+
+        frames += 1
+        faces += len(results)
+        if identity is None:
+            continue
+        # Score the most confident face per labeled frame
+        labeled += 1
+        predicted = min(results, key=lambda r: r[2] if r[2] is not None else 1e9)[1] if results else "Unknown"
+        expected = "Unknown" if identity.lower() == "unknown" else identity
+        if predicted == expected:
+            correct += 1
+
+    session = timer.end_session()
+    matching = benchmark_matching(module, args.matching_probes, rng)
+    # ru_maxrss is reported in kilobytes on Linux; read before tracemalloc adds its own overhead
+    peak_rss_mb = resource.getrusage(resource.RUSAGE_SELF).ru_maxrss / 1024.0
+    python_peak_mb = measure_python_peak(module, args)
+
+    stages = session['stages'] if session else {}
+    detect = stages.get('detect', {})
+    encode = stages.get('encode', {})
+    match = stages.get('match', {})
+    latencies_ms = sorted(l * 1000.0 for l in latencies)
+
+    def pct(p):
+        if not latencies_ms:
+            return 0.0
+        return latencies_ms[min(len(latencies_ms) - 1, int(round(p / 100.0 * (len(latencies_ms) - 1))))]
+
+    return {
+        'frames': frames,
+        'faces': faces,
+        'gallery_size': len(module.known_face_encodings),
+        'gallery_fingerprint': gallery_fingerprint(module),
+        'detection_fps': detect.get('count', 0) / (detect['total_ms'] / 1000.0) if detect.get('total_ms') else 0.0,
+        'encoding_faces_per_sec': faces / (encode['total_ms'] / 1000.0) if encode.get('total_ms') else 0.0,
+        'match_stage_mean_ms': match.get('mean_ms', 0.0),
+        'matching_probes_per_sec': matching,
+        'latency_p50_ms': pct(50),
+        'latency_p95_ms': pct(95),
+        'latency_p99_ms': pct(99),
+        'accuracy': correct / labeled if labeled else None,
+        'labeled_frames': labeled,
+        'python_peak_mb': python_peak_mb,
+        'peak_rss_mb': peak_rss_mb,
+        'stages': stages,
+        'environment': {
+            'python': platform.python_version(),
+            'machine': platform.machine(),
+            'model': config.FACE_RECOGNITION_MODEL,
+            'seed': args.seed,
+        },
+    }
+
+
+def compare_to_baseline(results, baseline, tolerance):
+    """Return a list of human-readable regressions beyond the relative tolerance."""
+    regressions = []
+    for metric, higher_is_better in TRACKED_METRICS.items():
+        old, new = baseline.get(metric), results.get(metric)
+        if not old or new is None:
+            continue
+        change = (new - old) / old
+        if (higher_is_better and change < -tolerance) or (not higher_is_better and change > tolerance):
+            regressions.append(f"{metric}: {old:.3f} -> {new:.3f} ({change:+.1%})")
+    return regressions
+
+
+def print_results(results):
+    print("RECOGNITION BENCHMARK")
+    print("=====================")
+    print(f"Frames: {results['frames']}  Faces: {results['faces']}  Gallery: {results['gallery_size']}")
+    print(f"Detection:  {results['detection_fps']:.1f} FPS")
+    print(f"Encoding:   {results['encoding_faces_per_sec']:.1f} faces/s")
+    print(f"Matching:   {results['matching_probes_per_sec']:.0f} probes/s")
+    print(f"Latency:    p50 {results['latency_p50_ms']:.1f} ms  p95 {results['latency_p95_ms']:.1f} ms  p99 {results['latency_p99_ms']:.1f} ms")
+    accuracy = results['accuracy']
+    print(f"Accuracy:   {'n/a' if accuracy is None else f'{accuracy:.1%}'} ({results['labeled_frames']} labeled frames)")
+    python_peak = results['python_peak_mb']
+    print(f"Memory:     peak RSS {results['peak_rss_mb']:.1f} MB, "
+          f"Python peak {'n/a' if python_peak is None else f'{python_peak:.1f} MB'}")
+    print(f"Gallery:    {results['gallery_fingerprint'][:16]}")
+
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(description="Headless face recognition benchmark")
+    parser.add_argument('--images', help="Directory of <identity>/<image> files")
+    parser.add_argument('--clips', help="Directory of recorded clips per identity")
+    parser.add_argument('--clip-frame-step', type=int, default=config.FRAME_SKIP)
+    parser.add_argument('--synthetic-frames', type=int, default=0)
+    parser.add_argument('--synthetic-gallery', type=int, default=0)
+    parser.add_argument('--matching-probes', type=int, default=1000)
+    gallery = parser.add_mutually_exclusive_group(required=True)
+    gallery.add_argument('--gallery', help="Directory of <identity>/<image> files to enroll as the gallery")
+    gallery.add_argument('--data-dir', help="Fixture directory of <identity>.npy encodings")
+    parser.add_argument('--memory-frames', type=int, default=50,
+                        help="Inputs replayed under tracemalloc after timing (0 to skip)")
+    parser.add_argument('--seed', type=int, default=0)
+    parser.add_argument('--output', help="Write full results as JSON")
+    parser.add_argument('--save-baseline', help="Store these results as the baseline")
+    parser.add_argument('--baseline', help="Compare against a stored baseline")
+    parser.add_argument('--tolerance', type=float, default=0.10, help="Allowed relative regression (default 10%%)")
+    args = parser.parse_args(argv)
+
+    if not (args.images or args.clips or args.synthetic_frames):
+        parser.error("Provide --images, --clips and/or --synthetic-frames")
+
+    results = run_benchmark(args)
+    print_results(results)
+
+    if args.output:
+        with open(args.output, 'w', encoding='utf-8') as f:
+            json.dump(results, f, indent=2)
+    if args.save_baseline:
+        with open(args.save_baseline, 'w', encoding='utf-8') as f:
+            json.dump(results, f, indent=2)
+        print(f"Baseline saved to {args.save_baseline}")
+
+    if args.baseline:
+        with open(args.baseline, encoding='utf-8') as f:
+            baseline = json.load(f)
+        if baseline.get('gallery_fingerprint') != results['gallery_fingerprint']:
+            print(f"\nBaseline {args.baseline} was recorded against a different gallery; "
+                  f"re-record it with --save-baseline.")
+            return 1
+        regressions = compare_to_baseline(results, baseline, args.tolerance)
+        if regressions:
+            print("\nREGRESSIONS:")
+            for line in regressions:
+                print(f"- {line}")
+            return 1
+        print("\nNo regressions against baseline.")
+    return 0
+
+
+if __name__ == "__main__":
+    sys.exit(main())
@@ -0,0 +1,174 @@
+#!/usr/bin/env python3
+"""
+Persistent camera manager: probes devices once, keeps the chosen one warm
+"""
+import atexit
+import threading
+from concurrent.futures import ThreadPoolExecutor
+
+import cv2
+import config
+
+
+def _open_camera(index):
+    """Open a camera index, returning the capture or None if unavailable."""
+    cap = cv2.VideoCapture(index)
+    if cap.isOpened():
+        return cap
+    cap.release()
+    return None
+
+
+class CameraManager:
+    """Shares one open camera between registration and recognition sessions.
+
+    Device probing runs in parallel threads once and is cached. The chosen
+    device stays open between sessions and is only released after it has
+    been idle for ``idle_timeout`` seconds.
+    """
+
+    def __init__(self, idle_timeout=None, probe_range=None):
+        self.idle_timeout = config.CAMERA_IDLE_TIMEOUT_SECONDS if idle_timeout is None else idle_timeout
+        self.probe_range = probe_range or config.CAMERA_PROBE_RANGE
+        self._lock = threading.RLock()
+        self._available = None
+        self._cap = None
+        self._index = None
+        self._users = 0
+        self._idle_timer = None
+
+    def probe(self, force=False):
+        """Return the sorted list of working camera indices (cached after the first call)."""
+        with self._lock:
+            if self._available is not None and not force:
+                return list(self._available)
+
+            # The open device can't be reopened while we hold it; a closed one is probed like the rest
+            indices = [i for i in range(self.probe_range) if self._cap is None or i != self._index]
+            with ThreadPoolExecutor(max_workers=len(indices) or 1) as executor:
+                caps = dict(zip(indices, executor.map(_open_camera, indices)))
+
+            available = sorted(i for i, cap in caps.items() if cap is not None)
+            if self._cap is not None:
+                available = sorted(available + [self._index])
+
+            # Keep the preferred device open instead of reopening it straight away
+            for index, cap in caps.items():
+                if cap is None:
+                    continue
+                if self._cap is None and index == available[0]:
+                    self._configure(cap)
+                    self._cap, self._index = cap, index
+                else:
+                    cap.release()
+
+            self._available = available
+            if self._users == 0:
+                # Nobody is using it yet; don't leave the device on after a bare probe
+                self._schedule_idle_close()
+            return list(available)
+
+    def _configure(self, cap):
+        cap.set(cv2.CAP_PROP_FRAME_WIDTH, config.CAMERA_WIDTH)
+        cap.set(cv2.CAP_PROP_FRAME_HEIGHT, config.CAMERA_HEIGHT)
+        cap.set(cv2.CAP_PROP_FPS, config.CAMERA_FPS)
+        # Avoid handing out frames that queued up while the device sat idle
+        cap.set(cv2.CAP_PROP_BUFFERSIZE, 1)
+
+    def acquire(self):
+        """Start using the camera; returns True if a device is open and ready."""
+        with self._lock:
+            if self._cap is None or not self._cap.isOpened():
+                self._cap = None
+                self._open_preferred()
+            elif self._users == 0:
+                self._cap.grab()  # Discard the stale buffered frame from the last session
+            if self._cap is None:
+                return False
+            self._cancel_idle_timer()
+            self._users += 1
+            return True
+
+    def _open_preferred(self):
+        available = self.probe()
+        if self._cap is not None:
+            return
+        for index in available:
+            cap = _open_camera(index)
+            if cap is not None:
+                self._configure(cap)
+                self._cap, self._index = cap, index
+                return
+        # Cached devices have gone away; probe again once
+        if available:
+            self.probe(force=True)
+
+    def read(self):
+        """Read the next frame, mirroring cv2.VideoCapture.read()."""
+        cap = self._cap
+        if cap is None:
+            return False, None
+        return cap.read()
+
+    def release(self):
+        """Stop using the camera; the device closes after the idle timeout."""
+        with self._lock:
+            if self._users > 0:
+                self._users -= 1
+            if self._users == 0:
+                self._schedule_idle_close()
+
+    def _schedule_idle_close(self):
+        self._cancel_idle_timer()
+        if self._cap is None:
+            return
+        if self.idle_timeout <= 0:
+            self._close_device()
+        else:
+            self._idle_timer = threading.Timer(self.idle_timeout, self._idle_close)
+            self._idle_timer.daemon = True
+            self._idle_timer.start()
+
+    def _idle_close(self):
+        with self._lock:
+            if self._users == 0:
+                self._close_device()
+
+    def _cancel_idle_timer(self):
+        if self._idle_timer is not None:
+            self._idle_timer.cancel()
+            self._idle_timer = None
+
+    def _close_device(self):
+        if self._cap is not None:
+            self._cap.release()
+            self._cap = None
+
+    @property
+    def is_open(self):
+        return self._cap is not None
+
+    @property
+    def index(self):
+        return self._index
+
+    def close(self):
+        """Release the device immediately."""
+        with self._lock:
+            self._cancel_idle_timer()
+            self._users = 0
+            self._close_device()
+
+
+_manager = None
+_manager_lock = threading.Lock()
+
+
+def get_camera_manager():
+    """Return the process-wide CameraManager."""
+    global _manager
+    with _manager_lock:
+        if _manager is None:
+            _manager = CameraManager()
+            atexit.register(_manager.close)
+        return _manager
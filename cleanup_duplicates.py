@@ -76,7 +76,7 @@ def cleanup_duplicate_files():
         "main.py",
         "face_recognition_module.py", 
         "face_recognition_module_compatible.py",
-        "attendance_manager.py",
+        "attendance_service.py",
         "simple_advanced_attendance.py",
         "database_manager.py",
         "web_dashboard.py",
@@ -111,7 +111,7 @@ def cleanup_duplicate_files():
     │   └── face_recognition_module_compatible.py  # Enhanced version
     │
     ├── 📊 Attendance Management
-    │   ├── attendance_manager.py            # Basic attendance
+    │   ├── attendance_service.py            # Single write path
     │   ├── simple_advanced_attendance.py    # Advanced features
     │   └── database_manager.py              # Database operations
     │
@@ -4,14 +4,14 @@ Command line test for face recognition system
 """
 
 from face_recognition_module import FaceRecognitionModule
-from attendance_manager import AttendanceManager
+from attendance_service import get_attendance_service
 import sys
 
 def main():
     print("=== Face Recognition Test ===")
     
     face_module = FaceRecognitionModule()
-    attendance_manager = AttendanceManager()
+    attendance_service = get_attendance_service()
     
     while True:
         print("\nOptions:")
@@ -41,8 +41,8 @@ def main():
                 recognized = face_module.recognize_faces()
                 if recognized:
                     print(f"\nRecognized faces: {', '.join(recognized)}")
-                    for name in recognized:
-                        attendance_manager.mark_attendance(name)
+                    for success, message in attendance_service.mark_many(recognized).values():
+                        print(message)
                     print("Attendance marked successfully!")
                 else:
                     print("No faces recognized.")
@@ -59,14 +59,14 @@ def main():
         elif choice == "4":
             name = input("Enter name for manual attendance: ").strip()
             if name:
-                attendance_manager.mark_attendance(name)
+                attendance_service.mark_attendance(name, source="manual")
                 print(f"Manual attendance marked for: {name}")
             else:
                 print("Please enter a valid name.")
         
         elif choice == "5":
             try:
-                attendance_manager.export_to_excel()
+                attendance_service.export_to_excel()
                 print("Attendance exported to Excel successfully!")
             except Exception as e:
                 print(f"Export failed: {e}")
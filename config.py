@@ -4,6 +4,24 @@
 DATA_DIR = "data"
 EXCEL_FILE = "data/attendance.xlsx"
 
+# Attendance log settings
+ATTENDANCE_FSYNC_BATCH = 16       # fsync the CSV log after this many appended marks...
+ATTENDANCE_FSYNC_INTERVAL = 1.0   # ...or after this many seconds, whichever comes first
+ATTENDANCE_PARTITION_DIR = "attendance"  # Monthly partitions: data/attendance/YYYY-MM.csv
+ATTENDANCE_MIGRATION_MARKER = ".migrated"  # Written once the legacy attendance.csv has been split into partitions
+ATTENDANCE_PARTITION_CACHE_SIZE = 24     # Past-month partitions kept parsed in memory
+ATTENDANCE_CSV_CHUNK_ROWS = 100000       # Rows parsed per chunk when loading a partition
+ATTENDANCE_AGGREGATES_FILE = "aggregates.json"  # Per-day/person counters kept next to the partitions
+ATTENDANCE_AGGREGATES_SAVE_INTERVAL = 30  # Persist the counters at most this often (seconds)
+ATTENDANCE_JOURNAL_ENABLED = True       # Write-ahead journal makes each mark durable before returning
+ATTENDANCE_JOURNAL_FILE = "journal.log"
+ATTENDANCE_JOURNAL_GROUP_WINDOW = 0.002 # Seconds a commit waits so concurrent marks share one fsync
+ATTENDANCE_CHECKPOINT_ROWS = 1000       # Checkpoint the journal into the partitions after this many marks...
+ATTENDANCE_CHECKPOINT_INTERVAL = 60     # ...or this many seconds
+SPREADSHEET_EXPORT_ENABLED = True # Keep attendance.xlsx current from a background thread
+SPREADSHEET_EXPORT_INTERVAL = 30  # Export at most this many seconds after the first pending mark
+SPREADSHEET_EXPORT_IDLE = 5       # ...or once marking has been idle this long
+
 # Face recognition settings
 FACE_RECOGNITION_TOLERANCE = 0.6  # Lower = more strict, Higher = more lenient
 FACE_RECOGNITION_MODEL = "hog"    # "hog" for speed, "cnn" for accuracy
@@ -12,6 +30,8 @@ ENCODING_MODEL = "small"          # "small" or "large" - small is more compatibl
 CAMERA_WIDTH = 640
 CAMERA_HEIGHT = 480
 CAMERA_FPS = 30
+CAMERA_PROBE_RANGE = 10           # Camera indices probed (in parallel) on first use
+CAMERA_IDLE_TIMEOUT_SECONDS = 60  # Keep the camera open this long between sessions
 
 # Recognition timeout (frames)
 RECOGNITION_TIMEOUT_FRAMES = 300  # ~10 seconds at 30 FPS
@@ -19,8 +39,27 @@ FRAME_SKIP = 3                    # Process every 3rd frame for performance
 
 # Database settings
 DATABASE_PATH = "data/attendance.db"
+DB_STATEMENT_CACHE_SIZE = 256     # Prepared statements kept per pooled connection
+DB_POOL_SIZE = 8                  # Most pooled connections open at once (the write-queue thread has its own)
+DB_POOL_TIMEOUT = 30              # Seconds to wait for a free pooled connection
+DB_USER_CACHE_SIZE = 4096         # Name -> user id entries cached per DatabaseManager
+DB_JOURNAL_MODE = "WAL"           # Readers and the writer don't block each other
+DB_SYNCHRONOUS = "NORMAL"         # Safe with WAL; fsync only at checkpoints
+DB_BUSY_TIMEOUT_MS = 5000         # Wait this long for a lock instead of failing with "database is locked"
+DB_CACHE_SIZE_KB = 16384          # Page cache per connection
+DB_MMAP_SIZE = 268435456          # Memory-map up to 256 MB of the database file
+DB_CHECKPOINT_INTERVAL = 300      # Seconds between background WAL checkpoints (0 = SQLite's auto-checkpoint only)
+DB_WRITE_QUEUE_ENABLED = False    # Commit marks from a writer thread in batches (opt-in)
+DB_WRITE_BATCH_SIZE = 500         # Most marks committed in one batch
+DB_WRITE_BATCH_DELAY = 0          # Seconds the writer lingers for more marks (0 = commit once the queue drains)
+DB_SESSION_MIN_GAP = 300          # A sighting this many seconds after the previous one checks the person out
+DB_SESSION_TIMEOUT = 0            # Continuous-monitoring cameras only: sightings extend the session, which ends
+                                  # after this many seconds unseen (0 = a later sighting checks out instead)
+DB_SESSION_EXIT_SOURCE = "exit"   # Mark source of exit cameras; a sighting there checks the person out
 BACKUP_ENABLED = True
 BACKUP_INTERVAL_DAYS = 7
+DB_IMPORT_CHUNK_ROWS = 50000      # Rows read per chunk when importing attendance history
+DB_IMPORT_COMMIT_ROWS = 500000    # Rows inserted per transaction during an import
 
 # Email notification settings
 EMAIL_ENABLED = False
@@ -55,6 +94,15 @@ SHOW_CONFIDENCE_SCORES = False
 # Performance settings
 MAX_FACE_ENCODINGS_CACHE = 100
 IMAGE_PROCESSING_THREADS = 2
+FRAME_TRANSPORT_SLOTS = 8         # Shared-memory frame slots between capture and workers
+RECOGNITION_WORKERS = 0           # Encoder processes used by the recognition loop (0 = encode in-process)
+
+# Profiling settings (per-stage timing of the recognition loop)
+PROFILING_ENABLED = False         # Can also be toggled at runtime via module.timer.enable()
+PROFILING_OVERLAY = False         # Draw stage timings on the recognition window
+PROFILING_WINDOW = 1000           # Samples kept per stage for rolling percentiles
+PROFILING_SESSION_HISTORY = 20    # Session summaries kept in memory
+PROFILING_EXPORT_PATH = None      # e.g. "data/recognition_timings.json"
 AUTO_CLEANUP_ENABLED = True
 CLEANUP_INTERVAL_DAYS = 30
 
@@ -69,4 +117,12 @@ API_ENABLED = True
 API_PORT = 5001
 WEB_DASHBOARD_ENABLED = True
 WEB_DASHBOARD_PORT = 5000
+ATTENDANCE_SERVICE_ENABLED = True      # Share the attendance service with other local processes
+ATTENDANCE_SERVICE_HOST = "localhost"
+ATTENDANCE_SERVICE_PORT = 5002
+ATTENDANCE_SERVICE_LOCK_FILE = "service.lock"  # data/service.lock, held by the process that owns the attendance data
+ATTENDANCE_SERVICE_KEY_FILE = "service.key"  # Random authkey (mode 0600), created by the owning process next to service.lock
+ATTENDANCE_SERVICE_CONNECT_TIMEOUT = 5  # Seconds a client waits for the owning process
+ATTENDANCE_SQLITE_MIRROR = True        # Mirror marks into DATABASE_PATH for the API/dashboard
+ATTENDANCE_MIRROR_BACKLOG = 10000      # Failed SQLite mirror writes kept for retry with the next mark
 MOBILE_APP_SUPPORT = True
@@ -2,21 +2,323 @@
 """
 Database integration for Face Recognition Attendance System
 """
+import queue
 import sqlite3
+import threading
+import time
+from collections import OrderedDict
+from concurrent.futures import Future
+from contextlib import contextmanager
 import pandas as pd
-from datetime import datetime
+from datetime import datetime, timedelta
 import os
+import config
+
+# daily_summary upkeep: one row per (day, source) with marks and first/last seen
+_SUMMARY_ADD = '''
+    INSERT INTO daily_summary (day, source, marks, first_seen, last_seen)
+    VALUES (NEW.day, COALESCE(NEW.type, ''), 1, NEW.timestamp, NEW.timestamp)
+    ON CONFLICT (day, source) DO UPDATE SET
+        marks = marks + 1,
+        first_seen = MIN(first_seen, excluded.first_seen),
+        last_seen = MAX(last_seen, excluded.last_seen);
+'''
+# Recount a slot after a delete/update (first/last seen can't be decremented);
+# the timestamp range keeps this on the timestamp index (day is always the
+# timestamp's date, see migration 1)
+_SUMMARY_RECOUNT = '''
+    DELETE FROM daily_summary WHERE day = {row}.day AND source = COALESCE({row}.type, '');
+    INSERT INTO daily_summary (day, source, marks, first_seen, last_seen)
+    SELECT day, COALESCE(type, ''), COUNT(*), MIN(timestamp), MAX(timestamp) FROM attendance
+    WHERE timestamp >= substr({row}.timestamp, 1, 10) AND timestamp < substr({row}.timestamp, 1, 10) || 'T'
+      AND day = {row}.day AND COALESCE(type, '') = COALESCE({row}.type, '')
+    GROUP BY day, COALESCE(type, '');
+'''
+_SUMMARY_BACKFILL = '''
+    INSERT INTO daily_summary (day, source, marks, first_seen, last_seen)
+    SELECT day, COALESCE(type, ''), COUNT(*), MIN(timestamp), MAX(timestamp) FROM attendance
+    WHERE day IS NOT NULL
+    GROUP BY day, COALESCE(type, '')
+'''
+
+# Schema changes applied in order on top of the original tables; PRAGMA
+# user_version records how many have already run on a database.
+SCHEMA_MIGRATIONS = [
+    # 1: integer YYYYMMDD day so dedup and range queries can use indexes. Rows
+    # written before it have UTC CURRENT_TIMESTAMP times while new marks are
+    # local, so they are converted: day and timestamp must always agree
+    (
+        'ALTER TABLE attendance ADD COLUMN day INTEGER',
+        """UPDATE attendance SET
+               day = CAST(strftime('%Y%m%d', timestamp, 'localtime') AS INTEGER),
+               timestamp = COALESCE(datetime(timestamp, 'localtime'), timestamp)""",
+        'CREATE INDEX IF NOT EXISTS idx_attendance_user_day ON attendance (user_id, day)',
+        'CREATE INDEX IF NOT EXISTS idx_attendance_timestamp ON attendance (timestamp)',
+    ),
+    # 2: at most one mark per user and day, enforced by the database; the
+    # later duplicates are kept in attendance_duplicates
+    (
+        'CREATE TABLE IF NOT EXISTS attendance_duplicates AS SELECT * FROM attendance WHERE 0',
+        '''INSERT INTO attendance_duplicates SELECT * FROM attendance WHERE day IS NOT NULL AND id NOT IN (
+               SELECT MIN(id) FROM attendance WHERE day IS NOT NULL GROUP BY user_id, day)''',
+        '''DELETE FROM attendance WHERE id IN (SELECT id FROM attendance_duplicates)''',
+        'DROP INDEX IF EXISTS idx_attendance_user_day',
+        'CREATE UNIQUE INDEX idx_attendance_user_day ON attendance (user_id, day)',
+    ),
+    # 3: daily_summary kept current by triggers, so day-level range reports read
+    # pre-aggregated rows (per-person reports still read attendance by index)
+    (
+        '''CREATE TABLE IF NOT EXISTS daily_summary (
+               day INTEGER NOT NULL,  -- YYYYMMDD
+               source TEXT NOT NULL,  -- attendance.type
+               marks INTEGER NOT NULL,
+               first_seen TIMESTAMP,
+               last_seen TIMESTAMP,
+               PRIMARY KEY (day, source)
+           ) WITHOUT ROWID''',
+        f'''CREATE TRIGGER IF NOT EXISTS daily_summary_insert AFTER INSERT ON attendance
+            WHEN NEW.day IS NOT NULL BEGIN {_SUMMARY_ADD} END''',
+        f'''CREATE TRIGGER IF NOT EXISTS daily_summary_delete AFTER DELETE ON attendance
+            WHEN OLD.day IS NOT NULL BEGIN {_SUMMARY_RECOUNT.format(row='OLD')} END''',
+        f'''CREATE TRIGGER IF NOT EXISTS daily_summary_update AFTER UPDATE OF day, timestamp, type ON attendance
+            BEGIN {_SUMMARY_RECOUNT.format(row='OLD')} {_SUMMARY_RECOUNT.format(row='NEW')} END''',
+        'DELETE FROM daily_summary',
+        _SUMMARY_BACKFILL,
+    ),
+    # 4: users_generation changes whenever a name -> id mapping may have, so
+    # every process can tell when its user id cache is stale
+    (
+        'CREATE TABLE IF NOT EXISTS meta (key TEXT PRIMARY KEY, value INTEGER NOT NULL) WITHOUT ROWID',
+        "INSERT OR IGNORE INTO meta (key, value) VALUES ('users_generation', 0)",
+        '''CREATE TRIGGER IF NOT EXISTS users_generation_update AFTER UPDATE OF id, name, is_active ON users
+            BEGIN UPDATE meta SET value = value + 1 WHERE key = 'users_generation'; END''',
+        '''CREATE TRIGGER IF NOT EXISTS users_generation_delete AFTER DELETE ON users
+            BEGIN UPDATE meta SET value = value + 1 WHERE key = 'users_generation'; END''',
+    ),
+    # 5: check-in/check-out sessions; at most one open session per user
+    (
+        'ALTER TABLE sessions ADD COLUMN last_seen TIMESTAMP',
+        'ALTER TABLE sessions ADD COLUMN day INTEGER',  # YYYYMMDD of check_in
+        "UPDATE sessions SET day = CAST(strftime('%Y%m%d', check_in) AS INTEGER), last_seen = COALESCE(check_out, check_in)",
+        'CREATE UNIQUE INDEX IF NOT EXISTS idx_sessions_open ON sessions (user_id) WHERE check_out IS NULL',
+        'CREATE INDEX IF NOT EXISTS idx_sessions_day ON sessions (day, user_id)',
+    ),
+]
+
+
+def day_key(moment):
+    """datetime/date -> YYYYMMDD integer (the attendance.day column)"""
+    return moment.year * 10000 + moment.month * 100 + moment.day
+
+
+def _day_to_iso(day):
+    return f"{day // 10000:04d}-{day // 100 % 100:02d}-{day % 100:02d}"
+
+
+def _minutes_between(start, end):
+    """Whole minutes between two 'YYYY-MM-DD HH:MM:SS' stamps"""
+    delta = datetime.strptime(end, '%Y-%m-%d %H:%M:%S') - datetime.strptime(start, '%Y-%m-%d %H:%M:%S')
+    return max(int(delta.total_seconds() // 60), 0)
+
 
 class DatabaseManager:
-    def __init__(self, db_path="data/attendance.db"):
+    def __init__(self, db_path="data/attendance.db", write_queue=None):
         self.db_path = db_path
         os.makedirs(os.path.dirname(db_path), exist_ok=True)
+        # Bounded pool of configured connections, checked out per call (or per
+        # transaction); the writer thread keeps one of its own
+        self._local = threading.local()
+        self._pool = queue.Queue()
+        self._connections = []
+        self._pool_lock = threading.Lock()
+        self._data_versions = {}  # connection -> last PRAGMA data_version seen
+        self._checkpoint_stats = {
+            'checkpoints': 0,
+            'last_checkpoint': None,
+            'last_mode': None,
+            'last_busy': None,
+            'last_wal_frames': None,
+            'last_checkpointed_frames': None,
+            'last_duration_ms': None,
+            'total_checkpointed_frames': 0,
+        }
+        self._stop = threading.Event()
+        # Bounded name -> user id cache, checked against users_generation before use
+        self._user_ids = OrderedDict()
+        self._user_ids_lock = threading.Lock()
+        self._users_generation = None
         self.init_database()
+        if config.DB_CHECKPOINT_INTERVAL:
+            # WAL is checkpointed in the background instead of on a writer's commit
+            self._checkpointer = threading.Thread(target=self._checkpoint_loop, name="DatabaseCheckpoint",
+                                                  daemon=True)
+            self._checkpointer.start()
+        
+        # Optional writer thread that commits queued marks in batches
+        self._write_queue = None
+        self._writer = None
+        self._write_stats = {'batches': 0, 'marks': 0, 'errors': 0, 'last_batch_size': 0,
+                             'last_commit_ms': None, 'max_commit_ms': 0.0, 'total_commit_ms': 0.0}
+        if config.DB_WRITE_QUEUE_ENABLED if write_queue is None else write_queue:
+            self._write_queue = queue.Queue()
+            self._writer = threading.Thread(target=self._writer_loop, name="DatabaseWriter", daemon=True)
+            self._writer.start()
+    
+    @contextmanager
+    def connection(self):
+        """Check a connection out of the pool for the block.
+        
+        Connections stay open so their statement caches and PRAGMAs are
+        reused. Nested use on the same thread (e.g. inside transaction()) gets
+        the connection already held. At most DB_POOL_SIZE are open; when all
+        are checked out, callers wait up to DB_POOL_TIMEOUT seconds.
+        """
+        conn = getattr(self._local, 'conn', None)
+        if conn is not None:
+            yield conn
+            return
+        conn = self._checkout()
+        self._local.conn = conn
+        try:
+            yield conn
+        finally:
+            self._local.conn = None
+            self._checkin(conn)
+    
+    def _open_connection(self):
+        conn = sqlite3.connect(self.db_path, check_same_thread=False,
+                               timeout=config.DB_BUSY_TIMEOUT_MS / 1000,
+                               cached_statements=config.DB_STATEMENT_CACHE_SIZE)
+        self._configure(conn)
+        return conn
+    
+    def _checkout(self):
+        try:
+            return self._pool.get_nowait()
+        except queue.Empty:
+            pass
+        with self._pool_lock:
+            if len(self._connections) < config.DB_POOL_SIZE:
+                conn = self._open_connection()
+                self._connections.append(conn)
+                return conn
+        try:
+            return self._pool.get(timeout=config.DB_POOL_TIMEOUT)
+        except queue.Empty:
+            raise sqlite3.OperationalError(
+                f"No database connection free after {config.DB_POOL_TIMEOUT}s") from None
+    
+    def _checkin(self, conn):
+        if conn.in_transaction:
+            # Never hand the next caller someone else's half-finished transaction
+            conn.rollback()
+        self._pool.put(conn)
+    
+    def _query(self, sql, params=()):
+        """All rows of a read-only query, on a connection checked out just for it."""
+        with self.connection() as conn:
+            return conn.execute(sql, params).fetchall()
+    
+    @staticmethod
+    def _configure(conn):
+        """Per-connection tuning: WAL lets readers and the writer proceed without blocking each other."""
+        conn.execute(f'PRAGMA journal_mode = {config.DB_JOURNAL_MODE}')
+        conn.execute(f'PRAGMA synchronous = {config.DB_SYNCHRONOUS}')
+        conn.execute(f'PRAGMA busy_timeout = {int(config.DB_BUSY_TIMEOUT_MS)}')
+        conn.execute(f'PRAGMA cache_size = -{int(config.DB_CACHE_SIZE_KB)}')
+        conn.execute(f'PRAGMA mmap_size = {int(config.DB_MMAP_SIZE)}')
+    
+    def checkpoint(self, mode='PASSIVE'):
+        """Copy WAL frames back into the database file; returns the updated checkpoint stats.
+        
+        PASSIVE never waits for readers or writers; FULL/RESTART/TRUNCATE do.
+        """
+        mode = mode.upper()
+        if mode not in ('PASSIVE', 'FULL', 'RESTART', 'TRUNCATE'):
+            raise ValueError(f"Unknown checkpoint mode: {mode}")
+        start = time.perf_counter()
+        with self.connection() as conn:
+            busy, wal_frames, checkpointed = conn.execute(f'PRAGMA wal_checkpoint({mode})').fetchone()
+        stats = self._checkpoint_stats
+        stats['checkpoints'] += 1
+        stats['last_checkpoint'] = datetime.now().isoformat(timespec='seconds')
+        stats['last_mode'] = mode
+        stats['last_busy'] = bool(busy)
+        stats['last_wal_frames'] = wal_frames
+        stats['last_checkpointed_frames'] = checkpointed
+        stats['last_duration_ms'] = (time.perf_counter() - start) * 1000
+        stats['total_checkpointed_frames'] += max(checkpointed, 0)
+        return self.checkpoint_stats()
+    
+    def checkpoint_stats(self):
+        """Counters from the background/explicit WAL checkpoints."""
+        return dict(self._checkpoint_stats)
+    
+    def _checkpoint_loop(self):
+        while not self._stop.wait(config.DB_CHECKPOINT_INTERVAL):
+            try:
+                self.checkpoint('PASSIVE')
+                # Also close sessions of people who left without passing an exit camera
+                # (record_presence and get_presence_report do too, for when this loop is off)
+                self.close_stale_sessions()
+            except sqlite3.Error as e:
+                print(f"Database maintenance failed: {e}")
+    
+    @contextmanager
+    def transaction(self, immediate=False):
+        """Run a block in one transaction on one pooled connection (commit, or roll back on error).
+        
+        Nested use joins the outer transaction. immediate=True takes the
+        write lock up front, so reads inside see the latest committed state.
+        """
+        with self.connection() as conn:
+            if immediate and not conn.in_transaction:
+                conn.execute('BEGIN IMMEDIATE')
+            if getattr(self._local, 'depth', 0):
+                yield conn
+                return
+            self._local.depth = 1
+            try:
+                yield conn
+                conn.commit()
+            except BaseException:
+                conn.rollback()
+                raise
+            finally:
+                self._local.depth = 0
+    
+    def close(self):
+        """Flush the write queue, stop the background threads and close every pooled connection."""
+        if self._writer is not None:
+            self._write_queue.put(None)
+            self._writer.join()
+            self._writer = None
+        self._stop.set()
+        with self._pool_lock:
+            for conn in self._connections:
+                conn.close()
+            self._connections = []
+            self._pool = queue.Queue()
+            self._data_versions.clear()
+        self._local = threading.local()
     
     def init_database(self):
-        """Initialize the database with required tables"""
-        conn = sqlite3.connect(self.db_path)
-        cursor = conn.cursor()
+        """Initialize the database with required tables and apply pending migrations"""
+        # Take the write lock up front so concurrent processes migrate one at a time
+        with self.transaction(immediate=True) as conn:
+            cursor = conn.cursor()
+            self._create_tables(cursor)
+            version = cursor.execute('PRAGMA user_version').fetchone()[0]
+            for number, statements in enumerate(SCHEMA_MIGRATIONS[version:], version + 1):
+                for statement in statements:
+                    cursor.execute(statement)
+                cursor.execute(f'PRAGMA user_version = {number}')
+            if version < 2 <= len(SCHEMA_MIGRATIONS):
+                moved = cursor.execute('SELECT COUNT(*) FROM attendance_duplicates').fetchone()[0]
+                if moved:
+                    print(f"Moved {moved} duplicate attendance marks to the attendance_duplicates table")
+    
+    def _create_tables(self, cursor):
         
         # Create users table
         cursor.execute('''
@@ -53,91 +355,550 @@ class DatabaseManager:
                 FOREIGN KEY (user_id) REFERENCES users (id)
             )
         ''')
-        
-        conn.commit()
-        conn.close()
     
     def add_user(self, name, email=None, department=None, role=None):
         """Add a new user to the database"""
-        conn = sqlite3.connect(self.db_path)
-        cursor = conn.cursor()
-        
         try:
-            cursor.execute('''
-                INSERT INTO users (name, email, department, role)
-                VALUES (?, ?, ?, ?)
-            ''', (name, email, department, role))
-            conn.commit()
-            user_id = cursor.lastrowid
-            conn.close()
+            with self.transaction() as conn:
+                cursor = conn.execute('''
+                    INSERT INTO users (name, email, department, role)
+                    VALUES (?, ?, ?, ?)
+                ''', (name, email, department, role))
+                user_id = cursor.lastrowid
             return True, f"User {name} added with ID {user_id}"
         except sqlite3.IntegrityError:
-            conn.close()
             return False, f"User {name} already exists"
     
+    def get_users(self, active_only=True):
+        """Users as a list of dicts (id, name, email, department, role)"""
+        query = 'SELECT id, name, email, department, role FROM users'
+        if active_only:
+            query += ' WHERE is_active = 1'
+        with self.connection() as conn:
+            cursor = conn.execute(query)
+            columns = [column[0] for column in cursor.description]
+            return [dict(zip(columns, row)) for row in cursor.fetchall()]
+    
+    def rename_user(self, old_name, new_name):
+        """Rename a user (their attendance history stays attached)"""
+        try:
+            with self.transaction() as conn:
+                updated = conn.execute('UPDATE users SET name = ? WHERE name = ?', (new_name, old_name)).rowcount
+        except sqlite3.IntegrityError:
+            return False, f"User {new_name} already exists"
+        self._forget_user_ids(old_name, new_name)
+        if not updated:
+            return False, f"User {old_name} not found"
+        return True, f"User {old_name} renamed to {new_name}"
+    
+    def set_user_active(self, name, active=True):
+        """Activate or deactivate a user"""
+        with self.transaction() as conn:
+            updated = conn.execute('UPDATE users SET is_active = ? WHERE name = ?', (int(active), name)).rowcount
+        self._forget_user_ids(name)
+        if not updated:
+            return False, f"User {name} not found"
+        return True, f"User {name} {'activated' if active else 'deactivated'}"
+    
+    def _forget_user_ids(self, *names):
+        with self._user_ids_lock:
+            for name in names:
+                self._user_ids.pop(name, None)
+    
+    def _check_users_generation(self, conn):
+        """Drop the user id cache if any process renamed, deactivated or deleted users.
+        
+        PRAGMA data_version (tracked per pooled connection) only changes when
+        another connection commits, so the meta row is read only then.
+        """
+        version = conn.execute('PRAGMA data_version').fetchone()[0]
+        if self._data_versions.get(conn) == version:
+            return
+        self._data_versions[conn] = version
+        generation = conn.execute("SELECT value FROM meta WHERE key = 'users_generation'").fetchone()[0]
+        with self._user_ids_lock:
+            if generation != self._users_generation:
+                self._user_ids.clear()
+                self._users_generation = generation
+    
+    def _resolve_user_ids(self, conn, names):
+        """({name: user id}, the part that wasn't cached); unknown users are created.
+        
+        Deactivated users are left out of both dicts (and never recreated).
+        The caller caches the second dict once its transaction has committed.
+        """
+        ids = {}
+        with self._user_ids_lock:
+            for name in names:
+                user_id = self._user_ids.get(name)
+                if user_id is not None:
+                    self._user_ids.move_to_end(name)
+                    ids[name] = user_id
+        missing = [name for name in names if name not in ids]
+        resolved = {}
+        for i in range(0, len(missing), 900):
+            batch = missing[i:i + 900]
+            # Known names are filtered out first so they don't burn AUTOINCREMENT ids
+            conn.execute(f'''
+                INSERT INTO users (name)
+                SELECT column1 FROM (VALUES {','.join(['(?)'] * len(batch))})
+                WHERE column1 NOT IN (SELECT name FROM users)
+                ON CONFLICT (name) DO NOTHING
+            ''', batch)
+            resolved.update(conn.execute(f'''
+                SELECT name, id FROM users WHERE is_active = 1 AND name IN ({",".join("?" * len(batch))})
+            ''', batch))
+        ids.update(resolved)
+        return ids, resolved
+    
+    def _remember_user_ids(self, resolved):
+        with self._user_ids_lock:
+            self._user_ids.update(resolved)
+            while len(self._user_ids) > config.DB_USER_CACHE_SIZE:
+                self._user_ids.popitem(last=False)
+    
     def mark_attendance(self, name, attendance_type='auto'):
         """Mark attendance for a user"""
-        conn = sqlite3.connect(self.db_path)
-        cursor = conn.cursor()
+        return self.mark_many([name], source=attendance_type)[name]
+    
+    def mark_many(self, names, timestamp=None, source='auto'):
+        """Mark attendance for several users in one transaction.
         
-        # Get user ID
-        cursor.execute('SELECT id FROM users WHERE name = ? AND is_active = 1', (name,))
-        user = cursor.fetchone()
+        Returns {name: (success, message)} in input order; repeated names are
+        only marked once. With the write queue enabled the marks are handed
+        to the writer thread (and may share its transaction with other callers).
+        """
+        names = list(dict.fromkeys(names))
+        if not names:
+            return {}
+        timestamp = timestamp or datetime.now()
+        if self._writer is not None and not getattr(self._local, 'depth', 0):
+            futures = [self.submit_mark(name, timestamp, source) for name in names]
+            return {name: future.result() for name, future in zip(names, futures)}
+        return dict(zip(names, self._write_marks([(name, timestamp, source) for name in names])))
+    
+    def _write_marks(self, marks):
+        """Insert (name, timestamp, source) marks in one transaction; returns (success, message) per mark.
         
-        if not user:
-            # Auto-create user if doesn't exist
-            cursor.execute('INSERT INTO users (name) VALUES (?)', (name,))
-            user_id = cursor.lastrowid
-        else:
-            user_id = user[0]
+        Of several marks for the same person and day, the first one wins.
+        Deactivated users are not marked.
+        """
+        with self.transaction(immediate=True) as conn:
+            self._check_users_generation(conn)
+            user_ids, resolved = self._resolve_user_ids(conn, list(dict.fromkeys(name for name, _, _ in marks)))
+            rows = [(user_ids[name], timestamp.strftime('%Y-%m-%d %H:%M:%S'), day_key(timestamp), source)
+                    for name, timestamp, source in marks if name in user_ids]
+            # One statement (per 200 marks) inserts everyone not yet marked that
+            # day; the unique (user_id, day) index makes this race-free across writers
+            inserted = set()
+            for i in range(0, len(rows), 200):
+                batch = rows[i:i + 200]
+                inserted.update(conn.execute(f'''
+                    INSERT INTO attendance (user_id, timestamp, day, type)
+                    VALUES {','.join(['(?, ?, ?, ?)'] * len(batch))}
+                    ON CONFLICT (user_id, day) DO NOTHING
+                    RETURNING user_id, day
+                ''', [value for row in batch for value in row]).fetchall())
+        if not getattr(self._local, 'depth', 0):
+            # Only ids that were committed (not inside a caller's open transaction)
+            self._remember_user_ids(resolved)
         
-        # Check if already marked today
-        today = datetime.now().date()
-        cursor.execute('''
-            SELECT id FROM attendance 
-            WHERE user_id = ? AND DATE(timestamp) = ?
-        ''', (user_id, today))
+        results = []
+        rows = iter(rows)
+        for name, _, _ in marks:
+            if name not in user_ids:
+                results.append((False, f"User {name} is inactive"))
+                continue
+            user_id, _, day, _ = next(rows)
+            if (user_id, day) in inserted:
+                inserted.discard((user_id, day))
+                results.append((True, f"Attendance marked for {name}"))
+            else:
+                results.append((False, f"Attendance already marked for {name} today"))
+        return results
+    
+    def replay_marks(self, marks):
+        """Mark (name, timestamp, source) rows, each at its own time; returns how many were inserted.
         
-        if cursor.fetchone():
-            conn.close()
-            return False, f"Attendance already marked for {name} today"
+        Used to catch up with marks recorded elsewhere: rows for a person
+        already marked that day are skipped, so replaying twice is harmless.
+        """
+        inserted = 0
+        for i in range(0, len(marks), config.DB_IMPORT_COMMIT_ROWS):
+            inserted += sum(success for success, _ in self._write_marks(marks[i:i + config.DB_IMPORT_COMMIT_ROWS]))
+        return inserted
+    
+    def latest_mark_time(self):
+        """Time of the newest mark, or None if there are none (served by the timestamp index)."""
+        latest = self._query('SELECT MAX(timestamp) FROM attendance')[0][0]
+        return datetime.strptime(str(latest)[:19], '%Y-%m-%d %H:%M:%S') if latest else None
+    
+    def submit_mark(self, name, timestamp=None, source='auto'):
+        """Queue a mark for the writer thread; returns a Future of (success, message)."""
+        if self._writer is None:
+            raise RuntimeError("The write queue is not enabled for this DatabaseManager")
+        future = Future()
+        self._write_queue.put((name, timestamp or datetime.now(), source, future))
+        return future
+    
+    def _writer_loop(self):
+        """Commit queued marks in batches of up to DB_WRITE_BATCH_SIZE.
         
-        # Mark attendance
-        cursor.execute('''
-            INSERT INTO attendance (user_id, type)
-            VALUES (?, ?)
-        ''', (user_id, attendance_type))
+        Whatever queued up during the previous commit forms the next batch;
+        DB_WRITE_BATCH_DELAY optionally lingers for more before committing.
+        The writer keeps its own connection outside the pool.
+        """
+        self._local.conn = self._open_connection()
+        try:
+            self._drain_write_queue()
+        finally:
+            self._local.conn.close()
+            self._local.conn = None
+    
+    def _drain_write_queue(self):
+        while True:
+            item = self._write_queue.get()
+            if item is None:
+                return
+            batch = [item]
+            stopping = False
+            deadline = time.monotonic() + config.DB_WRITE_BATCH_DELAY
+            while len(batch) < config.DB_WRITE_BATCH_SIZE:
+                remaining = deadline - time.monotonic()
+                try:
+                    item = self._write_queue.get(timeout=remaining) if remaining > 0 else self._write_queue.get_nowait()
+                except queue.Empty:
+                    break
+                if item is None:
+                    stopping = True
+                    break
+                batch.append(item)
+            self._commit_batch(batch)
+            if stopping:
+                return
+    
+    def _commit_batch(self, batch):
+        batch = [item for item in batch if item[3].set_running_or_notify_cancel()]
+        if not batch:
+            return
+        start = time.perf_counter()
+        try:
+            results = self._write_marks([(name, timestamp, source) for name, timestamp, source, _ in batch])
+        except Exception as e:
+            self._write_stats['errors'] += 1
+            for *_, future in batch:
+                future.set_exception(e)
+            return
+        elapsed = (time.perf_counter() - start) * 1000
+        stats = self._write_stats
+        stats['batches'] += 1
+        stats['marks'] += len(batch)
+        stats['last_batch_size'] = len(batch)
+        stats['last_commit_ms'] = elapsed
+        stats['max_commit_ms'] = max(stats['max_commit_ms'], elapsed)
+        stats['total_commit_ms'] += elapsed
+        for (*_, future), result in zip(batch, results):
+            future.set_result(result)
+    
+    def write_queue_stats(self):
+        """Queue depth, batch counts and commit latency of the writer thread."""
+        stats = dict(self._write_stats)
+        stats['enabled'] = self._writer is not None
+        stats['queue_depth'] = self._write_queue.qsize() if self._write_queue is not None else 0
+        stats['avg_commit_ms'] = stats['total_commit_ms'] / stats['batches'] if stats['batches'] else None
+        return stats
+    
+    def record_presence(self, names, timestamp=None, source='auto'):
+        """Update check-in/check-out sessions from one sighting of these people.
+        
+        The first sighting opens a session (check-in). A later sighting at
+        least DB_SESSION_MIN_GAP after the previous one closes it then
+        (check-out); closer sightings are the same pass in front of the
+        camera and only move last_seen. A sighting from DB_SESSION_EXIT_SOURCE
+        always checks the person out, and a session still open from an
+        earlier day is closed at its last sighting before a new one opens.
+        
+        With DB_SESSION_TIMEOUT set (continuous-monitoring cameras), later
+        sightings extend the session instead, and it ends at the last
+        sighting once nobody has seen the person for that long.
+        
+        Durations are updated in place. Deactivated users are skipped.
+        Returns {name: 'opened' | 'extended' | 'closed' | None}.
+        """
+        names = list(dict.fromkeys(names))
+        if not names:
+            return {}
+        timestamp = timestamp or datetime.now()
+        stamp = timestamp.strftime('%Y-%m-%d %H:%M:%S')
+        today = day_key(timestamp)
+        leaving = source == config.DB_SESSION_EXIT_SOURCE
+        monitoring = bool(config.DB_SESSION_TIMEOUT)
+        
+        with self.transaction(immediate=True) as conn:
+            # With monitoring on, everyone else unseen for DB_SESSION_TIMEOUT has left, whether or not checkpoints run
+            self.close_stale_sessions(timestamp)
+            self._check_users_generation(conn)
+            user_ids, resolved = self._resolve_user_ids(conn, names)
+            active = [user_ids[name] for name in names if name in user_ids]
+            open_sessions = {}
+            for i in range(0, len(active), 900):
+                batch = active[i:i + 900]
+                # Served by the partial index on open sessions
+                open_sessions.update((row[0], row[1:]) for row in conn.execute(f'''
+                    SELECT user_id, id, check_in, COALESCE(last_seen, check_in), day FROM sessions
+                    WHERE check_out IS NULL AND user_id IN ({",".join("?" * len(batch))})
+                ''', batch))
+            
+            results = {}
+            closed, extended, opened = [], [], []
+            for name in names:
+                if name not in user_ids:
+                    results[name] = None
+                    continue
+                session = open_sessions.get(user_ids[name])
+                if session is not None:
+                    session_id, check_in, last_seen, day = session
+                    idle = (timestamp - datetime.strptime(last_seen, '%Y-%m-%d %H:%M:%S')).total_seconds()
+                    if not leaving and (idle > config.DB_SESSION_TIMEOUT if monitoring else day != today):
+                        # They left after the last sighting; this one starts a new visit
+                        closed.append((last_seen, last_seen, _minutes_between(check_in, last_seen), session_id))
+                    else:
+                        last_seen = max(last_seen, stamp)
+                        minutes = _minutes_between(check_in, last_seen)
+                        if leaving or (not monitoring and idle >= config.DB_SESSION_MIN_GAP):
+                            closed.append((last_seen, last_seen, minutes, session_id))
+                            results[name] = 'closed'
+                        else:
+                            extended.append((last_seen, minutes, session_id))
+                            results[name] = 'extended'
+                        continue
+                if leaving:
+                    results[name] = None
+                else:
+                    opened.append((user_ids[name], stamp, stamp, today))
+                    results[name] = 'opened'
+            
+            conn.executemany('UPDATE sessions SET check_out = ?, last_seen = ?, duration = ? WHERE id = ?', closed)
+            conn.executemany('UPDATE sessions SET last_seen = ?, duration = ? WHERE id = ?', extended)
+            conn.executemany('''
+                INSERT INTO sessions (user_id, check_in, last_seen, day, duration) VALUES (?, ?, ?, ?, 0)
+            ''', opened)
+        if not getattr(self._local, 'depth', 0):
+            self._remember_user_ids(resolved)
+        return results
+    
+    def close_stale_sessions(self, now=None):
+        """Close sessions with no sighting for DB_SESSION_TIMEOUT at their last sighting; returns how many.
+        
+        Does nothing unless DB_SESSION_TIMEOUT is set (continuous monitoring).
+        """
+        if not config.DB_SESSION_TIMEOUT:
+            return 0
+        cutoff = ((now or datetime.now()) - timedelta(seconds=config.DB_SESSION_TIMEOUT)).strftime('%Y-%m-%d %H:%M:%S')
+        with self.transaction() as conn:
+            return conn.execute('''
+                UPDATE sessions SET check_out = COALESCE(last_seen, check_in)
+                WHERE check_out IS NULL AND COALESCE(last_seen, check_in) < ?
+            ''', (cutoff,)).rowcount
+    
+    def get_presence_report(self, days=7):
+        """Time on site per person and day for the last N calendar days (newest first).
+        
+        Read from the sessions table, whose durations are kept current as
+        people are seen, so raw marks are never scanned. Open sessions count
+        up to their latest sighting. With DB_SESSION_TIMEOUT set, stale ones
+        are closed first, so nobody unseen for that long is reported as on site.
+        """
+        self.close_stale_sessions()
+        start = day_key(datetime.now().date() - timedelta(days=days - 1))
+        query = '''
+            SELECT s.day, u.name, u.department,
+                   COUNT(*) AS sessions,
+                   SUM(s.duration) AS minutes,
+                   MIN(s.check_in) AS first_check_in,
+                   MAX(COALESCE(s.check_out, s.last_seen, s.check_in)) AS last_seen,
+                   SUM(s.check_out IS NULL) AS open_sessions
+            FROM sessions s
+            JOIN users u ON u.id = s.user_id
+            WHERE s.day >= ?
+            GROUP BY s.day, s.user_id
+            ORDER BY s.day DESC, minutes DESC
+        '''
+        return [{
+            'date': _day_to_iso(day), 'name': name, 'department': department, 'sessions': sessions,
+            'minutes': minutes or 0, 'hours': round((minutes or 0) / 60, 2),
+            'first_check_in': first_check_in, 'last_seen': last_seen, 'on_site': bool(open_sessions),
+        } for day, name, department, sessions, minutes, first_check_in, last_seen, open_sessions
+            in self._query(query, (start,))]
+    
+    def import_attendance(self, path, chunksize=None, commit_rows=None, default_source='import'):
+        """Bulk-import attendance history from a CSV or XLSX file (Name, Time[, Source] columns).
         
-        conn.commit()
-        conn.close()
-        return True, f"Attendance marked for {name}"
+        Rows are streamed in chunks, names are resolved through an in-memory
+        name -> id map (missing users are created in bulk) and inserted with
+        executemany inside large transactions. A person already marked on a
+        day (in the database or earlier in the file) is skipped by the unique
+        (user_id, day) index. Rows without a name or a parseable time are
+        counted as invalid. Returns a dict of counts and rows/sec.
+        """
+        chunksize = chunksize or config.DB_IMPORT_CHUNK_ROWS
+        commit_rows = commit_rows or config.DB_IMPORT_COMMIT_ROWS
+        stats = {'rows': 0, 'inserted': 0, 'skipped': 0, 'invalid': 0, 'users_created': 0}
+        start = time.perf_counter()
+        
+        conn = self._checkout()
+        cursor = conn.cursor()
+        try:
+            user_ids = dict(cursor.execute('SELECT name, id FROM users'))
+            uncommitted = 0
+            for chunk in _iter_attendance_chunks(path, chunksize):
+                stats['rows'] += len(chunk)
+                # Blank XLSX cells are None; drop them before they become the string 'None'
+                present = chunk['Name'].notna()
+                names = chunk['Name'].where(present, '').astype(str).str.strip()
+                times = pd.to_datetime(chunk['Time'].astype(str).str[:19], format='%Y-%m-%d %H:%M:%S', errors='coerce')
+                valid = present & times.notna() & (names != '')
+                stats['invalid'] += int((~valid).sum())
+                names, times = names[valid], times[valid]
+                if 'Source' in chunk.columns:
+                    sources = chunk['Source'][valid].fillna('').astype(str).replace('', default_source)
+                else:
+                    sources = pd.Series(default_source, index=names.index)
+                
+                missing = [name for name in names.unique() if name not in user_ids]
+                if missing:
+                    cursor.executemany('INSERT OR IGNORE INTO users (name) VALUES (?)', [(name,) for name in missing])
+                    # Another process may have added some of them meanwhile
+                    stats['users_created'] += cursor.rowcount
+                    for i in range(0, len(missing), 900):
+                        batch = missing[i:i + 900]
+                        user_ids.update(cursor.execute(
+                            f'SELECT name, id FROM users WHERE name IN ({",".join("?" * len(batch))})', batch))
+                
+                stamps = times.dt.strftime('%Y-%m-%d %H:%M:%S')
+                days = (times.dt.year * 10000 + times.dt.month * 100 + times.dt.day).tolist()
+                rows = [(user_ids[name], stamp, day, source)
+                        for name, stamp, day, source in zip(names.tolist(), stamps.tolist(), days, sources.tolist())]
+                # The unique (user_id, day) index skips anyone already marked that
+                # day, in the database or earlier in the file; rowcount counts the rest
+                cursor.executemany('''
+                    INSERT INTO attendance (user_id, timestamp, day, type) VALUES (?, ?, ?, ?)
+                    ON CONFLICT (user_id, day) DO NOTHING
+                ''', rows)
+                stats['inserted'] += cursor.rowcount
+                stats['skipped'] += len(rows) - cursor.rowcount
+                uncommitted += cursor.rowcount
+                if uncommitted >= commit_rows:
+                    conn.commit()
+                    uncommitted = 0
+            conn.commit()
+        except BaseException:
+            conn.rollback()
+            raise
+        finally:
+            self._checkin(conn)
+        
+        stats['seconds'] = time.perf_counter() - start
+        stats['rows_per_sec'] = stats['rows'] / stats['seconds'] if stats['seconds'] else 0.0
+        return stats
     
     def get_attendance_report(self, days=30):
-        """Get attendance report for last N days"""
-        conn = sqlite3.connect(self.db_path)
+        """Get attendance report for last N days
         
+        Per person, so it reads attendance rather than daily_summary (which
+        has no user column): with one mark per user and day, a per-user
+        summary would be as large as attendance itself.
+        """
+        # Bare column compared with a local-time cutoff, so the timestamp index is used
+        cutoff = (datetime.now() - timedelta(days=days)).strftime('%Y-%m-%d %H:%M:%S')
         query = '''
             SELECT u.name, u.department, u.role, 
                    COUNT(a.id) as attendance_count,
                    MAX(a.timestamp) as last_attendance
-            FROM users u
-            LEFT JOIN attendance a ON u.id = a.user_id
-            WHERE a.timestamp >= datetime('now', '-{} days')
-            GROUP BY u.id, u.name
+            FROM attendance a
+            JOIN users u ON u.id = a.user_id
+            WHERE a.timestamp >= ?
+            GROUP BY u.id
             ORDER BY attendance_count DESC
-        '''.format(days)
+        '''
+        with self.connection() as conn:
+            return pd.read_sql_query(query, conn, params=(cutoff,))
+    
+    def get_daily_summary(self, days=30):
+        """Per-day totals for the last N calendar days (oldest first), read from daily_summary.
+        
+        Each entry: {'date', 'marks', 'first_seen', 'last_seen', 'sources': {source: marks}}.
+        """
+        start = day_key(datetime.now().date() - timedelta(days=days - 1))
+        summary = {}
+        for day, source, marks, first_seen, last_seen in self._query('''
+            SELECT day, source, marks, first_seen, last_seen FROM daily_summary
+            WHERE day >= ? ORDER BY day
+        ''', (start,)):
+            entry = summary.get(day)
+            if entry is None:
+                entry = summary[day] = {
+                    'date': _day_to_iso(day),
+                    'marks': 0, 'first_seen': first_seen, 'last_seen': last_seen, 'sources': {},
+                }
+            entry['marks'] += marks
+            entry['first_seen'] = min(entry['first_seen'], first_seen)
+            entry['last_seen'] = max(entry['last_seen'], last_seen)
+            entry['sources'][source] = marks
+        return list(summary.values())
+    
+    def rebuild_daily_summary(self):
+        """Recompute daily_summary from the attendance table (backfill after bulk edits)."""
+        with self.transaction() as conn:
+            conn.execute('DELETE FROM daily_summary')
+            conn.execute(_SUMMARY_BACKFILL)
+            return conn.execute('SELECT COUNT(*) FROM daily_summary').fetchone()[0]
+    
+    def get_stats_summary(self, week_days=7, month_days=30):
+        """Today / week / month counts in one query, as plain dicts.
+        
+        Windows are calendar days ending today. Each window has 'marks' and
+        distinct 'users', overall and under 'departments'; 'total_users'
+        counts active users.
+        """
+        today = datetime.now().date()
+        windows = {
+            'today': day_key(today),
+            'week': day_key(today - timedelta(days=week_days - 1)),
+            'month': day_key(today - timedelta(days=month_days - 1)),
+        }
+        columns = ', '.join(f'''SUM(a.day >= {start}) AS {name}_marks,
+                   COUNT(DISTINCT CASE WHEN a.day >= {start} THEN a.user_id END) AS {name}_users'''
+                            for name, start in windows.items())
+        # Users drive the join so departments with no marks still count their members;
+        # each user's marks come from a (user_id, day) index range
+        query = f'''
+            SELECT COALESCE(u.department, 'Unassigned') AS department,
+                   COUNT(DISTINCT CASE WHEN u.is_active = 1 THEN u.id END) AS total_users,
+                   {columns}
+            FROM users u
+            LEFT JOIN attendance a ON a.user_id = u.id AND a.day >= ?
+            GROUP BY 1
+        '''
         
-        df = pd.read_sql_query(query, conn)
-        conn.close()
-        return df
+        summary = {'total_users': 0, 'departments': {}}
+        summary.update({name: {'marks': 0, 'users': 0} for name in windows})
+        for row in self._query(query, (min(windows.values()),)):
+            department = {'total_users': row[1]}
+            for i, name in enumerate(windows):
+                department[name] = {'marks': row[2 + 2 * i] or 0, 'users': row[3 + 2 * i]}
+                # A user has one department, so per-department counts add up exactly
+                summary[name]['marks'] += department[name]['marks']
+                summary[name]['users'] += department[name]['users']
+            summary['total_users'] += row[1]
+            summary['departments'][row[0]] = department
+        return summary
     
     def export_to_excel(self, filename=None):
         """Export all data to Excel with multiple sheets"""
         filename = filename or f"data/attendance_export_{datetime.now().strftime('%Y%m%d_%H%M%S')}.xlsx"
         
-        conn = sqlite3.connect(self.db_path)
-        
-        with pd.ExcelWriter(filename, engine='openpyxl') as writer:
+        with self.connection() as conn, pd.ExcelWriter(filename, engine='openpyxl') as writer:
             # Users sheet
             users_df = pd.read_sql_query('SELECT * FROM users', conn)
             users_df.to_excel(writer, sheet_name='Users', index=False)
@@ -155,6 +916,69 @@ class DatabaseManager:
             # Summary sheet
             summary_df = self.get_attendance_report()
             summary_df.to_excel(writer, sheet_name='Summary', index=False)
+            
+            # Daily totals sheet
+            daily_df = pd.DataFrame([{'date': entry['date'], 'marks': entry['marks'],
+                                      'first_seen': entry['first_seen'], 'last_seen': entry['last_seen'],
+                                      **entry['sources']} for entry in self.get_daily_summary()])
+            daily_df.to_excel(writer, sheet_name='Daily', index=False)
         
-        conn.close()
         return f"Data exported to {filename}"
+
+
+def _check_import_header(path, header):
+    missing = [column for column in ('Name', 'Time') if column not in header]
+    if missing:
+        raise ValueError(f"{path} has no {' or '.join(missing)} column (found: {', '.join(map(str, header)) or 'none'})")
+
+
+def _iter_attendance_chunks(path, chunksize):
+    """Yield DataFrame chunks (Name, Time[, Source]) from a CSV or XLSX file without loading it whole.
+    
+    Raises ValueError if the file lacks a Name or Time column.
+    """
+    if path.lower().endswith(('.xlsx', '.xlsm')):
+        from openpyxl import load_workbook
+        workbook = load_workbook(path, read_only=True, data_only=True)
+        try:
+            rows = workbook.active.iter_rows(values_only=True)
+            header = [str(cell) if cell is not None else '' for cell in next(rows, ())]
+            _check_import_header(path, header)
+            batch = []
+            for row in rows:
+                batch.append(row)
+                if len(batch) >= chunksize:
+                    yield pd.DataFrame(batch, columns=header)
+                    batch = []
+            if batch:
+                yield pd.DataFrame(batch, columns=header)
+        finally:
+            workbook.close()
+    else:
+        _check_import_header(path, list(pd.read_csv(path, nrows=0).columns))
+        yield from pd.read_csv(path, usecols=lambda column: column in ('Name', 'Time', 'Source'),
+                               dtype=str, keep_default_na=False, chunksize=chunksize)
+
+
+if __name__ == "__main__":
+    import argparse
+    parser = argparse.ArgumentParser(description="Attendance database tools")
+    parser.add_argument("--import", dest="import_path", metavar="FILE",
+                        help="Import attendance history from a CSV or XLSX file")
+    parser.add_argument("--rebuild-summary", action="store_true",
+                        help="Recompute the daily_summary table from attendance")
+    parser.add_argument("--db", default=config.DATABASE_PATH, help="Database path")
+    args = parser.parse_args()
+    if args.rebuild_summary:
+        print(f"daily_summary rebuilt: {DatabaseManager(args.db).rebuild_daily_summary()} rows")
+    elif args.import_path:
+        try:
+            result = DatabaseManager(args.db).import_attendance(args.import_path)
+        except ValueError as e:
+            parser.exit(1, f"Import failed: {e}\n")
+        print(f"Imported {result['inserted']} of {result['rows']} rows "
+              f"({result['skipped']} duplicates, {result['invalid']} invalid, "
+              f"{result['users_created']} new users) in {result['seconds']:.2f}s "
+              f"({result['rows_per_sec']:,.0f} rows/sec)")
+    else:
+        parser.print_help()
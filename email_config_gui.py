@@ -5,7 +5,7 @@ Email Notifications Configuration and Testing Interface
 import tkinter as tk
 from tkinter import ttk, messagebox, scrolledtext
 from email_notifier import EmailNotifier
-from simple_advanced_attendance import SimpleAdvancedAttendanceManager
+from attendance_service import get_attendance_service
 import pandas as pd
 from datetime import datetime
 import threading
@@ -18,7 +18,7 @@ class EmailNotificationGUI:
         self.root.configure(bg="#f0f0f0")
         
         self.email_notifier = EmailNotifier()
-        self.attendance_manager = SimpleAdvancedAttendanceManager()
+        self.attendance_manager = get_attendance_service()
         
         self.setup_ui()
     
@@ -0,0 +1,92 @@
+#!/usr/bin/env python3
+"""
+Multi-process face encoder pool fed through the shared-memory frame transport
+"""
+import multiprocessing as mp
+import queue
+from collections import namedtuple
+
+import numpy as np
+
+import config
+from frame_transport import SharedFrameTransport
+
+EncodingResult = namedtuple("EncodingResult", ["frame_id", "source", "timestamp", "face_locations", "face_encodings"])
+
+
+def _encoder_worker(transport, channel, results, model):
+    """Detect and encode faces for every frame announced on the channel."""
+    import face_recognition
+
+    while True:
+        descriptor, frame = transport.receive(channel)
+        if descriptor is None:
+            break
+        try:
+            # dlib needs a contiguous buffer, not a reversed-stride view
+            rgb_frame = np.ascontiguousarray(frame[:, :, ::-1])
+            face_locations = face_recognition.face_locations(rgb_frame, model=model)
+            face_encodings = []
+            if face_locations:
+                face_encodings = face_recognition.face_encodings(rgb_frame, face_locations)
+        except Exception as e:
+            print(f"Encoder worker error: {e}")
+            face_locations, face_encodings = [], []
+        finally:
+            transport.release(descriptor)
+
+        results.put(EncodingResult(descriptor.frame_id, descriptor.source, descriptor.timestamp,
+                                   face_locations, [encoding.tolist() for encoding in face_encodings]))
+
+
+class EncoderPool:
+    """Runs face detection and encoding in worker processes.
+
+    Frames travel through a SharedFrameTransport, so only descriptors and the
+    resulting 128-d encodings cross process boundaries. Several cameras can
+    share one pool by passing their camera index as ``source``.
+    """
+
+    def __init__(self, workers=None, num_slots=None, frame_shape=None, model=None):
+        self.workers = workers or config.IMAGE_PROCESSING_THREADS
+        self.model = model or config.FACE_RECOGNITION_MODEL
+        ctx = mp.get_context()
+        self.transport = SharedFrameTransport(num_slots=num_slots, frame_shape=frame_shape, channels=1, ctx=ctx)
+        self.results = ctx.Queue()
+        self._processes = []
+        for _ in range(self.workers):
+            process = ctx.Process(target=_encoder_worker,
+                                  args=(self.transport, 0, self.results, self.model), daemon=True)
+            process.start()
+            self._processes.append(process)
+
+    def __enter__(self):
+        return self
+
+    def __exit__(self, exc_type, exc, tb):
+        self.close()
+
+    def submit(self, frame, timestamp=None, source=0, block=False):
+        """Queue a frame for encoding; returns its frame_id, or None if every slot is busy."""
+        # A multiprocessing queue hands over released slots through a feeder thread, so a
+        # strictly non-blocking get can miss free slots; wait a few milliseconds instead
+        descriptor = self.transport.publish(frame, timestamp=timestamp, source=source,
+                                            timeout=None if block else 0.005)
+        return descriptor.frame_id if descriptor else None
+
+    def get_result(self, timeout=None):
+        """Return the next EncodingResult, or None if none arrived within the timeout."""
+        try:
+            return self.results.get(timeout=timeout)
+        except queue.Empty:
+            return None
+
+    def close(self):
+        """Stop the workers and free the shared frame slots."""
+        self.transport.shutdown_channel(0, consumers=len(self._processes))
+        for process in self._processes:
+            process.join(timeout=5)
+            if process.is_alive():
+                process.terminate()
+        self._processes = []
+        self.transport.close()
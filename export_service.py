@@ -0,0 +1,147 @@
+#!/usr/bin/env python3
+"""
+Background, debounced spreadsheet export for attendance data
+"""
+import atexit
+import os
+import threading
+import time
+
+import config
+from attendance_log import export_spreadsheet
+
+
+class SpreadsheetExporter:
+    """Regenerates XLSX (and optional CSV) snapshots off the marking path.
+
+    notify_change() only sets a flag. A background thread exports once marks
+    have been idle for ``idle_delay`` seconds, or at the latest
+    ``min_interval`` seconds after the first pending change, so a burst of
+    marks becomes a single export. Files are written to a temp path and
+    renamed into place.
+    """
+
+    def __init__(self, snapshot, xlsx_path, csv_path=None, min_interval=None, idle_delay=None):
+        self.snapshot = snapshot
+        self.xlsx_path = xlsx_path
+        self.csv_path = csv_path
+        self.min_interval = config.SPREADSHEET_EXPORT_INTERVAL if min_interval is None else min_interval
+        self.idle_delay = config.SPREADSHEET_EXPORT_IDLE if idle_delay is None else idle_delay
+
+        self._cond = threading.Condition()
+        self._export_lock = threading.Lock()
+        self._pending = 0
+        self._first_change = None
+        self._last_change = None
+        self._closed = False
+        self._status = {
+            'last_export': None,
+            'last_duration': None,
+            'last_error': None,
+            'last_rows': None,
+            'exports': 0,
+            'coalesced_changes': 0,
+        }
+
+        self._thread = threading.Thread(target=self._run, name="SpreadsheetExporter", daemon=True)
+        self._thread.start()
+
+    def notify_change(self, count=1):
+        """Record that attendance changed; returns immediately."""
+        with self._cond:
+            now = time.monotonic()
+            if not self._pending:
+                self._first_change = now
+            self._pending += count
+            self._last_change = now
+            self._cond.notify()
+
+    def _due_in(self):
+        """Seconds until the pending export should run (<= 0 means now)."""
+        now = time.monotonic()
+        idle_due = self._last_change + self.idle_delay - now
+        deadline_due = self._first_change + self.min_interval - now
+        return min(idle_due, deadline_due)
+
+    def _run(self):
+        while True:
+            with self._cond:
+                while not self._closed and (not self._pending or self._due_in() > 0):
+                    self._cond.wait(None if not self._pending else self._due_in())
+                if self._closed:
+                    return
+                pending, self._pending = self._pending, 0
+            self._export(pending)
+
+    def _export(self, coalesced):
+        with self._export_lock:
+            start = time.monotonic()
+            try:
+                df = self.snapshot()
+                export_spreadsheet(df, self.xlsx_path)
+                if self.csv_path:
+                    tmp_path = f"{self.csv_path}.tmp"
+                    df.to_csv(tmp_path, index=False)
+                    os.replace(tmp_path, self.csv_path)
+                update = {
+                    'last_export': time.time(),
+                    'last_error': None,
+                    'last_rows': len(df),
+                    'coalesced_changes': coalesced,
+                }
+            except Exception as e:
+                update = {'last_error': str(e)}
+                print(f"Spreadsheet export failed: {e}")
+            with self._cond:
+                self._status.update(update)
+                self._status['last_duration'] = time.monotonic() - start
+                if update['last_error'] is None:
+                    self._status['exports'] += 1
+
+    def export_now(self):
+        """Export synchronously, absorbing any pending changes."""
+        with self._cond:
+            pending, self._pending = self._pending, 0
+        self._export(pending)
+        return self.status()
+
+    def status(self):
+        """Last-export status plus the number of changes not yet exported."""
+        with self._cond:
+            status = dict(self._status)
+            status['pending_changes'] = self._pending
+        return status
+
+    def close(self, flush=True):
+        """Stop the background thread, exporting pending changes first if requested."""
+        with self._cond:
+            if self._closed:
+                return
+            self._closed = True
+            pending = self._pending
+            self._cond.notify()
+        self._thread.join(timeout=5)
+        if flush and pending:
+            self.export_now()
+
+
+_exporters = {}
+_exporters_lock = threading.Lock()
+
+
+def get_spreadsheet_exporter(snapshot, xlsx_path, csv_path=None):
+    """The process-wide exporter for ``xlsx_path``, created on first use.
+
+    Later callers share it; the most recent ``snapshot`` callable and
+    ``csv_path`` (None: no CSV snapshot) are used for the following exports.
+    """
+    key = os.path.abspath(xlsx_path)
+    with _exporters_lock:
+        exporter = _exporters.get(key)
+        if exporter is None or exporter._closed:
+            exporter = _exporters[key] = SpreadsheetExporter(snapshot, xlsx_path, csv_path)
+            atexit.register(exporter.close)
+        else:
+            exporter.snapshot = snapshot
+            exporter.csv_path = csv_path
+        return exporter
@@ -1,11 +1,16 @@
 # Handles face registration and recognition
+import atexit
 import face_recognition
 import cv2
 import os
+import time
 import numpy as np
 import config
+from camera_manager import get_camera_manager
+from stage_timer import StageTimer
+from recognition_stream import RecognitionStreamMixin
 
-class FaceRecognitionModule:
+class FaceRecognitionModule(RecognitionStreamMixin):
     def get_registered_names(self):
         """Return a list of registered names (from .npy files in data_dir)."""
         return [file[:-4] for file in os.listdir(self.data_dir) if file.endswith('.npy')]
@@ -24,6 +29,9 @@ class FaceRecognitionModule:
             os.makedirs(self.data_dir)
         self.known_face_encodings = []
         self.known_face_names = []
+        self._listeners = []
+        self.timer = StageTimer()
+        self._encoder_pool = None
         self.load_known_faces()
 
     def load_known_faces(self):
@@ -72,20 +80,10 @@ class FaceRecognitionModule:
         if name in self.known_face_names:
             return False, f"Name '{name}' is already registered. Please use a different name."
         
-        cap = cv2.VideoCapture(0)
-        if not cap.isOpened():
-            # Try different camera indices
-            for i in range(1, 4):
-                cap = cv2.VideoCapture(i)
-                if cap.isOpened():
-                    break
-            else:
-                return False, "Failed to access camera. Please check if camera is connected and not in use by another application."
-        
-        # Set camera properties for better quality
-        cap.set(cv2.CAP_PROP_FRAME_WIDTH, config.CAMERA_WIDTH)
-        cap.set(cv2.CAP_PROP_FRAME_HEIGHT, config.CAMERA_HEIGHT)
-        cap.set(cv2.CAP_PROP_FPS, config.CAMERA_FPS)
+        # Reuse the warm camera instead of opening and probing it every session
+        camera = get_camera_manager()
+        if not camera.acquire():
+            return False, "Failed to access camera. Please check if camera is connected and not in use by another application."
         
         cv2.namedWindow("Face Registration Preview", cv2.WINDOW_AUTOSIZE)
         captured = False
@@ -95,9 +93,9 @@ class FaceRecognitionModule:
         print("Position your face in the camera and press SPACE to capture, ESC to cancel")
         
         while True:
-            ret, frame = cap.read()
+            ret, frame = camera.read()
             if not ret:
-                cap.release()
+                camera.release()
                 cv2.destroyAllWindows()
                 return False, "Failed to capture image from camera."
             
@@ -129,14 +127,14 @@ class FaceRecognitionModule:
             cv2.imshow("Face Registration Preview", preview)
             key = cv2.waitKey(1) & 0xFF
             if key == 27:  # ESC
-                cap.release()
+                camera.release()
                 cv2.destroyAllWindows()
                 return False, "Registration cancelled."
             elif key == 32:  # SPACE
                 captured = True
                 break
         
-        cap.release()
+        camera.release()
         cv2.destroyAllWindows()
         
         if not captured or frame is None:
@@ -178,100 +176,108 @@ class FaceRecognitionModule:
         else:
             return False, "Face detected but encoding failed. Please try again with better lighting."
 
-    def recognize_faces(self):
-        if len(self.known_face_encodings) == 0:
+    def process_frame(self, frame):
+        """Detect, encode and match faces in one BGR frame.
+
+        Returns a list of (location, name, distance) tuples where name is
+        "Unknown" for unmatched faces and distance is the closest known face
+        (None when nobody is registered).
+        """
+        timer = self.timer
+        with timer.stage("color"):
+            rgb_frame = frame[:, :, ::-1]
+
+        # Use configured model for real-time recognition
+        with timer.stage("detect"):
+            face_locations = face_recognition.face_locations(rgb_frame, model=config.FACE_RECOGNITION_MODEL)
+        if not face_locations:
             return []
-        
-        cap = cv2.VideoCapture(0)
-        if not cap.isOpened():
-            # Try different camera indices
-            for i in range(1, 4):
-                cap = cv2.VideoCapture(i)
-                if cap.isOpened():
-                    break
-            else:
-                raise Exception("Failed to access camera. Please check if camera is connected and not in use by another application.")
-        
-        # Set camera properties
-        cap.set(cv2.CAP_PROP_FRAME_WIDTH, config.CAMERA_WIDTH)
-        cap.set(cv2.CAP_PROP_FRAME_HEIGHT, config.CAMERA_HEIGHT)
-        cap.set(cv2.CAP_PROP_FPS, config.CAMERA_FPS)
-        
-        recognized_names = set()
-        frame_count = 0
-        recognition_timeout = config.RECOGNITION_TIMEOUT_FRAMES
-        
-        print("Starting face recognition for attendance...")
-        print("Position yourself in front of the camera. Press 'q' to stop.")
-        
-        cv2.namedWindow("Attendance Recognition", cv2.WINDOW_AUTOSIZE)
-        
-        while frame_count < recognition_timeout:
-            ret, frame = cap.read()
-            if not ret:
-                print("Failed to read frame from camera")
-                break
-            
-            frame_count += 1
-            
-            # Flip frame horizontally for mirror effect
-            frame = cv2.flip(frame, 1)
-            
-            # Only process every nth frame for performance
-            if frame_count % config.FRAME_SKIP == 0:
-                rgb_frame = frame[:, :, ::-1]
-                
-                # Use configured model for real-time recognition
-                face_locations = face_recognition.face_locations(rgb_frame, model=config.FACE_RECOGNITION_MODEL)
-                
-                if face_locations:
-                    try:
-                        face_encodings = face_recognition.face_encodings(rgb_frame, face_locations, num_jitters=1, model="small")
-                    except Exception as e:
-                        print(f"Encoding error with small model: {e}")
-                        try:
-                            face_encodings = face_recognition.face_encodings(rgb_frame, face_locations)
-                        except Exception as e2:
-                            print(f"Encoding error with default: {e2}")
-                            continue  # Skip this frame
-                    
-                    for (top, right, bottom, left), face_encoding in zip(face_locations, face_encodings):
-                        # Use configured tolerance for better recognition
-                        matches = face_recognition.compare_faces(self.known_face_encodings, face_encoding, tolerance=config.FACE_RECOGNITION_TOLERANCE)
-                        name = "Unknown"
-                        
-                        if True in matches:
-                            # Get distances to find best match
-                            face_distances = face_recognition.face_distance(self.known_face_encodings, face_encoding)
-                            best_match_index = np.argmin(face_distances)
-                            
-                            if matches[best_match_index] and face_distances[best_match_index] < config.FACE_RECOGNITION_TOLERANCE:
-                                name = self.known_face_names[best_match_index]
-                                recognized_names.add(name)
-                        
-                        # Draw rectangle around face
-                        color = (0, 255, 0) if name != "Unknown" else (0, 0, 255)
-                        cv2.rectangle(frame, (left, top), (right, bottom), color, 2)
-                        
-                        # Draw label
-                        cv2.rectangle(frame, (left, bottom - 35), (right, bottom), color, cv2.FILLED)
-                        font = cv2.FONT_HERSHEY_DUPLEX
-                        cv2.putText(frame, name, (left + 6, bottom - 6), font, 0.6, (255, 255, 255), 1)
-            
-            # Show instructions
-            cv2.putText(frame, f"Recognized: {', '.join(recognized_names) if recognized_names else 'None'}", 
-                       (10, 30), cv2.FONT_HERSHEY_SIMPLEX, 0.7, (0, 255, 0), 2)
-            cv2.putText(frame, "Press 'q' to stop", (10, frame.shape[0] - 20), 
-                       cv2.FONT_HERSHEY_SIMPLEX, 0.7, (0, 255, 0), 2)
-            
-            cv2.imshow("Attendance Recognition", frame)
-            
-            # Check for quit key
-            if cv2.waitKey(1) & 0xFF == ord('q'):
+
+        with timer.stage("encode"):
+            try:
+                face_encodings = face_recognition.face_encodings(rgb_frame, face_locations, num_jitters=1, model="small")
+            except Exception as e:
+                print(f"Encoding error with small model: {e}")
+                try:
+                    face_encodings = face_recognition.face_encodings(rgb_frame, face_locations)
+                except Exception as e2:
+                    print(f"Encoding error with default: {e2}")
+                    return []  # Skip this frame
+
+        with timer.stage("match"):
+            return self.match_faces(face_locations, face_encodings)
+
+    def match_faces(self, face_locations, face_encodings):
+        """Match encodings against the registered faces; returns (location, name, distance) tuples."""
+        results = []
+        for location, face_encoding in zip(face_locations, face_encodings):
+            name = "Unknown"
+            distance = None
+            if self.known_face_encodings:
+                # Get distances to find best match
+                face_distances = face_recognition.face_distance(self.known_face_encodings, face_encoding)
+                best_match_index = np.argmin(face_distances)
+                distance = float(face_distances[best_match_index])
+
+                # Use configured tolerance for better recognition
+                if distance < config.FACE_RECOGNITION_TOLERANCE:
+                    name = self.known_face_names[best_match_index]
+            results.append((location, name, distance))
+        return results
+
+    def _get_encoder_pool(self, frame, busy=False):
+        """Worker processes for detection/encoding, started on first use and kept for later sessions.
+
+        The pool's shared slots are sized by the frame it was started with.
+        A larger frame (another camera or resolution) restarts it with
+        bigger slots; while ``busy`` (earlier frames still being encoded)
+        that can't happen yet and None is returned instead.
+        """
+        if self._encoder_pool is not None and frame.nbytes > self._encoder_pool.transport.slot_bytes:
+            if busy:
+                return None
+            self.close()
+        if self._encoder_pool is None:
+            from encoder_pool import EncoderPool
+            self._encoder_pool = EncoderPool(workers=config.RECOGNITION_WORKERS, frame_shape=frame.shape)
+            # Workers are daemons, but the shared-memory segment must be unlinked explicitly
+            atexit.unregister(self.close)
+            atexit.register(self.close)
+        return self._encoder_pool
+
+    def _recognize(self, frame_number, frame, pending):
+        """Hand the frame to the encoder pool, or recognize it here when there is none."""
+        pool = self._get_encoder_pool(frame, busy=bool(pending)) if config.RECOGNITION_WORKERS > 0 else None
+        if pool is None:
+            # No workers, or a frame too large for the pool's slots until it can be restarted
+            now = time.time()
+            return [(frame_number, self.process_frame(frame), now)]
+        # Dropped when every shared slot is still being encoded
+        frame_id = pool.submit(frame, timestamp=time.time())
+        if frame_id is not None:
+            pending[frame_id] = frame_number
+        return []
+
+    def _ready_results(self, pending, timeout):
+        return self._collect_encodings(pending, timeout) if pending else []
+
+    def _collect_encodings(self, pending, timeout):
+        """(frame number, matches, timestamp) for every encoder pool result that is ready."""
+        collected = []
+        while pending:
+            result = self._encoder_pool.get_result(timeout=0 if collected else timeout)
+            if result is None:
                 break
-        
-        cap.release()
-        cv2.destroyAllWindows()
-        
-        print(f"Recognition completed. Found: {list(recognized_names)}")
-        return list(recognized_names)
+            frame_number = pending.pop(result.frame_id, None)
+            if frame_number is None:
+                continue  # Left over from an earlier session
+            with self.timer.stage("match"):
+                matches = self.match_faces(result.face_locations, [np.array(e) for e in result.face_encodings])
+            collected.append((frame_number, matches, result.timestamp))
+        return collected
+
+    def close(self):
+        """Stop the encoder worker processes, if any were started."""
+        if self._encoder_pool is not None:
+            self._encoder_pool.close()
+            self._encoder_pool = None
@@ -4,14 +4,22 @@ import cv2
 import os
 import numpy as np
 import config
+from camera_manager import get_camera_manager
+from stage_timer import StageTimer
+from recognition_stream import RecognitionStreamMixin
+
+class FaceRecognitionModuleCompatible(RecognitionStreamMixin):
+    session_frames = 300
+    frame_skip = 5
 
-class FaceRecognitionModuleCompatible:
     def __init__(self, data_dir=None):
         self.data_dir = data_dir or config.DATA_DIR
         if not os.path.exists(self.data_dir):
             os.makedirs(self.data_dir)
         self.known_face_encodings = []
         self.known_face_names = []
+        self._listeners = []
+        self.timer = StageTimer()
         self.load_known_faces()
 
     def get_registered_names(self):
@@ -73,19 +81,10 @@ class FaceRecognitionModuleCompatible:
         if name in self.known_face_names:
             return False, f"Name '{name}' is already registered. Please use a different name."
         
-        cap = cv2.VideoCapture(0)
-        if not cap.isOpened():
-            # Try different camera indices
-            for i in range(1, 4):
-                cap = cv2.VideoCapture(i)
-                if cap.isOpened():
-                    break
-            else:
-                return False, "Failed to access camera. Please check if camera is connected and not in use by another application."
-        
-        # Set camera properties for better quality
-        cap.set(cv2.CAP_PROP_FRAME_WIDTH, 640)
-        cap.set(cv2.CAP_PROP_FRAME_HEIGHT, 480)
+        # Reuse the warm camera instead of opening and probing it every session
+        camera = get_camera_manager()
+        if not camera.acquire():
+            return False, "Failed to access camera. Please check if camera is connected and not in use by another application."
         
         cv2.namedWindow("Face Registration Preview", cv2.WINDOW_AUTOSIZE)
         captured = False
@@ -95,9 +94,9 @@ class FaceRecognitionModuleCompatible:
         print("Position your face in the camera and press SPACE to capture, ESC to cancel")
         
         while True:
-            ret, frame = cap.read()
+            ret, frame = camera.read()
             if not ret:
-                cap.release()
+                camera.release()
                 cv2.destroyAllWindows()
                 return False, "Failed to capture image from camera."
             
@@ -121,14 +120,14 @@ class FaceRecognitionModuleCompatible:
             cv2.imshow("Face Registration Preview", preview)
             key = cv2.waitKey(1) & 0xFF
             if key == 27:  # ESC
-                cap.release()
+                camera.release()
                 cv2.destroyAllWindows()
                 return False, "Registration cancelled."
             elif key == 32:  # SPACE
                 captured = True
                 break
         
-        cap.release()
+        camera.release()
         cv2.destroyAllWindows()
         
         if not captured or frame is None:
@@ -160,97 +159,39 @@ class FaceRecognitionModuleCompatible:
         except Exception as e:
             return False, f"Face encoding failed: {str(e)}. Please try again."
 
-    def recognize_faces(self):
-        if len(self.known_face_encodings) == 0:
+    def process_frame(self, frame):
+        """Detect, encode and match faces in one BGR frame.
+
+        Returns a list of (location, name, distance) tuples where name is
+        "Unknown" for unmatched faces and distance is the closest known face
+        (None when nobody is registered).
+        """
+        timer = self.timer
+        with timer.stage("color"):
+            rgb_frame = cv2.cvtColor(frame, cv2.COLOR_BGR2RGB)
+
+        # Use simpler face detection
+        with timer.stage("detect"):
+            face_locations = face_recognition.face_locations(rgb_frame, model="hog")
+        if not face_locations:
             return []
-        
-        cap = cv2.VideoCapture(0)
-        if not cap.isOpened():
-            # Try different camera indices
-            for i in range(1, 4):
-                cap = cv2.VideoCapture(i)
-                if cap.isOpened():
-                    break
-            else:
-                raise Exception("Failed to access camera. Please check if camera is connected and not in use by another application.")
-        
-        # Set camera properties
-        cap.set(cv2.CAP_PROP_FRAME_WIDTH, 640)
-        cap.set(cv2.CAP_PROP_FRAME_HEIGHT, 480)
-        
-        recognized_names = set()
-        frame_count = 0
-        recognition_timeout = 300  # frames
-        
-        print("Starting face recognition for attendance...")
-        print("Position yourself in front of the camera. Press 'q' to stop.")
-        
-        cv2.namedWindow("Attendance Recognition", cv2.WINDOW_AUTOSIZE)
-        
-        while frame_count < recognition_timeout:
-            ret, frame = cap.read()
-            if not ret:
-                print("Failed to read frame from camera")
-                break
-            
-            frame_count += 1
-            
-            # Flip frame horizontally for mirror effect
-            frame = cv2.flip(frame, 1)
-            
-            # Only process every 5th frame for performance
-            if frame_count % 5 == 0:
-                rgb_frame = cv2.cvtColor(frame, cv2.COLOR_BGR2RGB)
-                
-                try:
-                    # Use simpler face detection
-                    face_locations = face_recognition.face_locations(rgb_frame, model="hog")
-                    
-                    if face_locations:
-                        # Simple face encoding
-                        face_encodings = face_recognition.face_encodings(rgb_frame, face_locations)
-                        
-                        for (top, right, bottom, left), face_encoding in zip(face_locations, face_encodings):
-                            # Use simple face comparison
-                            matches = face_recognition.compare_faces(self.known_face_encodings, face_encoding, tolerance=0.6)
-                            name = "Unknown"
-                            
-                            if True in matches:
-                                # Get distances to find best match
-                                face_distances = face_recognition.face_distance(self.known_face_encodings, face_encoding)
-                                best_match_index = np.argmin(face_distances)
-                                
-                                if matches[best_match_index] and face_distances[best_match_index] < 0.6:
-                                    name = self.known_face_names[best_match_index]
-                                    recognized_names.add(name)
-                            
-                            # Draw rectangle around face
-                            color = (0, 255, 0) if name != "Unknown" else (0, 0, 255)
-                            cv2.rectangle(frame, (left, top), (right, bottom), color, 2)
-                            
-                            # Draw label
-                            cv2.rectangle(frame, (left, bottom - 35), (right, bottom), color, cv2.FILLED)
-                            font = cv2.FONT_HERSHEY_DUPLEX
-                            cv2.putText(frame, name, (left + 6, bottom - 6), font, 0.6, (255, 255, 255), 1)
-                
-                except Exception as e:
-                    print(f"Recognition error: {e}")
-                    continue
-            
-            # Show instructions
-            cv2.putText(frame, f"Recognized: {', '.join(recognized_names) if recognized_names else 'None'}", 
-                       (10, 30), cv2.FONT_HERSHEY_SIMPLEX, 0.7, (0, 255, 0), 2)
-            cv2.putText(frame, "Press 'q' to stop", (10, frame.shape[0] - 20), 
-                       cv2.FONT_HERSHEY_SIMPLEX, 0.7, (0, 255, 0), 2)
-            
-            cv2.imshow("Attendance Recognition", frame)
-            
-            # Check for quit key
-            if cv2.waitKey(1) & 0xFF == ord('q'):
-                break
-        
-        cap.release()
-        cv2.destroyAllWindows()
-        
-        print(f"Recognition completed. Found: {list(recognized_names)}")
-        return list(recognized_names)
+
+        # Simple face encoding
+        with timer.stage("encode"):
+            face_encodings = face_recognition.face_encodings(rgb_frame, face_locations)
+
+        results = []
+        with timer.stage("match"):
+            for location, face_encoding in zip(face_locations, face_encodings):
+                name = "Unknown"
+                distance = None
+                if self.known_face_encodings:
+                    # Get distances to find best match
+                    face_distances = face_recognition.face_distance(self.known_face_encodings, face_encoding)
+                    best_match_index = np.argmin(face_distances)
+                    distance = float(face_distances[best_match_index])
+
+                    if distance < 0.6:
+                        name = self.known_face_names[best_match_index]
+                results.append((location, name, distance))
+        return results
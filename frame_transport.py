@@ -0,0 +1,135 @@
+#!/usr/bin/env python3
+"""
+Shared-memory frame transport between capture and worker processes
+"""
+import multiprocessing as mp
+import queue
+import time
+from collections import namedtuple
+from multiprocessing import shared_memory
+
+import numpy as np
+import config
+
+# Small, picklable record sent through the descriptor queues instead of the frame itself
+FrameDescriptor = namedtuple("FrameDescriptor", ["slot", "frame_id", "shape", "timestamp", "source"])
+
+
+class SharedFrameTransport:
+    """Fixed pool of shared-memory frame slots with reference-counted recycling.
+
+    The producer copies each frame into a free slot once and pushes a
+    FrameDescriptor onto every consumer channel. Consumers map the slot as a
+    numpy view (no pickling of pixel data) and call release() when done; the
+    slot returns to the free list after the last channel releases it.
+    """
+
+    def __init__(self, num_slots=None, frame_shape=None, channels=1, dtype=np.uint8, ctx=None):
+        ctx = ctx or mp.get_context()
+        self.num_slots = num_slots or config.FRAME_TRANSPORT_SLOTS
+        self.frame_shape = tuple(frame_shape or (config.CAMERA_HEIGHT, config.CAMERA_WIDTH, 3))
+        self.dtype = np.dtype(dtype).str
+        self.slot_bytes = int(np.prod(self.frame_shape)) * np.dtype(dtype).itemsize
+
+        self._shm = shared_memory.SharedMemory(create=True, size=self.slot_bytes * self.num_slots)
+        self._owner = True
+        self._refcounts = ctx.Array('i', self.num_slots)
+        self._free = ctx.Queue()
+        for slot in range(self.num_slots):
+            self._free.put(slot)
+        self._channels = [ctx.Queue() for _ in range(channels)]
+        self._next_id = ctx.Value('q', 0)
+        self._buffer = None
+
+    def __getstate__(self):
+        # Child processes re-attach to the segment by name; only the creator unlinks it
+        state = self.__dict__.copy()
+        state['_owner'] = False
+        state['_buffer'] = None
+        return state
+
+    def __enter__(self):
+        return self
+
+    def __exit__(self, exc_type, exc, tb):
+        self.close()
+
+    @property
+    def channels(self):
+        return len(self._channels)
+
+    def _slot_array(self, slot, shape=None):
+        if self._buffer is None:
+            self._buffer = self._shm.buf
+        shape = tuple(shape or self.frame_shape)
+        return np.ndarray(shape, dtype=self.dtype, buffer=self._buffer, offset=slot * self.slot_bytes)
+
+    def publish(self, frame, timestamp=None, source=0, block=True, timeout=None):
+        """Copy a frame into a free slot and announce it on every channel.
+
+        Returns the FrameDescriptor, or None when no slot became free in time
+        (callers capturing live video should drop the frame rather than wait).
+        """
+        if frame.nbytes > self.slot_bytes:
+            raise ValueError(f"Frame of {frame.nbytes} bytes does not fit a {self.slot_bytes}-byte slot")
+
+        try:
+            slot = self._free.get(block=block, timeout=timeout)
+        except queue.Empty:
+            return None
+
+        np.copyto(self._slot_array(slot, frame.shape), frame, casting='no')
+        with self._next_id.get_lock():
+            self._next_id.value += 1
+            frame_id = self._next_id.value
+        with self._refcounts.get_lock():
+            self._refcounts[slot] = len(self._channels)
+
+        descriptor = FrameDescriptor(slot, frame_id, tuple(frame.shape), timestamp or time.time(), source)
+        for channel in self._channels:
+            channel.put(descriptor)
+        return descriptor
+
+    def receive(self, channel=0, block=True, timeout=None):
+        """Return (descriptor, frame_view) from a channel, or (None, None) on timeout/shutdown."""
+        try:
+            descriptor = self._channels[channel].get(block=block, timeout=timeout)
+        except queue.Empty:
+            return None, None
+        if descriptor is None:
+            return None, None
+        return descriptor, self.view(descriptor)
+
+    def view(self, descriptor):
+        """Read-only numpy view of a published frame; valid until release()."""
+        frame = self._slot_array(descriptor.slot, descriptor.shape)
+        frame.flags.writeable = False
+        return frame
+
+    def release(self, descriptor):
+        """Drop one reference to the descriptor's slot and recycle it at zero."""
+        with self._refcounts.get_lock():
+            self._refcounts[descriptor.slot] -= 1
+            remaining = self._refcounts[descriptor.slot]
+        if remaining == 0:
+            self._free.put(descriptor.slot)
+
+    def shutdown_channel(self, channel=0, consumers=1):
+        """Wake up consumers blocked on a channel so they can exit."""
+        for _ in range(consumers):
+            self._channels[channel].put(None)
+
+    def close(self):
+        """Detach from the shared segment, unlinking it if this process created it."""
+        self._buffer = None
+        try:
+            self._shm.close()
+        except BufferError:
+            # A caller still holds a view; the segment is freed when it goes away
+            pass
+        if self._owner:
+            try:
+                self._shm.unlink()
+            except FileNotFoundError:
+                pass
+            self._owner = False
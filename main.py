@@ -18,7 +18,7 @@ except ImportError:
         print(f"Failed to import face recognition module: {e}")
         exit(1)
 
-from attendance_manager import AttendanceManager
+from attendance_service import get_attendance_service
 
 # ...existing code...
 
@@ -83,7 +83,8 @@ def main():
             messagebox.showinfo("Clear All Faces", f"Deleted {removed} face data file(s).")
 
     face_module = FaceRecognitionModule()
-    attendance_manager = AttendanceManager()
+    # All marks go through the shared attendance service (this process or the one owning data/)
+    attendance_service = get_attendance_service()
 
     # List to store registered names
     registered_names = face_module.get_registered_names()
@@ -114,8 +115,9 @@ def main():
         try:
             recognized = face_module.recognize_faces()
             if recognized:
-                for name in recognized:
-                    attendance_manager.mark_attendance(name)
+                # One append for the whole session instead of one write per name
+                for success, message in attendance_service.mark_many(recognized).values():
+                    print(message)
                 messagebox.showinfo("Attendance", f"Attendance marked for: {', '.join(recognized)}")
             else:
                 messagebox.showinfo("Attendance", "No faces recognized.")
@@ -125,7 +127,7 @@ def main():
     def export_data():
         if messagebox.askyesno("Export", "Are you sure you want to export attendance to Excel?"):
             try:
-                attendance_manager.export_to_excel()
+                attendance_service.export_to_excel()
                 messagebox.showinfo("Export", "Attendance exported to Excel.")
             except Exception as e:
                 messagebox.showerror("Export Error", f"Failed to export: {e}")
@@ -16,7 +16,8 @@ import config
 # Import all the new modules
 try:
     from face_recognition_module_compatible import FaceRecognitionModuleCompatible
-    from advanced_attendance import AdvancedAttendanceManager
+    from recognition_events import IdentityMatched, SessionStats
+    from attendance_service import get_attendance_service
     from database_manager import DatabaseManager
     from email_notifier import EmailNotifier
 except ImportError as e:
@@ -249,7 +250,7 @@ class MasterControlPanel:
         """Initialize all system modules"""
         try:
             self.face_module = FaceRecognitionModuleCompatible()
-            self.attendance_manager = AdvancedAttendanceManager()
+            self.attendance_manager = get_attendance_service()
             self.db_manager = DatabaseManager()
             self.email_notifier = EmailNotifier()
             
@@ -305,11 +306,14 @@ class MasterControlPanel:
     def _attendance_thread(self):
         """Attendance recognition in separate thread"""
         try:
-            recognized = self.face_module.recognize_faces()
-            for name in recognized:
-                success, message = self.attendance_manager.mark_attendance(name)
-                self.log_activity(f"Attendance: {name} - {message}")
-            
+            # Mark each person the moment they are first recognized instead of after the session
+            for event in self.face_module.recognize_faces_stream():
+                if isinstance(event, IdentityMatched) and event.first_seen:
+                    success, message = self.attendance_manager.mark_attendance(event.name)
+                    self.log_activity(f"Attendance: {event.name} - {message}")
+                elif isinstance(event, SessionStats):
+                    self.log_activity(f"Session ended: {event.frames} frames, {len(event.recognized)} recognized, {event.fps:.1f} FPS")
+
             self.update_status("Attendance completed", "green")
         except Exception as e:
             self.log_activity(f"Attendance error: {str(e)}")
@@ -403,7 +407,7 @@ Attendance by Person:
         name = self.manual_name_entry.get()
         if name:
             try:
-                success, message = self.attendance_manager.mark_attendance(name)
+                success, message = self.attendance_manager.mark_attendance(name, source="manual")
                 self.log_activity(f"Manual attendance: {name} - {message}")
                 self.manual_name_entry.delete(0, tk.END)
                 messagebox.showinfo("Attendance", message)
@@ -427,7 +431,27 @@ Attendance by Person:
         messagebox.showinfo("Backup", "Database backup feature coming soon!")
     
     def import_data(self):
-        messagebox.showinfo("Import", "Data import feature coming soon!")
+        """Import attendance history (CSV/XLSX) into the database"""
+        filename = filedialog.askopenfilename(
+            title="Import attendance history",
+            initialdir=config.DATA_DIR,
+            filetypes=[("Attendance files", "*.csv *.xlsx"), ("All files", "*.*")]
+        )
+        if filename:
+            self.update_status("Importing attendance data...", "blue")
+            threading.Thread(target=self._import_thread, args=(filename,)).start()
+    
+    def _import_thread(self, filename):
+        """Data import in separate thread"""
+        try:
+            result = self.db_manager.import_attendance(filename)
+            self.log_activity(f"Imported {result['inserted']} of {result['rows']} rows from {filename} "
+                              f"({result['skipped']} duplicates, {result['invalid']} invalid, "
+                              f"{result['users_created']} new users, {result['rows_per_sec']:,.0f} rows/sec)")
+            self.update_status("Import completed", "green")
+        except Exception as e:
+            self.log_activity(f"Import error: {str(e)}")
+            self.update_status("Import error", "red")
     
     def generate_daily_report(self):
         messagebox.showinfo("Report", "Daily report generated!")
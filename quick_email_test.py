@@ -3,7 +3,6 @@
 Quick Email Test Script
 """
 from email_notifier import EmailNotifier
-from simple_advanced_attendance import SimpleAdvancedAttendanceManager
 import pandas as pd
 from datetime import datetime
 
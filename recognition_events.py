@@ -0,0 +1,32 @@
+#!/usr/bin/env python3
+"""
+Typed events emitted by the streaming face recognition API
+"""
+from collections import namedtuple
+
+
+class RecognitionEvent:
+    """Base class for all events yielded by recognize_faces_stream()."""
+    __slots__ = ()
+
+
+class FaceDetected(RecognitionEvent, namedtuple("FaceDetected", ["frame_index", "location", "timestamp"])):
+    """A face was found in a processed frame (before identification)."""
+    __slots__ = ()
+
+
+class IdentityMatched(RecognitionEvent, namedtuple("IdentityMatched",
+                                                   ["frame_index", "name", "distance", "location", "timestamp", "first_seen"])):
+    """A face matched a registered person; first_seen is True once per session."""
+    __slots__ = ()
+
+
+class UnknownFace(RecognitionEvent, namedtuple("UnknownFace", ["frame_index", "location", "distance", "timestamp"])):
+    """A face did not match anyone; distance is the closest known face or None."""
+    __slots__ = ()
+
+
+class SessionStats(RecognitionEvent, namedtuple("SessionStats",
+                                                ["frames", "processed_frames", "faces", "recognized", "elapsed", "fps"])):
+    """Summary emitted when a recognition session ends."""
+    __slots__ = ()
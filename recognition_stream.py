@@ -0,0 +1,181 @@
+#!/usr/bin/env python3
+"""
+Event listeners and the camera session loop shared by the face recognition modules
+"""
+import time
+
+import cv2
+import config
+from camera_manager import get_camera_manager
+from recognition_events import FaceDetected, IdentityMatched, UnknownFace, SessionStats
+
+
+class RecognitionStreamMixin:
+    """Streaming recognition API: listeners, recognize_faces_stream() and recognize_faces().
+
+    The class using it sets ``self._listeners = []`` and ``self.timer`` (a
+    StageTimer) and provides known_face_encodings and process_frame(frame).
+    Frames are recognized in place by default; override _recognize() and
+    _ready_results() to hand them to workers instead.
+    """
+
+    session_frames = None  # Frames per session (None: config.RECOGNITION_TIMEOUT_FRAMES)
+    frame_skip = None      # Recognize every nth frame (None: config.FRAME_SKIP)
+
+    def add_event_listener(self, callback):
+        """Register a callback invoked with every recognition event as it happens."""
+        if callback not in self._listeners:
+            self._listeners.append(callback)
+
+    def remove_event_listener(self, callback):
+        """Unregister a callback added with add_event_listener()."""
+        if callback in self._listeners:
+            self._listeners.remove(callback)
+
+    def _emit(self, event):
+        for callback in list(self._listeners):
+            try:
+                callback(event)
+            except Exception as e:
+                print(f"Recognition listener error: {e}")
+        return event
+
+    def _frame_events(self, frame_number, results, now, recognized_names):
+        for location, name, distance in results:
+            yield self._emit(FaceDetected(frame_number, location, now))
+            if name != "Unknown":
+                first_seen = name not in recognized_names
+                recognized_names.add(name)
+                yield self._emit(IdentityMatched(frame_number, name, distance, location, now, first_seen))
+            else:
+                yield self._emit(UnknownFace(frame_number, location, distance, now))
+
+    def _recognize(self, frame_number, frame, pending):
+        """Recognize one frame; returns the (frame number, matches, timestamp) tuples now ready.
+
+        Frames handed off elsewhere are recorded in ``pending`` and returned
+        later by _ready_results().
+        """
+        now = time.time()
+        try:
+            return [(frame_number, self.process_frame(frame), now)]
+        except Exception as e:
+            print(f"Recognition error: {e}")
+            return [(frame_number, [], now)]
+
+    def _ready_results(self, pending, timeout):
+        """Results for pending frames that have finished (none when frames are recognized in place)."""
+        return []
+
+    def recognize_faces_stream(self):
+        """Run a recognition session, yielding typed events as they happen.
+
+        Yields FaceDetected, IdentityMatched, UnknownFace and finally
+        SessionStats. Registered listeners receive the same events. Closing
+        the generator early releases the camera.
+        """
+        if len(self.known_face_encodings) == 0:
+            return
+
+        # Reuse the warm camera instead of opening and probing it every session
+        camera = get_camera_manager()
+        if not camera.acquire():
+            raise Exception("Failed to access camera. Please check if camera is connected and not in use by another application.")
+
+        recognized_names = set()
+        pending = {}  # Frames handed off but not recognized yet
+        frame_count = 0
+        processed_frames = 0
+        face_count = 0
+        recognition_timeout = self.session_frames or config.RECOGNITION_TIMEOUT_FRAMES
+        frame_skip = self.frame_skip or config.FRAME_SKIP
+        start_time = time.monotonic()
+
+        print("Starting face recognition for attendance...")
+        print("Position yourself in front of the camera. Press 'q' to stop.")
+
+        cv2.namedWindow("Attendance Recognition", cv2.WINDOW_AUTOSIZE)
+
+        timer = self.timer
+        timer.start_session()
+        try:
+            while frame_count < recognition_timeout:
+                with timer.stage("capture"):
+                    ret, frame = camera.read()
+                if not ret:
+                    print("Failed to read frame from camera")
+                    break
+
+                frame_count += 1
+
+                # Flip frame horizontally for mirror effect
+                with timer.stage("flip"):
+                    frame = cv2.flip(frame, 1)
+                results = []
+
+                # Only process every nth frame for performance
+                processed = self._recognize(frame_count, frame, pending) if frame_count % frame_skip == 0 else []
+                processed += self._ready_results(pending, timeout=0)
+
+                for number, frame_results, now in processed:
+                    processed_frames += 1
+                    face_count += len(frame_results)
+                    yield from self._frame_events(number, frame_results, now, recognized_names)
+                    results = frame_results
+
+                with timer.stage("draw"):
+                    for (top, right, bottom, left), name, _ in results:
+                        # Draw rectangle around face
+                        color = (0, 255, 0) if name != "Unknown" else (0, 0, 255)
+                        cv2.rectangle(frame, (left, top), (right, bottom), color, 2)
+
+                        # Draw label
+                        cv2.rectangle(frame, (left, bottom - 35), (right, bottom), color, cv2.FILLED)
+                        font = cv2.FONT_HERSHEY_DUPLEX
+                        cv2.putText(frame, name, (left + 6, bottom - 6), font, 0.6, (255, 255, 255), 1)
+
+                    # Show instructions
+                    cv2.putText(frame, f"Recognized: {', '.join(recognized_names) if recognized_names else 'None'}",
+                               (10, 30), cv2.FONT_HERSHEY_SIMPLEX, 0.7, (0, 255, 0), 2)
+                    cv2.putText(frame, "Press 'q' to stop", (10, frame.shape[0] - 20),
+                               cv2.FONT_HERSHEY_SIMPLEX, 0.7, (0, 255, 0), 2)
+                    if config.PROFILING_OVERLAY:
+                        timer.draw_overlay(frame)
+
+                with timer.stage("display"):
+                    cv2.imshow("Attendance Recognition", frame)
+
+                    # Check for quit key
+                    key = cv2.waitKey(1) & 0xFF
+                if key == ord('q'):
+                    break
+
+            # Frames still being recognized when the session ended
+            while pending:
+                processed = self._ready_results(pending, timeout=1.0)
+                if not processed:
+                    break
+                for number, frame_results, now in processed:
+                    processed_frames += 1
+                    face_count += len(frame_results)
+                    yield from self._frame_events(number, frame_results, now, recognized_names)
+        finally:
+            camera.release()
+            cv2.destroyAllWindows()
+            timer.end_session()
+            if timer.enabled and config.PROFILING_EXPORT_PATH:
+                timer.to_json(config.PROFILING_EXPORT_PATH)
+
+        elapsed = time.monotonic() - start_time
+        yield self._emit(SessionStats(frame_count, processed_frames, face_count, sorted(recognized_names),
+                                      elapsed, frame_count / elapsed if elapsed > 0 else 0.0))
+
+    def recognize_faces(self):
+        """Run a full recognition session and return the recognized names."""
+        recognized_names = []
+        for event in self.recognize_faces_stream():
+            if isinstance(event, IdentityMatched) and event.first_seen:
+                recognized_names.append(event.name)
+
+        print(f"Recognition completed. Found: {recognized_names}")
+        return recognized_names
@@ -4,7 +4,15 @@ Simplified Advanced Attendance Manager - Compatible Version
 """
 import pandas as pd
 import os
+import threading
+import time
 from datetime import datetime, timedelta
+import config
+from attendance_aggregates import AttendanceAggregates, day_to_date
+from attendance_columns import ColumnarAttendance, Interner, read_columnar_partition
+from attendance_index import DailyMarkIndex
+from attendance_partitions import PartitionedAttendanceStore, partition_key
+from export_service import get_spreadsheet_exporter
 
 class SimpleAdvancedAttendanceManager:
     def __init__(self, data_dir="data"):
@@ -12,58 +20,164 @@ class SimpleAdvancedAttendanceManager:
         if not os.path.exists(self.data_dir):
             os.makedirs(self.data_dir)
         self.attendance_file = os.path.join(self.data_dir, "attendance.csv")
+        self.load_stats = {'files': 0, 'rows': 0, 'parse_seconds': 0.0, 'last_file': None,
+                           'last_parse_seconds': 0.0, 'last_memory_bytes': 0}
+        # Marks are held column-wise: int32 person ids, int64 epoch seconds, uint8 source codes
+        self.people = Interner('int32')
+        self.sources = Interner('uint8')
+        # Guards self.marks: held by marking and by the exporter thread while it copies them
+        self._lock = threading.RLock()
+        # History lives in monthly partitions; past months are parsed once and cached
+        self.store = PartitionedAttendanceStore(self.data_dir, legacy_file=self.attendance_file,
+                                                reader=self._read_partition, combine=ColumnarAttendance.concat)
+        self._marked_on_day = DailyMarkIndex(self._names_marked_on)
+        # Running per-day/person counts answer get_attendance_stats without scanning marks
+        self.aggregates = AttendanceAggregates(self.store)
         self.load_data()
+        # attendance.csv and attendance.xlsx are full-history snapshots regenerated in the background.
+        # Until attendance.csv has been split into partitions it is the only copy of its rows, so it
+        # is left alone (the split is retried on every start)
+        csv_path = self.attendance_file if self.store.migrated() else None
+        if csv_path is None:
+            print(f"{self.attendance_file} will not be overwritten by exports until it has been split "
+                  f"into partitions; fix the file and restart.")
+        self.exporter = get_spreadsheet_exporter(self._snapshot, os.path.join(self.data_dir, "attendance.xlsx"),
+                                                 csv_path=csv_path)
+    
+    def _read_partition(self, path):
+        """Read one partition into columnar form, timing the parse"""
+        start = time.perf_counter()
+        marks = read_columnar_partition(path, self.people, self.sources)
+        elapsed = time.perf_counter() - start
+        self.load_stats['files'] += 1
+        self.load_stats['rows'] += len(marks)
+        self.load_stats['parse_seconds'] += elapsed
+        self.load_stats['last_file'] = path
+        self.load_stats['last_parse_seconds'] = elapsed
+        self.load_stats['last_memory_bytes'] = marks.memory_bytes()
+        return marks
+    
+    def load_report(self):
+        """Parse time and memory of the loaded data"""
+        report = dict(self.load_stats)
+        report['current_rows'] = len(self.marks)
+        report['current_memory_bytes'] = self.marks.memory_bytes()
+        report['people'] = len(self.people)
+        return report
+    
+    def _empty(self):
+        return ColumnarAttendance(self.people, self.sources)
+    
+    def _snapshot(self):
+        """Full history for the background exporter (runs on its thread)"""
+        with self._lock:
+            current = self.marks[:]
+        marks = self.store.read_all(current=current)
+        return (marks if marks is not None else self._empty()).to_export_frame()
+    
+    def _range_frame(self, start, end):
+        """Marks from the partitions overlapping [start, end] (None if there are none)"""
+        return self.store.read_range(start, end, current=self.marks)
+    
+    def _names_marked_on(self, day):
+        """Scan the day's partition once for the names marked on a YYYY-MM-DD day"""
+        marks = self._range_frame(day, day)
+        if marks is None:
+            return []
+        start = datetime.strptime(day, "%Y-%m-%d")
+        return marks.names(marks.range_mask(start, start + timedelta(days=1)))
     
     def load_data(self):
-        if os.path.exists(self.attendance_file):
+        """Load only the current month's partition"""
+        with self._lock:
+            self._marked_on_day.invalidate()
+            self._current_key = self.store.current_key()
             try:
-                self.df = pd.read_csv(self.attendance_file)
-                # Ensure we have the required columns
-                if 'Time' in self.df.columns:
-                    self.df['Date'] = pd.to_datetime(self.df['Time']).dt.date
-                    self.df['Time_Only'] = pd.to_datetime(self.df['Time']).dt.time
-                else:
-                    self.df = pd.DataFrame(columns=["Name", "Time", "Date", "Time_Only"])
+                marks = self.store.load_current()
+                # Own copy: the in-memory month grows with every mark
+                self.marks = marks[:] if marks is not None else self._empty()
             except Exception as e:
                 print(f"Error loading data: {e}")
-                self.df = pd.DataFrame(columns=["Name", "Time", "Date", "Time_Only"])
-        else:
-            self.df = pd.DataFrame(columns=["Name", "Time", "Date", "Time_Only"])
+                self.marks = self._empty()
     
-    def mark_attendance(self, name, custom_time=None):
+    def mark_attendance(self, name, custom_time=None, source="auto"):
         """Mark attendance with optional custom time"""
-        now = custom_time or datetime.now()
+        return self.mark_many([name], timestamp=custom_time, source=source)[name]
+    
+    def mark_many(self, names, timestamp=None, source="auto", wait=True):
+        """Mark attendance for several people with one append
+        
+        Returns {name: (success, message)} in input order; repeated names are
+        only marked once. With wait=False returns (results, ticket) without
+        waiting for the journal fsync; callers holding a lock release it and
+        then call store.wait_durable(ticket), so concurrent marks share an fsync.
+        """
+        now = timestamp or datetime.now()
         time_str = now.strftime("%Y-%m-%d %H:%M:%S")
         date_only = now.date()
-        time_only = now.time()
-        
-        # Check if already marked today
-        if not self.df.empty and 'Date' in self.df.columns:
-            already_marked = ((self.df["Name"] == name) & (self.df["Date"] == date_only)).any()
-        else:
-            already_marked = False
+        day = date_only.isoformat()
         
-        if not already_marked:
-            new_row = pd.DataFrame([[name, time_str, date_only, time_only]], 
-                                 columns=["Name", "Time", "Date", "Time_Only"])
-            self.df = pd.concat([self.df, new_row], ignore_index=True)
-            self.save_data()
-            return True, f"Attendance marked for {name} at {time_str}"
-        else:
-            return False, f"Attendance already marked for {name} today."
+        with self._lock:
+            if self.store.current_key() != self._current_key:
+                self.load_data()  # Month rolled over
+            
+            results = {}
+            new_names = []
+            ticket = None
+            for name in names:
+                if name in results:
+                    continue
+                # Set lookup, rebuilt only when the day changes
+                if self._marked_on_day.contains(name, day):
+                    results[name] = (False, f"Attendance already marked for {name} today.")
+                    continue
+                new_names.append(name)
+                results[name] = None  # Keeps input order; filled in once the append succeeded
+            
+            if new_names:
+                # One append to the month's partition; full CSV/XLSX rewrites are left to save_data()
+                spans = {}
+                ticket = self.store.append_many([{"Name": name, "Time": time_str, "Date": day,
+                                                  "Time_Only": time_str[11:], "Source": source} for name in new_names],
+                                                wait=False, spans=spans)
+                # Only now are they marked; if the append raised, a retry is not rejected as a duplicate
+                for name in new_names:
+                    self._marked_on_day.add(name, day)
+                    results[name] = (True, f"Attendance marked for {name} at {time_str}")
+                key = partition_key(date_only)
+                self.aggregates.record(key, int(date_only.strftime("%Y%m%d")), new_names, spans.get(key))
+                if partition_key(date_only) == self._current_key:
+                    self.marks.append(new_names, now.replace(microsecond=0), source)
+                if config.SPREADSHEET_EXPORT_ENABLED:
+                    self.exporter.notify_change(len(new_names))
+        if not wait:
+            return results, ticket
+        self.store.wait_durable(ticket)
+        return results
     
     def save_data(self):
-        """Save to both CSV and Excel"""
+        """Compact the current partition and regenerate the CSV/Excel snapshots (on demand)"""
         try:
-            self.df.to_csv(self.attendance_file, index=False)
-            excel_file = os.path.join(self.data_dir, "attendance.xlsx")
-            self.df.to_excel(excel_file, index=False)
+            with self._lock:
+                self.store.compact(self._current_key, self.marks.to_export_frame())
+            self.aggregates.refresh(self._current_key)
+            self.aggregates.save()
+            self.exporter.export_now()
         except Exception as e:
             print(f"Error saving data: {e}")
     
+    def export_status(self):
+        """Status of the background spreadsheet export (last export time, errors, pending marks)"""
+        return self.exporter.status()
+    
     def get_attendance_stats(self, days=30):
         """Get attendance statistics for last N days"""
-        if self.df.empty:
+        today = datetime.now().date()
+        cutoff_date = today - timedelta(days=days)
+        # Answered from the running counters; cost depends on the window, not the history
+        total, by_person, by_day = self.aggregates.window(int(cutoff_date.strftime("%Y%m%d")),
+                                                          int(today.strftime("%Y%m%d")))
+        if not total:
             return {
                 'total_attendances': 0,
                 'unique_people': 0,
@@ -73,46 +187,18 @@ class SimpleAdvancedAttendanceManager:
                 'attendance_by_date': {}
             }
         
-        try:
-            cutoff_date = datetime.now().date() - timedelta(days=days)
-            if 'Date' in self.df.columns:
-                recent_df = self.df[pd.to_datetime(self.df['Date']) >= pd.to_datetime(cutoff_date)]
-            else:
-                recent_df = self.df
-            
-            if recent_df.empty:
-                return {
-                    'total_attendances': 0,
-                    'unique_people': 0,
-                    'daily_average': 0,
-                    'most_punctual': None,
-                    'attendance_by_person': {},
-                    'attendance_by_date': {}
-                }
-            
-            stats = {
-                'total_attendances': len(recent_df),
-                'unique_people': recent_df['Name'].nunique(),
-                'daily_average': len(recent_df) / days,
-                'most_punctual': recent_df['Name'].value_counts().index[0] if len(recent_df) > 0 else None,
-                'attendance_by_person': recent_df['Name'].value_counts().to_dict(),
-                'attendance_by_date': recent_df.groupby('Date').size().to_dict() if 'Date' in recent_df.columns else {}
-            }
-            return stats
-        except Exception as e:
-            print(f"Error calculating stats: {e}")
-            return {
-                'total_attendances': 0,
-                'unique_people': 0,
-                'daily_average': 0,
-                'most_punctual': None,
-                'attendance_by_person': {},
-                'attendance_by_date': {}
-            }
+        return {
+            'total_attendances': total,
+            'unique_people': len(by_person),
+            'daily_average': total / days,
+            'most_punctual': next(iter(by_person)),
+            'attendance_by_person': by_person,
+            'attendance_by_date': {day_to_date(day): count for day, count in by_day.items()}
+        }
     
     def generate_report(self, output_file=None):
         """Generate detailed attendance report"""
-        if self.df.empty:
+        if not self.store.has_data():
             return "No attendance data available."
         
         output_file = output_file or os.path.join(self.data_dir, "attendance_report.txt")
@@ -137,7 +223,8 @@ ATTENDANCE BY PERSON:
                 report += f"- {name}: {count} days\n"
             
             report += "\nRECENT ATTENDANCE:\n"
-            recent = self.df.tail(10)
+            recent = self._range_frame(datetime.now().date() - timedelta(days=30), datetime.now().date())
+            recent = recent.tail(10).to_frame() if recent is not None else pd.DataFrame(columns=["Name", "Time"])
             for _, row in recent.iterrows():
                 report += f"- {row['Name']}: {row['Time']}\n"
             
@@ -150,7 +237,7 @@ ATTENDANCE BY PERSON:
     
     def create_simple_chart(self):
         """Create a simple text-based chart"""
-        if self.df.empty:
+        if not self.store.has_data():
             return "No data to visualize"
         
         try:
@@ -186,6 +273,11 @@ if __name__ == "__main__":
     success, message = manager.mark_attendance("TestUser")
     print(f"Mark attendance: {message}")
     
+    # Loading cost
+    load = manager.load_report()
+    print(f"Loaded {load['current_rows']} rows in {load['last_parse_seconds'] * 1000:.1f} ms, "
+          f"{load['current_memory_bytes'] / 1024:.1f} KiB in memory")
+    
     # Get statistics
     stats = manager.get_attendance_stats()
     print("\nCurrent Statistics:")
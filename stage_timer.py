@@ -0,0 +1,160 @@
+#!/usr/bin/env python3
+"""
+Low-overhead per-stage timing for the recognition hot path
+"""
+import json
+import threading
+import time
+from collections import deque
+
+import config
+
+
+class _NullStage:
+    """Context manager returned while timing is disabled; does nothing."""
+    __slots__ = ()
+
+    def __enter__(self):
+        return self
+
+    def __exit__(self, exc_type, exc, tb):
+        return False
+
+
+_NULL_STAGE = _NullStage()
+
+
+class _Stage:
+    __slots__ = ("timer", "name", "start")
+
+    def __init__(self, timer, name):
+        self.timer = timer
+        self.name = name
+
+    def __enter__(self):
+        self.start = time.perf_counter()
+        return self
+
+    def __exit__(self, exc_type, exc, tb):
+        self.timer.record(self.name, time.perf_counter() - self.start)
+        return False
+
+
+def _percentile(sorted_values, pct):
+    if not sorted_values:
+        return 0.0
+    index = min(len(sorted_values) - 1, int(round(pct / 100.0 * (len(sorted_values) - 1))))
+    return sorted_values[index]
+
+
+def _describe(samples):
+    """Summarize a list of durations (seconds) in milliseconds."""
+    values = sorted(samples)
+    count = len(values)
+    total = sum(values)
+    return {
+        'count': count,
+        'total_ms': total * 1000.0,
+        'mean_ms': (total / count * 1000.0) if count else 0.0,
+        'p50_ms': _percentile(values, 50) * 1000.0,
+        'p95_ms': _percentile(values, 95) * 1000.0,
+        'p99_ms': _percentile(values, 99) * 1000.0,
+        'max_ms': (values[-1] * 1000.0) if count else 0.0,
+    }
+
+
+class StageTimer:
+    """Collects per-stage durations with rolling percentiles and session summaries.
+
+    Use ``with timer.stage("detect"):`` around each stage. While disabled,
+    stage() returns a shared no-op context manager, so the instrumentation
+    costs one attribute check per stage. Toggle at runtime with enable() and
+    disable().
+    """
+
+    def __init__(self, enabled=None, window=None):
+        self.enabled = config.PROFILING_ENABLED if enabled is None else enabled
+        self.window = window or config.PROFILING_WINDOW
+        self._lock = threading.Lock()
+        self._rolling = {}
+        self._session = None
+        self._session_start = None
+        self.sessions = deque(maxlen=config.PROFILING_SESSION_HISTORY)
+
+    def enable(self):
+        self.enabled = True
+
+    def disable(self):
+        self.enabled = False
+
+    def stage(self, name):
+        """Return a context manager timing one execution of the named stage."""
+        if not self.enabled:
+            return _NULL_STAGE
+        return _Stage(self, name)
+
+    def record(self, name, seconds):
+        """Record a duration for a stage measured elsewhere."""
+        with self._lock:
+            samples = self._rolling.get(name)
+            if samples is None:
+                samples = self._rolling[name] = deque(maxlen=self.window)
+            samples.append(seconds)
+            if self._session is not None:
+                self._session.setdefault(name, []).append(seconds)
+
+    def start_session(self):
+        """Begin collecting a per-session summary."""
+        with self._lock:
+            self._session = {}
+            self._session_start = time.perf_counter()
+
+    def end_session(self):
+        """Finish the current session and return (and keep) its summary."""
+        with self._lock:
+            if self._session is None:
+                return None
+            summary = {
+                'ended_at': time.time(),
+                'wall_ms': (time.perf_counter() - self._session_start) * 1000.0,
+                'stages': {name: _describe(samples) for name, samples in self._session.items()},
+            }
+            self._session = None
+            self.sessions.append(summary)
+            return summary
+
+    def summary(self):
+        """Rolling p50/p95/p99 per stage over the most recent samples."""
+        with self._lock:
+            return {name: _describe(samples) for name, samples in self._rolling.items()}
+
+    def reset(self):
+        with self._lock:
+            self._rolling.clear()
+            self.sessions.clear()
+
+    def to_json(self, path=None):
+        """Export rolling stats and session summaries as JSON (to a file if path is given)."""
+        data = json.dumps({
+            'enabled': self.enabled,
+            'window': self.window,
+            'rolling': self.summary(),
+            'sessions': list(self.sessions),
+        }, indent=2)
+        if path:
+            with open(path, 'w', encoding='utf-8') as f:
+                f.write(data)
+        return data
+
+    def draw_overlay(self, frame, origin=(10, 60)):
+        """Draw rolling p50/p95 per stage onto a BGR frame."""
+        if not self.enabled:
+            return frame
+        import cv2
+
+        x, y = origin
+        for name, stats in sorted(self.summary().items()):
+            text = f"{name:>8}: p50 {stats['p50_ms']:.1f}ms  p95 {stats['p95_ms']:.1f}ms"
+            cv2.putText(frame, text, (x, y), cv2.FONT_HERSHEY_SIMPLEX, 0.45, (0, 255, 255), 1)
+            y += 18
+        return frame
@@ -40,8 +40,8 @@ def test_attendance_functionality():
     print("\n📊 Testing Attendance Functionality...")
     
     try:
-        from simple_advanced_attendance import SimpleAdvancedAttendanceManager
-        manager = SimpleAdvancedAttendanceManager()
+        from attendance_service import get_attendance_service
+        manager = get_attendance_service()
         
         # Test marking attendance
         success, message = manager.mark_attendance("TestUser2")
@@ -58,6 +58,306 @@ def test_attendance_functionality():
     except Exception as e:
         print(f"❌ Attendance Testing FAILED: {e}")
 
+def test_attendance_group_commit():
+    """Concurrent marks through the attendance service share journal fsyncs"""
+    import tempfile
+    import threading
+    from attendance_service import AttendanceService
+    from database_manager import DatabaseManager
+    data_dir = tempfile.mkdtemp()
+    db = DatabaseManager(os.path.join(data_dir, "attendance.db"))
+    service = AttendanceService(data_dir, db=db)
+    journal = service.manager.store.journal
+    assert journal is not None
+    
+    def worker(thread_id):
+        for i in range(50):
+            service.mark_many([f"GroupUser{thread_id}_{i}"])
+    
+    threads = [threading.Thread(target=worker, args=(t,)) for t in range(8)]
+    for thread in threads:
+        thread.start()
+    for thread in threads:
+        thread.join()
+    
+    records, fsyncs = journal.stats['records'], journal.stats['fsyncs']
+    service.manager.store.close()
+    db.close()
+    assert records == 400, records
+    assert fsyncs < records, (records, fsyncs)
+    print(f"✅ Group Commit: {records} marks in {fsyncs} fsyncs")
+
+def test_stage_timer():
+    """Stage timings are collected only while enabled and summarized per session"""
+    from stage_timer import StageTimer
+    timer = StageTimer(enabled=False, window=3)
+    with timer.stage("detect"):
+        pass
+    assert timer.summary() == {}
+    
+    timer.enable()
+    timer.start_session()
+    for seconds in (0.001, 0.002, 0.003, 0.004):
+        timer.record("detect", seconds)
+    with timer.stage("match"):
+        pass
+    session = timer.end_session()
+    assert session['stages']['detect']['count'] == 4
+    assert abs(session['stages']['detect']['max_ms'] - 4.0) < 1e-9
+    assert session['stages']['match']['count'] == 1
+    # The rolling window keeps only the latest samples
+    assert timer.summary()['detect']['count'] == 3
+    assert timer.end_session() is None and len(timer.sessions) == 1
+    print("✅ Stage Timer: per-stage and session summaries")
+
+def test_attendance_log_append():
+    """Marks are appended (header once) and fsynced in batches"""
+    import csv
+    import tempfile
+    from attendance_log import AttendanceLog, ATTENDANCE_COLUMNS
+    path = os.path.join(tempfile.mkdtemp(), "log.csv")
+    log = AttendanceLog(path, fsync_batch=3, fsync_interval=3600)
+    for i in range(2):
+        log.append({"Name": f"LogUser{i}", "Time": "2024-01-05 09:00:00"})
+    assert log._unsynced == 2
+    start, end = log.append_many([{"Name": "LogUser2"}, {"Name": "LogUser3"}])
+    assert log._unsynced == 0 and end == os.path.getsize(path) > start
+    log.close()
+    
+    # A second writer appends after the existing rows without repeating the header
+    second = AttendanceLog(path)
+    second.append({"Name": "LogUser4"})
+    second.close()
+    with open(path, newline="") as f:
+        rows = list(csv.reader(f))
+    assert rows[0] == ATTENDANCE_COLUMNS
+    assert [row[0] for row in rows[1:]] == [f"LogUser{i}" for i in range(5)]
+    print("✅ Attendance Log: appends without rewriting")
+
+def test_partition_migration():
+    """A legacy attendance.csv is split into partitions exactly once, keyed on the marker file"""
+    import tempfile
+    import config
+    from attendance_partitions import PartitionedAttendanceStore
+    data_dir = tempfile.mkdtemp()
+    # The partition directory may already exist (e.g. created by another component)
+    os.makedirs(os.path.join(data_dir, config.ATTENDANCE_PARTITION_DIR))
+    legacy = os.path.join(data_dir, "attendance.csv")
+    with open(legacy, "w") as f:
+        f.write("Name,Time\nAlice,2024-01-05 09:00:00\nBob,2024-02-06 09:30:00\n")
+    
+    store = PartitionedAttendanceStore(data_dir, journal=False)
+    assert store.partitions() == ["2024-01", "2024-02"]
+    assert list(store.read_partition("2024-01")["Name"]) == ["Alice"]
+    assert os.path.exists(store.migration_marker)
+    
+    # Once the marker exists, attendance.csv (now an export snapshot) is not split again
+    with open(legacy, "a") as f:
+        f.write("Carol,2024-01-07 10:00:00\n")
+    store = PartitionedAttendanceStore(data_dir, journal=False)
+    assert list(store.read_partition("2024-01")["Name"]) == ["Alice"]
+    
+    # An interrupted split (no marker) is redone, keeping marks already in the partitions once
+    os.remove(store.migration_marker)
+    store.append({"Name": "Dave", "Time": "2024-01-08 08:00:00", "Date": "2024-01-08", "Time_Only": "08:00:00"})
+    store.close()
+    store = PartitionedAttendanceStore(data_dir, journal=False)
+    assert sorted(store.read_partition("2024-01")["Name"]) == ["Alice", "Carol", "Dave"]
+    assert os.path.exists(store.migration_marker)
+    print("✅ Partition Migration: legacy rows split once")
+
+def test_failed_migration_keeps_legacy_csv():
+    """A legacy attendance.csv that can't be split is never overwritten by the exporter"""
+    import tempfile
+    import config
+    from simple_advanced_attendance import SimpleAdvancedAttendanceManager
+    data_dir = tempfile.mkdtemp()
+    legacy = os.path.join(data_dir, "attendance.csv")
+    # The second row has an extra field, so the file doesn't parse
+    content = "Name,Time\nAlice,2024-01-05 09:00:00\nBob,2024-01-05 09:30:00,extra\n"
+    with open(legacy, "w") as f:
+        f.write(content)
+    
+    saved = config.SPREADSHEET_EXPORT_ENABLED
+    config.SPREADSHEET_EXPORT_ENABLED = False
+    try:
+        manager = SimpleAdvancedAttendanceManager(data_dir)
+        assert not manager.store.migrated()
+        assert manager.mark_attendance("Carol")[0]
+        manager.exporter.export_now()
+        manager.store.close()
+        with open(legacy) as f:
+            assert f.read() == content
+        
+        # Still not split on the next start, so still not overwritten
+        manager = SimpleAdvancedAttendanceManager(data_dir)
+        assert not manager.store.migrated()
+        manager.exporter.export_now()
+        manager.store.close()
+        with open(legacy) as f:
+            assert f.read() == content
+    finally:
+        config.SPREADSHEET_EXPORT_ENABLED = saved
+    print("✅ Failed Migration: legacy attendance.csv left untouched")
+
+def test_log_header_upgrade():
+    """Appending to a partition written without the Source column adds the column first"""
+    import csv
+    import tempfile
+    from attendance_log import AttendanceLog, ATTENDANCE_COLUMNS
+    path = os.path.join(tempfile.mkdtemp(), "2024-01.csv")
+    with open(path, "w", newline="") as f:
+        f.write("Name,Time,Date,Time_Only\nAlice,2024-01-05 09:00:00,2024-01-05,09:00:00\n")
+    
+    log = AttendanceLog(path)
+    assert log.columns == ATTENDANCE_COLUMNS
+    log.append_many([{"Name": "Bob", "Time": "2024-01-05 09:30:00", "Date": "2024-01-05",
+                      "Time_Only": "09:30:00", "Source": "manual"}])
+    log.close()
+    with open(path, newline="") as f:
+        rows = list(csv.reader(f))
+    assert rows == [ATTENDANCE_COLUMNS,
+                    ["Alice", "2024-01-05 09:00:00", "2024-01-05", "09:00:00", ""],
+                    ["Bob", "2024-01-05 09:30:00", "2024-01-05", "09:30:00", "manual"]]
+    print("✅ Log Header Upgrade: Source column added")
+
+def test_service_migrates_legacy_csv():
+    """get_attendance_service() on an old data directory keeps the legacy attendance.csv rows"""
+    import tempfile
+    import config
+    import attendance_service
+    data_dir = tempfile.mkdtemp()
+    with open(os.path.join(data_dir, "attendance.csv"), "w") as f:
+        f.write("Name,Time,Date,Time_Only\n"
+                "Alice,2024-01-05 09:00:00,2024-01-05,09:00:00\n"
+                "Bob,2024-02-06 09:30:00,2024-02-06,09:30:00\n")
+    
+    saved = (attendance_service._service, config.ATTENDANCE_SERVICE_ENABLED, config.ATTENDANCE_SQLITE_MIRROR)
+    attendance_service._service = None
+    config.ATTENDANCE_SERVICE_ENABLED = config.ATTENDANCE_SQLITE_MIRROR = False
+    try:
+        service = attendance_service.get_attendance_service(data_dir)
+        assert isinstance(service, attendance_service.AttendanceService)
+        assert not os.path.exists(os.path.join(data_dir, config.ATTENDANCE_PARTITION_DIR, config.ATTENDANCE_SERVICE_LOCK_FILE))
+        success, _ = service.mark_attendance("Carol")
+        assert success
+        snapshot = service.manager._snapshot()
+        assert sorted(snapshot["Name"]) == ["Alice", "Bob", "Carol"]
+        service.manager.store.close()
+        service.owner_lock.release()
+    finally:
+        attendance_service._service, config.ATTENDANCE_SERVICE_ENABLED, config.ATTENDANCE_SQLITE_MIRROR = saved
+    print("✅ Service Migration: legacy rows kept")
+
+def test_sqlite_mirror_catch_up():
+    """Failed SQLite mirror writes are retried, and a new database is caught up from the log"""
+    import tempfile
+    import config
+    from attendance_service import AttendanceService
+    from database_manager import DatabaseManager
+    data_dir = tempfile.mkdtemp()
+    db = DatabaseManager(os.path.join(data_dir, "mirror.db"))
+    service = AttendanceService(data_dir, db=db)
+    
+    def unavailable(*args, **kwargs):
+        raise RuntimeError("database is locked")
+    db.record_presence = unavailable
+    assert service.mark_attendance("Alice")[0]
+    assert len(service._mirror_backlog) == 1
+    del db.record_presence
+    assert service.mark_attendance("Bob")[0]
+    assert not service._mirror_backlog
+    mirrored = "SELECT u.name FROM attendance a JOIN users u ON u.id = a.user_id ORDER BY u.name"
+    assert db._query(mirrored) == [("Alice",), ("Bob",)]
+    assert db._query("SELECT COUNT(*) FROM sessions")[0][0] == 2
+    service.manager.store.close()
+    db.close()
+    
+    # A database that missed everything is filled from the partitions on startup
+    db = DatabaseManager(os.path.join(data_dir, "empty.db"))
+    service = AttendanceService(data_dir, db=db)
+    assert db._query(mirrored) == [("Alice",), ("Bob",)]
+    assert service.catch_up_mirror() == 0
+    service.manager.store.close()
+    db.close()
+    print("✅ SQLite Mirror: failed writes retried, missed marks replayed")
+
+def test_service_wire_format():
+    """Service calls survive the JSON wire format with their types intact"""
+    import json
+    from datetime import date
+    from attendance_service import _to_wire, _from_wire
+    value = {
+        'stamp': datetime(2024, 1, 5, 9, 0, 1),
+        'results': {'Alice': (True, "Attendance marked"), 'Bob': (False, "already marked")},
+        'by_date': {date(2024, 1, 5): 2, date(2024, 1, 6): 1},
+        'names': ['Alice', ('nested', 1)],
+        'plain': None,
+    }
+    decoded = _from_wire(json.loads(json.dumps(_to_wire(value))))
+    assert decoded == value
+    assert isinstance(decoded['results']['Alice'], tuple)
+    assert isinstance(decoded['stamp'], datetime)
+    assert list(decoded['by_date']) == [date(2024, 1, 5), date(2024, 1, 6)]
+    # A request is a plain dict of JSON values
+    request = {'method': 'mark_many', 'args': [['Alice']], 'kwargs': {'timestamp': None, 'source': 'auto'}}
+    assert _from_wire(json.loads(json.dumps(_to_wire(request)))) == request
+    print("✅ Service Wire Format: round trip keeps types")
+
+def test_interner_threads():
+    """Threads interning the same names concurrently agree on one code per name"""
+    import threading
+    from attendance_columns import Interner
+    interner = Interner('int32')
+    names = [f"Person{i}" for i in range(2000)]
+    seen = []
+    
+    def worker():
+        seen.append([interner.code(name) for name in names])
+    
+    threads = [threading.Thread(target=worker) for _ in range(8)]
+    for thread in threads:
+        thread.start()
+    for thread in threads:
+        thread.join()
+    
+    assert all(codes == seen[0] for codes in seen)
+    assert sorted(seen[0]) == list(range(len(names)))
+    assert [interner.values[code] for code in seen[0]] == names
+    print("✅ Interner: one code per name across threads")
+
+def test_dedup_after_failed_append():
+    """A mark whose append failed can be retried the same day"""
+    import tempfile
+    import config
+    from simple_advanced_attendance import SimpleAdvancedAttendanceManager
+    saved = config.SPREADSHEET_EXPORT_ENABLED
+    config.SPREADSHEET_EXPORT_ENABLED = False
+    try:
+        manager = SimpleAdvancedAttendanceManager(tempfile.mkdtemp())
+        append_many = manager.store.append_many
+        
+        def failing_append(*args, **kwargs):
+            raise OSError("No space left on device")
+        
+        manager.store.append_many = failing_append
+        try:
+            manager.mark_many(["Alice", "Bob"])
+            assert False, "the failed append should propagate"
+        except OSError:
+            pass
+        manager.store.append_many = append_many
+        
+        results = manager.mark_many(["Alice", "Bob", "Alice"])
+        assert list(results) == ["Alice", "Bob"]
+        assert all(success for success, _ in results.values())
+        assert not manager.mark_attendance("Alice")[0]
+        assert len(manager.marks) == 2
+        manager.store.close()
+    finally:
+        config.SPREADSHEET_EXPORT_ENABLED = saved
+    print("✅ Dedup: failed append leaves people unmarked")
+
 def test_database_functionality():
     """Test database functionality"""
     print("\n🗄️ Testing Database Functionality...")
@@ -77,6 +377,294 @@ def test_database_functionality():
     except Exception as e:
         print(f"❌ Database Testing FAILED: {e}")
 
+def test_database_query_plans():
+    """The hot database statements, including the dedup inserts, never scan the attendance table"""
+    import re
+    import tempfile
+    from database_manager import DatabaseManager
+    db = DatabaseManager(os.path.join(tempfile.mkdtemp(), "plans.db"))
+    
+    # Record the SQL (with values filled in) that the hot paths actually run;
+    # calls made while this thread holds a connection reuse it
+    statements = []
+    full_scans = []
+    with db.connection() as conn:
+        conn.set_trace_callback(statements.append)
+        db.mark_many(["PlanUser1", "PlanUser2"])
+        db.mark_attendance("PlanUser1")  # Conflicts with the first mark
+        db.get_attendance_report(days=7)
+        db.get_daily_summary(days=7)
+        db.get_stats_summary()
+        db.record_presence(["PlanUser1", "PlanUser3"])
+        db.get_presence_report(days=7)
+        conn.set_trace_callback(None)
+        
+        statements = [' '.join(sql.split()) for sql in statements
+                      if re.match(r'\s*(SELECT|INSERT|UPDATE|DELETE|WITH)\b', sql, re.IGNORECASE)]
+        for sql in statements:
+            # The table may be scanned under an alias ("attendance a")
+            names = {'attendance'} | set(re.findall(r'\battendance\s+(?:AS\s+)?(\w+)', sql, re.IGNORECASE))
+            for row in conn.execute('EXPLAIN QUERY PLAN ' + sql):
+                step = row[3].split()
+                if step[0] == 'SCAN' and step[1] in names:
+                    full_scans.append(f"{row[3]}  <-  {sql[:60]}")
+    db.close()
+    
+    assert any(sql.startswith('INSERT INTO attendance') and 'ON CONFLICT' in sql for sql in statements)
+    assert any('LEFT JOIN attendance' in sql for sql in statements)  # get_stats_summary
+    assert not full_scans, full_scans
+    print(f"✅ Query Plans: {len(statements)} statements, no scans of attendance")
+
+def test_attendance_import():
+    """The bulk importer skips duplicates and rows without a name or time"""
+    import tempfile
+    from database_manager import DatabaseManager
+    data_dir = tempfile.mkdtemp()
+    db = DatabaseManager(os.path.join(data_dir, "import.db"))
+    db.mark_many(["Alice"], timestamp=datetime(2024, 1, 5, 8, 0))
+    
+    path = os.path.join(data_dir, "legacy.csv")
+    with open(path, "w") as f:
+        f.write("Name,Time,Source\n"
+                "Alice,2024-01-05 09:00:00,\n"        # already marked that day
+                "Bob,2024-01-05 09:05:00,manual\n"
+                "Bob,2024-01-05 17:00:00,\n"          # second mark the same day
+                "Bob,2024-01-06 09:00:00,\n"
+                ",2024-01-06 09:00:00,\n"             # no name
+                "Carol,not a time,\n")
+    stats = db.import_attendance(path, chunksize=2)
+    assert (stats['rows'], stats['inserted'], stats['skipped'], stats['invalid']) == (6, 2, 2, 2), stats
+    assert stats['users_created'] == 1
+    assert db._query('SELECT COUNT(*) FROM attendance')[0][0] == 3
+    assert db._query("SELECT type FROM attendance WHERE timestamp = '2024-01-05 09:05:00'")[0][0] == 'manual'
+    
+    try:
+        from openpyxl import Workbook
+    except ImportError:
+        Workbook = None
+    if Workbook is not None:
+        # Blank XLSX cells arrive as None, not ''
+        workbook = Workbook()
+        workbook.active.append(["Name", "Time"])
+        workbook.active.append([None, datetime(2024, 1, 7, 9, 0)])
+        workbook.active.append(["Dave", datetime(2024, 1, 7, 9, 0)])
+        xlsx = os.path.join(data_dir, "legacy.xlsx")
+        workbook.save(xlsx)
+        stats = db.import_attendance(xlsx)
+        assert (stats['inserted'], stats['invalid']) == (1, 1), stats
+        assert 'None' not in [user['name'] for user in db.get_users(active_only=False)]
+    db.close()
+    print("✅ Attendance Import: duplicates and blank rows skipped")
+
+def test_camera_reprobe_after_idle_close():
+    """A forced re-probe after the idle close still finds the last camera"""
+    import camera_manager
+    
+    class FakeCapture:
+        def __init__(self):
+            self.opened = True
+        def isOpened(self):
+            return self.opened
+        def release(self):
+            self.opened = False
+        def set(self, *args):
+            return True
+        def grab(self):
+            return True
+    
+    saved = camera_manager._open_camera
+    camera_manager._open_camera = lambda index: FakeCapture() if index == 0 else None
+    try:
+        manager = camera_manager.CameraManager(idle_timeout=0, probe_range=3)
+        assert manager.probe() == [0] and not manager.is_open  # Closed straight after a bare probe
+        assert manager.probe(force=True) == [0]
+        assert manager.acquire() and manager.index == 0
+        manager.close()
+    finally:
+        camera_manager._open_camera = saved
+    print("✅ Camera Re-probe: idle-closed device found again")
+
+def test_presence_sessions():
+    """A later sighting checks the person out; timeout-based closing only for continuous monitoring"""
+    import tempfile
+    from datetime import timedelta
+    import config
+    from database_manager import DatabaseManager
+    saved = (config.DB_CHECKPOINT_INTERVAL, config.DB_SESSION_TIMEOUT, config.DB_SESSION_MIN_GAP)
+    config.DB_CHECKPOINT_INTERVAL, config.DB_SESSION_TIMEOUT, config.DB_SESSION_MIN_GAP = 0, 0, 300
+    try:
+        db = DatabaseManager(os.path.join(tempfile.mkdtemp(), "sessions.db"))
+        morning = datetime.now().replace(hour=9, minute=0, second=0, microsecond=0)
+        
+        # Dave's session from yesterday was never closed; it ends at his last sighting then
+        assert db.record_presence(["Dave"], timestamp=morning - timedelta(days=1)) == {'Dave': 'opened'}
+        assert db.record_presence(["Alice", "Bob", "Dave"], timestamp=morning) == {
+            'Alice': 'opened', 'Bob': 'opened', 'Dave': 'opened'}
+        
+        # Two minutes later is the same pass in front of the camera
+        assert db.record_presence(["Alice"], timestamp=morning + timedelta(minutes=2)) == {'Alice': 'extended'}
+        
+        # The evening sighting checks Alice out at that time; Bob leaves through the exit camera
+        assert db.record_presence(["Alice"], timestamp=morning + timedelta(hours=8)) == {'Alice': 'closed'}
+        assert db.record_presence(["Bob"], timestamp=morning + timedelta(hours=1),
+                                  source=config.DB_SESSION_EXIT_SOURCE) == {'Bob': 'closed'}
+        
+        report = {row['name']: row for row in db.get_presence_report(days=1)}
+        assert report['Alice']['minutes'] == 480 and report['Alice']['hours'] == 8.0
+        assert not report['Alice']['on_site'] and not report['Bob']['on_site']
+        assert report['Bob']['minutes'] == 60
+        assert report['Dave']['on_site'] and report['Dave']['sessions'] == 1
+        assert db._query("SELECT COUNT(*) FROM sessions s JOIN users u ON u.id = s.user_id "
+                         "WHERE u.name = 'Dave' AND s.check_out IS NOT NULL")[0][0] == 1
+        # Nothing is closed by time alone
+        assert db.close_stale_sessions(morning + timedelta(days=2)) == 0
+        db.close()
+        
+        # Continuous monitoring: sightings extend the session, which ends after the timeout
+        config.DB_SESSION_TIMEOUT = 1800
+        db = DatabaseManager(os.path.join(tempfile.mkdtemp(), "sessions.db"))
+        start = datetime.now().replace(microsecond=0) - timedelta(hours=2)
+        assert db.record_presence(["Alice", "Bob"], timestamp=start) == {'Alice': 'opened', 'Bob': 'opened'}
+        assert db.record_presence(["Alice"], timestamp=start + timedelta(minutes=10)) == {'Alice': 'extended'}
+        
+        # Alice is seen again 40 minutes later; Bob, unseen since, has left
+        assert db.record_presence(["Alice"], timestamp=start + timedelta(minutes=50)) == {'Alice': 'opened'}
+        bob = db._query("SELECT s.check_out, s.duration FROM sessions s JOIN users u ON u.id = s.user_id "
+                        "WHERE u.name = 'Bob'")
+        assert bob == [(start.strftime('%Y-%m-%d %H:%M:%S'), 0)], bob
+        
+        # The report closes Alice's session too (last seen 70 minutes ago)
+        db.record_presence(["Carol"])
+        report = {row['name']: row for row in db.get_presence_report(days=2)}
+        assert not report['Alice']['on_site'] and not report['Bob']['on_site']
+        assert report['Carol']['on_site']
+        assert db._query('SELECT COUNT(*) FROM sessions WHERE check_out IS NULL')[0][0] == 1
+        db.close()
+    finally:
+        config.DB_CHECKPOINT_INTERVAL, config.DB_SESSION_TIMEOUT, config.DB_SESSION_MIN_GAP = saved
+    print("✅ Presence Sessions: later sighting checks out, timeout only when monitoring")
+
+def test_database_migrations():
+    """An original-schema database is migrated: day keys, one mark per day, daily_summary, sessions"""
+    import sqlite3
+    import tempfile
+    from database_manager import DatabaseManager, SCHEMA_MIGRATIONS
+    path = os.path.join(tempfile.mkdtemp(), "legacy.db")
+    conn = sqlite3.connect(path)
+    conn.executescript('''
+        CREATE TABLE users (id INTEGER PRIMARY KEY AUTOINCREMENT, name TEXT UNIQUE NOT NULL, email TEXT,
+                            department TEXT, role TEXT, registered_date TIMESTAMP DEFAULT CURRENT_TIMESTAMP,
+                            is_active BOOLEAN DEFAULT 1);
+        CREATE TABLE attendance (id INTEGER PRIMARY KEY AUTOINCREMENT, user_id INTEGER,
+                                 timestamp TIMESTAMP DEFAULT CURRENT_TIMESTAMP, type TEXT DEFAULT 'auto');
+        CREATE TABLE sessions (id INTEGER PRIMARY KEY AUTOINCREMENT, user_id INTEGER, check_in TIMESTAMP,
+                               check_out TIMESTAMP, duration INTEGER);
+        INSERT INTO users (name) VALUES ('Alice');
+        -- UTC CURRENT_TIMESTAMP values around midday, so the local day is the same in any timezone
+        INSERT INTO attendance (user_id, timestamp) VALUES (1, '2024-01-05 12:00:00'), (1, '2024-01-05 13:00:00'),
+                                                           (1, '2024-01-06 12:00:00');
+        INSERT INTO sessions (user_id, check_in) VALUES (1, '2024-01-05 12:00:00');
+    ''')
+    conn.commit()
+    conn.close()
+    
+    db = DatabaseManager(path)
+    assert db._query('PRAGMA user_version')[0][0] == len(SCHEMA_MIGRATIONS)
+    assert db._query('SELECT day FROM attendance ORDER BY day') == [(20240105,), (20240106,)]
+    assert db._query('SELECT COUNT(*) FROM attendance_duplicates')[0][0] == 1
+    assert db._query('SELECT day, source, marks FROM daily_summary ORDER BY day') == [
+        (20240105, 'auto', 1), (20240106, 'auto', 1)]
+    assert db._query('SELECT day FROM sessions') == [(20240105,)]
+    
+    # The triggers keep daily_summary current from here on
+    assert db.mark_many(["Bob"], timestamp=datetime(2024, 1, 6, 9, 0), source='manual')['Bob'][0]
+    with db.transaction() as conn:
+        conn.execute("DELETE FROM attendance WHERE day = 20240105")
+    assert db._query('SELECT day, source, marks FROM daily_summary ORDER BY day, source') == [
+        (20240106, 'auto', 1), (20240106, 'manual', 1)]
+    # Reopening doesn't run the migrations again
+    db.close()
+    db = DatabaseManager(path)
+    assert db._query('SELECT COUNT(*) FROM attendance_duplicates')[0][0] == 1
+    db.close()
+    print("✅ Database Migrations: legacy schema upgraded")
+
+def test_stats_summary():
+    """Today / week / month counts, overall and per department, from the one-pass stats query"""
+    import tempfile
+    from datetime import timedelta
+    from database_manager import DatabaseManager
+    db = DatabaseManager(os.path.join(tempfile.mkdtemp(), "stats.db"))
+    db.add_user("Alice", department="IT")
+    db.add_user("Bob", department="IT")
+    now = datetime.now().replace(hour=12, minute=0, second=0, microsecond=0)
+    db.mark_many(["Alice"], timestamp=now)
+    db.mark_many(["Bob"], timestamp=now - timedelta(days=3))
+    db.mark_many(["Alice"], timestamp=now - timedelta(days=10))
+    db.mark_many(["Carol"], timestamp=now - timedelta(days=40))
+    
+    summary = db.get_stats_summary()
+    assert summary['total_users'] == 3
+    assert summary['today'] == {'marks': 1, 'users': 1}
+    assert summary['week'] == {'marks': 2, 'users': 2}
+    assert summary['month'] == {'marks': 3, 'users': 2}
+    assert summary['departments']['IT']['week'] == {'marks': 2, 'users': 2}
+    assert summary['departments']['Unassigned'] == {'total_users': 1, 'today': {'marks': 0, 'users': 0},
+                                                    'week': {'marks': 0, 'users': 0},
+                                                    'month': {'marks': 0, 'users': 0}}
+    db.close()
+    print("✅ Stats Summary: window counts match")
+
+def test_user_id_cache():
+    """Cached name -> id lookups notice renames and deactivations made through another connection"""
+    import tempfile
+    from datetime import timedelta
+    from database_manager import DatabaseManager
+    path = os.path.join(tempfile.mkdtemp(), "cache.db")
+    db, other = DatabaseManager(path), DatabaseManager(path)
+    day = datetime(2024, 1, 5, 9, 0)
+    assert db.mark_many(["Alice", "Bob"], timestamp=day)['Alice'][0]
+    
+    # Another process renames Alice; a new "Alice" is a different person
+    assert other.rename_user("Alice", "Alicia")[0]
+    assert db.mark_many(["Alice"], timestamp=day + timedelta(days=1))['Alice'][0]
+    ids = dict(db._query('SELECT name, id FROM users'))
+    assert db._query('SELECT COUNT(*) FROM attendance WHERE user_id = ?', (ids['Alicia'],))[0][0] == 1
+    assert db._query('SELECT COUNT(*) FROM attendance WHERE user_id = ?', (ids['Alice'],))[0][0] == 1
+    
+    # ...and deactivates Bob, who is then no longer marked
+    assert other.set_user_active("Bob", False)[0]
+    assert db.mark_many(["Bob"], timestamp=day + timedelta(days=1))['Bob'] == (False, "User Bob is inactive")
+    db.close()
+    other.close()
+    print("✅ User ID Cache: renames and deactivations seen")
+
+def test_write_queue():
+    """Marks handed to the writer thread are committed in batches with per-mark results"""
+    import tempfile
+    import threading
+    from database_manager import DatabaseManager
+    db = DatabaseManager(os.path.join(tempfile.mkdtemp(), "queue.db"), write_queue=True)
+    results = {}
+    
+    def worker(thread_id):
+        for i in range(25):
+            name = f"QueueUser{thread_id}_{i}"
+            results[name] = db.mark_attendance(name)
+    
+    threads = [threading.Thread(target=worker, args=(t,)) for t in range(4)]
+    for thread in threads:
+        thread.start()
+    for thread in threads:
+        thread.join()
+    
+    assert len(results) == 100 and all(success for success, _ in results.values())
+    assert not db.mark_attendance("QueueUser0_0")[0]
+    stats = db.write_queue_stats()
+    assert stats['enabled'] and stats['marks'] == 101 and 1 <= stats['batches'] <= 101
+    db.close()
+    print(f"✅ Write Queue: 101 marks in {stats['batches']} batches")
+
 def test_web_components():
     """Test if web components can be imported"""
     print("\n🌐 Testing Web Components...")
@@ -119,9 +707,8 @@ def test_visualization():
     
     # Test simple chart creation
     try:
-        from simple_advanced_attendance import SimpleAdvancedAttendanceManager
-        manager = SimpleAdvancedAttendanceManager()
-        result = manager.create_simple_chart()
+        from attendance_service import get_attendance_service
+        result = get_attendance_service().create_attendance_chart()
         print(f"✅ Simple Chart: {result}")
     except Exception as e:
         print(f"❌ Simple Chart FAILED: {e}")
@@ -134,7 +721,7 @@ def test_file_structure():
         "main.py",
         "face_recognition_module.py",
         "face_recognition_module_compatible.py",
-        "attendance_manager.py",
+        "attendance_service.py",
         "simple_advanced_attendance.py",
         "database_manager.py",
         "email_notifier.py",
@@ -193,6 +780,41 @@ def show_summary():
     print("• Enhanced reporting and data visualization")
     print("• Improved face recognition compatibility")
 
+# Checks that assert (the rest only report); main() runs them after the feature tests
+CHECKS = [
+    test_stage_timer,
+    test_attendance_log_append,
+    test_attendance_group_commit,
+    test_partition_migration,
+    test_failed_migration_keeps_legacy_csv,
+    test_log_header_upgrade,
+    test_service_migrates_legacy_csv,
+    test_sqlite_mirror_catch_up,
+    test_service_wire_format,
+    test_interner_threads,
+    test_dedup_after_failed_append,
+    test_database_query_plans,
+    test_attendance_import,
+    test_camera_reprobe_after_idle_close,
+    test_presence_sessions,
+    test_database_migrations,
+    test_stats_summary,
+    test_user_id_cache,
+    test_write_queue,
+]
+
+def run_checks():
+    """Run the asserting checks, reporting failures instead of stopping"""
+    print("\n🧪 Running Checks...")
+    failed = 0
+    for check in CHECKS:
+        try:
+            check()
+        except Exception as e:
+            failed += 1
+            print(f"❌ {check.__name__} FAILED: {e!r}")
+    return failed
+
 def main():
     """Run all tests"""
     print("🎯 FACETRACK ATTENDANCE SYSTEM - COMPREHENSIVE TEST")
@@ -204,9 +826,12 @@ def main():
     test_web_components()
     test_visualization()
     test_file_structure()
+    failed = run_checks()
     show_summary()
     
     print(f"\n⏰ Test completed at: {datetime.now().strftime('%Y-%m-%d %H:%M:%S')}")
+    if failed:
+        sys.exit(1)
 
 if __name__ == "__main__":
     main()
@@ -80,18 +80,11 @@ def validate_name(name):
     
     return True, name
 
-def get_camera_indices():
-    """Get list of available camera indices."""
-    import cv2
-    
-    available_cameras = []
-    for i in range(10):  # Check first 10 indices
-        cap = cv2.VideoCapture(i)
-        if cap.isOpened():
-            available_cameras.append(i)
-            cap.release()
-    
-    return available_cameras
+def get_camera_indices(force=False):
+    """Get list of available camera indices (probed in parallel and cached)."""
+    from camera_manager import get_camera_manager
+    
+    return get_camera_manager().probe(force=force)
 
 def format_file_size(size_bytes):
     """Format file size in human readable format."""
@@ -8,31 +8,25 @@ import json
 from datetime import datetime, timedelta
 import pandas as pd
 from database_manager import DatabaseManager
+from attendance_service import get_attendance_service
 
 app = Flask(__name__)
 app.secret_key = 'your-secret-key-change-this'
 
-# Initialize database
+# Initialize database (a read-only mirror here; marks go through the attendance service)
 db = DatabaseManager()
+attendance = get_attendance_service()
 
 @app.route('/')
 def dashboard():
     """Main dashboard"""
-    # Get today's stats
-    today = datetime.now().date()
-    
-    # Get attendance data
-    df = db.get_attendance_report(days=1)
-    today_count = len(df) if not df.empty else 0
-    
-    # Get weekly stats
-    weekly_df = db.get_attendance_report(days=7)
-    weekly_count = len(weekly_df) if not weekly_df.empty else 0
+    # Get attendance counts in one query
+    summary = db.get_stats_summary()
     
     stats = {
-        'today_attendance': today_count,
-        'weekly_attendance': weekly_count,
-        'total_users': len(weekly_df) if not weekly_df.empty else 0,
+        'today_attendance': summary['today']['users'],
+        'weekly_attendance': summary['week']['users'],
+        'total_users': summary['total_users'],
         'last_update': datetime.now().strftime('%H:%M:%S')
     }
     
@@ -69,7 +63,7 @@ def mark_attendance():
     if not name:
         return jsonify({'success': False, 'message': 'Name is required'})
     
-    success, message = db.mark_attendance(name, 'manual')
+    success, message = attendance.mark_attendance(name, source='manual')
     return jsonify({'success': success, 'message': message})
 
 if __name__ == '__main__':